@@ -18,379 +18,251 @@
 
 # Import Pandas package, used for data analysis (Excel).
 import pandas as pd
-# Import numpy and math for dealing with empty DataFrame cells.
+# Import numpy for dealing with empty DataFrame cells.
 import numpy as np
-import math
-import itertools
-import re
+# Import os and sys packages for finding the shared-modules folder.
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'shared-modules'))
+# Import genome module, used for loading the genome and extracting sequences.
+from genome import load_genome
+# Import extract module, used for extracting many sequences at once.
+from extract import extract_column
+# Import peaks module, used for merging peaks from different conditions.
+from peaks import read_peak_file, peak_columns, merge_conditions, finalize_merged, peak_directions
+# Import differential module, used for deciding which peaks are differential.
+from differential import call_differential, sweep_thresholds
+# Import parallel module, used for running groups of sRNAs in separate processes.
+from parallel import split_by_sRNA, map_parts
+# Import conditions module, used for finding files and names of conditions.
+from conditions import list_conditions
+# Import peak_index module, used for keeping merged peaks between runs.
+from peak_index import PeakIndex
+# Import fimo_jobs module, used for writing the fimo commands.
+from fimo_jobs import shard_fasta, write_fimo_commands
+# Import motif_scan module, used for scanning differential peaks for motifs.
+from motif_scan import scan_meme_file
+# Import genome_wide module, used for genome-wide peak sets.
+from genome_wide import CHUNK_ROWS, read_interval_file, merge_intervals, finalize_intervals, call_intervals
+# Import write_fasta from extract module, used for writing sequences in genome order.
+from extract import write_fasta
 
 
 # =============================================================================
 # List of files for each condition.
 # To add new conditions, add name of file to end of array.
+# The first file is the reference condition that other peaks are compared to.
 # =============================================================================
 
 files = ['listedsRNA_FULLpeaks_rdmWT.csv',
          'listedsRNA_FULLpeaks_rdmStatWT.csv',
          'listedsRNA_FULLpeaks_minWT.csv']
 
-
-# =============================================================================
-# User input
-# =============================================================================
-
-# User can input 'n' - minimum number of nucleotides overlap in sRNA peaks.
-# Default to 50 nt
-n = 50
-user_input = input("Minimum number of nucleotides overlap: ")
-# User has to input an integer to be valid.
-try:
-    n = int(user_input)
-except ValueError:
-    print("Input not valid. Defaulting to 50 nucleotides.")
-
-# User can input minimum SNR to consider a peak.
-# Default to 0.5
-min_SNR = 0.5
-user_input = input("Minimum SNR to consider a peak: ")
-# User must input a float to be valid.
-try:
-    min_SNR = float(user_input)
-except ValueError:
-    print("Input not valid. Defaulting to minimum SNR of 0.5")
+# Or set peaks_folder to a folder of called_peaks CSV files (or a glob pattern
+# such as 'peaks/called_peaks*.csv') to use those files in alphabetical order.
+peaks_folder = None
+# Or set manifest_file to a CSV file with 'File' and 'Condition' columns, one
+# row per condition in the order to compare them, to choose the files, their
+# order and the condition names used for columns.
+manifest_file = None
+
+# Files and names of all conditions (see conditions.py). Without a manifest,
+# names are the part of the file names that differs between files.
+files, conditions = list_conditions(files, peaks_folder, manifest_file)
+
+# Number of processes used for merging peaks, finding differential peaks and
+# extracting sequences. Each process handles different sRNAs, and the output
+# is the same for any number. None uses all cores. Processes are only used on
+# Linux and macOS (on Windows everything runs in one process).
+workers = None
+
+# Threshold sweep: set sweep_n and sweep_min_SNR to lists of values, for
+# example [25, 50, 100] and [0.25, 0.5, 1.0], to find the differential peaks
+# for every combination in one run without asking for input. The peaks are
+# read once, and the differential peaks of all combinations are written to
+# sweep_summary.csv (one row per peak per combination). Leave as None for a
+# normal run.
+sweep_n = None
+sweep_min_SNR = None
+sweeping = sweep_n is not None and sweep_min_SNR is not None
+
+# Merged peak index: set to a file name (for example 'merged_peaks.sqlite') to
+# keep the merged peaks in an SQLite database between runs (see
+# peak_index.py). Conditions already in the index aren't merged again; a new
+# or changed condition file only merges the sRNAs that have peaks in it
+# again, and only new peak regions have their sequences extracted.
+# Conditions stay in the index (in the order they were added) until the file
+# is deleted. Conditions are found by name, so use a manifest_file to keep the
+# names the same when files are added.
+peak_index_file = None
+
+# Genome-wide mode: set to True for genome-wide peak files (10^5 to 10^6
+# peaks), where peaks are genomic intervals instead of peaks listed per sRNA
+# (see genome_wide.py). Peak files need L_Coord, R_Coord and LastSNR columns,
+# and a contig column (for example 'Chrom'; without one, peaks are on the
+# first record of the genome file). Merged peaks are sorted by position and
+# written to merged_peaks.csv and snr_ratios.csv (Excel can't hold that many
+# rows), and sequences are taken from the forward strand.
+# Not used with peak_index_file or a threshold sweep.
+genome_wide = False
+
+# Motif scanning: MEME motif files (for example 'dpinteract_prod2.meme') to
+# scan the differential peaks with in this program, instead of running the
+# fimo commands (see motif_scan.py). Each file gives a table like fimo's,
+# written to fimo_<motif file name>.tsv. Leave empty to only write the fimo
+# commands.
+motif_files = []
+
+# Number of shards the differential peak FASTA file is split into for fimo
+# (see fimo_jobs.py). Each shard gets its own fimo command and output folder,
+# so the commands can run at the same time. 1 runs fimo once per motif file
+# on differential_peaks.fasta.
+fimo_shards = 1
+
+# K-12 genome file for extracting DNA sequences.
+# The genome module reads the file once and indexes it, so sequences can be
+# sliced out directly using 1-based nucleotide coordinates.
+genome_file_name = "GCF_000005845.2_ASM584v2_genomic (1).fna"
 
 
 # =============================================================================
-# Various functions
+# User input
 # =============================================================================
 
-# Function for adding new columns for each new condition/file:
-def add_columns(df, dfNum):
-    # Column for left coordinate:
-    left = files[dfNum][21:-4] + ' L'
-    # Column for right coordinate:
-    right = files[dfNum][21:-4] + ' R'
-    # Column for SNR:
-    snr = files[dfNum][21:-4] + ' SNR'
-    # Return new DataFrame with columns added.
-    return pd.concat([df, pd.DataFrame(columns=[left, right, snr])], sort=False)
-
-
-# DataFrame for merged data:
-merged = pd.DataFrame(columns=['sRNA', 'sRNA peak'])
-# Add columns for rdmWT condition.
-merged = add_columns(merged, 0)
-
-
-# Function for adding sRNA data to cells, works for all sRNAs and conditions:
-def add_sRNA(merged, i, j, dfNum, df):
-    # Add left coordinate.
-    merged.iloc[i, dfNum*3+2] = int(df.iloc[j, 2])
-    # Add right coordinate.
-    merged.iloc[i, dfNum*3+3] = int(df.iloc[j, 3])
-    # Add SNR.
-    if str(df.iloc[j, 4])[5:-3] != '':
-        snr_temp = re.findall('\d+\.\d+', df.iloc[j, 4])
-        merged.iloc[i, dfNum*3+4] = float(snr_temp[0])
-        
-    return merged
-
-# Function for inserting an empty row into merged DataFrame for new peak:
-def insert_row(row_number, df):
-    # Split DataFrame in two so new row can be added in between.
-    df_1 = df.iloc[0:row_number]
-    df_2 = df.iloc[row_number:]
-    # Create new empty row.
-    empty_row = pd.DataFrame([[np.nan] * len(df.columns)], columns=df.columns)
-    # Concatenate DataFrames with empty row in between.
-    newDF = pd.concat([df_1, empty_row, df_2], ignore_index = True)
-    newDF.reset_index()
-    return newDF
-
-# Function for inserting row with sRNA data added:
-def insert_row_final(merged, newDF, i, j, k):
-    # Add empty row at the end.
-    merged = insert_row(i+1, merged)
-    # Add rdmStat peak data to new empty row.
-    merged = add_sRNA(merged, i+1, j, k, newDF)
-    # Add sRNA name.
-    merged.loc[i+1, 'sRNA'] = newDF.iloc[j, 0]
-    return merged
+# Not asked for in a threshold sweep.
+if not sweeping:
+
+    # User can input 'n' - minimum number of nucleotides overlap in sRNA peaks.
+    # Default to 50 nt
+    n = 50
+    user_input = input("Minimum number of nucleotides overlap: ")
+    # User has to input an integer to be valid.
+    try:
+        n = int(user_input)
+    except ValueError:
+        print("Input not valid. Defaulting to 50 nucleotides.")
+
+    # User can input minimum SNR to consider a peak.
+    # Default to 0.5
+    min_SNR = 0.5
+    user_input = input("Minimum SNR to consider a peak: ")
+    # User must input a float to be valid.
+    try:
+        min_SNR = float(user_input)
+    except ValueError:
+        print("Input not valid. Defaulting to minimum SNR of 0.5")
 
 
 # =============================================================================
-# Add rdmWT data to merged DataFrame. 
+# Merge peaks from all conditions.
 # =============================================================================
 
-# Create DataFrame for rdmWT condition.
-rdmWT_DF = pd.read_csv(files[0])
-
-# Loop through rdmWT DataFrame and add data to merged DataFrame.
-for i, row in rdmWT_DF.iterrows():
+# Threshold sweep: find differential peaks for every combination of n and
+# min_SNR (see differential.py), write them to sweep_summary.csv and stop.
+if sweeping:
+    # Create DataFrame for each condition: sRNA names are categorical,
+    # coordinates int32 and SNRs (parsed from LastSNR) float64.
+    condition_DFs = [read_peak_file(f) for f in files]
+    calls, counts = sweep_thresholds([peak_columns(df) for df in condition_DFs], conditions,
+                                     sweep_n, sweep_min_SNR, match_all_conditions=False,
+                                     workers=workers)
+    calls.to_csv("sweep_summary.csv", index=False)
+    print(counts.to_string(index=False))
+    sys.exit()
+
+# Genome-wide mode: merge peaks, find differential peaks and extract their
+# sequences with sorted sweeps along the genome (see genome_wide.py), write
+# the output files and stop.
+if genome_wide:
+    genome = load_genome(genome_file_name, packed=False)
+    # Create DataFrame for each condition, reading a chunk of rows at a time.
+    condition_DFs = [read_interval_file(f, genome.contig_names()[0]) for f in files]
+    merged = merge_intervals(condition_DFs, conditions, n, match_all_conditions=False,
+                             workers=workers)
+    # Adds Merged L, Merged R and Max SNR, sorts peaks by position and names
+    # them '<contig>_<number>'.
+    merged = finalize_intervals(merged, len(conditions), genome.contig_names())
+    merged, snr_ratios = call_intervals(merged, conditions, min_SNR, workers)
+
+    # Export merged peaks and SNR ratios, a chunk of rows at a time.
+    # Coordinates are written as whole numbers.
+    coordinates = [name + side for name in conditions for side in [' L', ' R']]
+    merged[coordinates] = merged[coordinates].astype('Int64')
+    merged.drop(['Max SNR'], axis=1).to_csv("merged_peaks.csv", index=False, na_rep="na",
+                                            chunksize=CHUNK_ROWS)
+    snr_ratios.insert(0, 'Peak', merged['Peak'])
+    snr_ratios.to_csv("snr_ratios.csv", index=False, chunksize=CHUNK_ROWS)
+
+    # Write sequences of differential peaks, in genome order (the order of
+    # merged), and the fimo commands for them.
+    differential = merged[merged['Differential peak?'] == 1]
+    write_fasta(genome, pd.DataFrame({'name': differential['Peak'],
+                                      'contig': differential['Contig'].astype(str),
+                                      'left': differential['Merged L'],
+                                      'right': differential['Merged R'],
+                                      'strand': 'F'}), "differential_peaks.fasta")
+    fasta_files = shard_fasta("differential_peaks.fasta", fimo_shards)
+    write_fimo_commands("run_fimo_dp_prod.txt", "dpinteract_prod2.meme", fasta_files, "fimo_dp_prod")
+    write_fimo_commands("run_fimo_dp_prod_no_redund.txt", "dpinteract_prod2_no_redund.meme",
+                        fasta_files, "fimo_dp_prod_no_redund")
+    sys.exit()
+
+# Merges peaks from each condition into rows (see peaks.py). Every rdmWT peak
+# gets its own row. Each peak of another condition is added to the first row
+# of the same sRNA where the rdmWT peak overlaps it by at least n
+# nucleotides. Otherwise the peak gets a new row.
+# Each condition is sorted by sRNA and left coordinate, and all conditions are
+# merged together in one pass, with groups of sRNAs in separate processes.
+
+# DataFrame for merged data, with columns sRNA, sRNA peak, and L, R and SNR
+# for each condition. All rows of each sRNA are together, with new rows after
+# the existing rows of their sRNA.
+if peak_index_file:
+    # Add new or changed conditions to the merged peak index. Only sRNAs with
+    # peaks in those conditions are merged again.
+    index = PeakIndex(peak_index_file, n, match_all_conditions=False)
+    for f, name in zip(files, conditions):
+        affected = index.update_condition(name, f)
+        if affected:
+            print(name + ": merged " + str(len(affected)) + " sRNAs")
+    conditions = index.condition_names()
+    merged = index.merged_table()
+
+else:
+    # Create DataFrame for each condition: sRNA names are categorical,
+    # coordinates int32 and SNRs (parsed from LastSNR) float64.
+    condition_DFs = [read_peak_file(f) for f in files]
+    merged = merge_conditions([peak_columns(df) for df in condition_DFs], conditions, n,
+                              match_all_conditions=False, workers=workers)
 
-    # Add sRNA names.
-    merged.loc[i, 'sRNA'] = rdmWT_DF.iloc[i, 0]
-    # Add remaining data (left coordinate, right coordinate, SNR).
-    merged = add_sRNA(merged, i, i, 0, rdmWT_DF)
 
-
-# =============================================================================
-# Loop through remaining files for different conditions. Add data to merged
-# DataFrame. Peaks are compared to rdmWT peak.
-# =============================================================================
-    
-k = 1
-while k < len(files):
-    
-    # Create DataFrame for given condition.
-    condition_DF = pd.read_csv(files[k])
-    # Add columns for given condition.
-    merged = add_columns(merged, k)
-    
-    # Loop through peaks and add data to merged DataFrame.
-    for j, row in condition_DF.iterrows():
-        
-        # Create set of positions for new peak.
-        newPos = set(range(condition_DF.iloc[j, 2], condition_DF.iloc[j, 3] + 1))
-        
-        # Loop through existing peaks to compare.
-        i = 0
-        while i < len(merged.index):
-            
-            # If sRNAs have the same name, compare peak positions.
-            if merged.loc[i, 'sRNA'] == condition_DF.iloc[j, 0]:
-                
-                # Boolean to keep track of whether the peak was added or not:
-                # Default to False because peak not added yet.
-                added = False
-                
-                # If there is a rdmWT peak:
-                if math.isnan(merged.iloc[i, 2]) == False:
-                    # Create set of positions for rdmWT peak.
-                    WTPos = set(range(int(merged.iloc[i, 2]), int(merged.iloc[i, 3]) + 1))
-                    # List of matching nt between positions for new and rdmWT peaks.
-                    match = newPos & WTPos
-                    
-                    # If the number of matching nucleotides is greater than n, the peak is the same.
-                    # Add new peak data to existing row.
-                    if len(match) >= n:
-                        # Since peak was added, added = True.
-                        merged = add_sRNA(merged, i, j, k, condition_DF)
-                        added = True
-                        # Break out of while loop since peak already added.
-                        break
-                    
-                # If on the last existing peak and new peak not added yet
-                if i == len(merged.index) - 1 and added == False:
-                    merged = insert_row_final(merged, condition_DF, i, j, k)
-                
-                    # Increase index by 1 so while loop doesn't go over new row.
-                    i += 1
-                    
-                # If next rdmWT peak is a different sRNA and peak not added yet.
-                elif merged.loc[i+1, 'sRNA'] != condition_DF.iloc[j, 0] and added == False:
-                    merged = insert_row_final(merged, condition_DF, i, j, k)
-                        
-                    # Increase index by 1 so while loop doesn't go over new row.
-                    i += 1
-                
-            i += 1
-  
-    k += 1        
-    
-    
 # =============================================================================
 # Add leftmost coordinate, rightmost coordinate, and maximum SNR for peaks.
+# Sort peaks by sRNA and position, and number peaks for each sRNA.
 # =============================================================================
 
-# Add new columns for merged data.
-# Merged L is minimum left coordinate of the peak across different conditions.
-# Merged R is maximum right coordinate of the peak across different conditions.
-merged = pd.concat([merged, pd.DataFrame(columns=['Merged L', 'Merged R'])], sort=False)
-
-# Loop through all peaks in merged DataFrame.
-for i, row in merged.iterrows():
-    
-    # Lists to keep track of each peak's data under different condition.
-    left = []
-    right = []
-    snr = []
-    
-    # Loop through each condition.
-    dfNum = 0
-    while dfNum < len(files):
-        # If there is a peak for that condition (not empty):
-        if math.isnan(merged.iloc[i, dfNum*3+2]) == False:
-            # Add left coord, right coord, & SNR to respective lists.
-            left.append(merged.iloc[i, dfNum*3+2])
-            right.append(merged.iloc[i, dfNum*3+3])
-            if math.isnan(merged.iloc[i, dfNum*3+4]) == False:
-                snr.append(merged.iloc[i, dfNum*3+4])
-        dfNum += 1
-
-    # If there are SNRs, find maximum SNR. Add to merged DataFrame.
-    if snr:
-        merged.loc[i, 'Max SNR'] = float(max(snr))
-    # Find leftmost coordinate. Add to merged DataFrame.
-    merged.iloc[i, -3] = int(min(left))
-    # Find rightmost coordinate. Add to merged DataFrame.
-    merged.iloc[i, -2] = int(max(right))
-
-
-# =============================================================================
-# Sort peaks by sRNA and position.
-# =============================================================================
-    
-# Order by sRNA name, keep current order.
-order = 0
-# New column to keep track of name order.
-merged.loc[0, 'Order by name'] = order
-i = 1
-# Loop through all peaks in merged DataFrame.
-while i < len(merged.index):
-    
-    # If new sRNA, order increases by 1.
-    if merged.loc[i, 'sRNA'] != merged.loc[i-1, 'sRNA']:
-        order += 1
-    merged.loc[i, 'Order by name'] = order
-    i += 1
-
-# Loop for order by position.
-# Loop through all peaks in merged DataFrame.
-for i, row in merged.iterrows():
-    
-    # Loop through each condition.
-    dfNum = 0
-    while dfNum < len(files):
-        # If there is a peak for that condition (not empty):
-        if math.isnan(merged.iloc[i, dfNum*3+2]) == False:
-            # Add left coordinate to new column 'Order by position'.
-            merged.loc[i, 'Order by position'] = merged.iloc[i, dfNum*3+2]
-            break
-        dfNum += 1
-
-# Sort first by sRNA name, keep current order.
-# Sort second by position of left coordinate.
-merged = merged.sort_values(by=['Order by name', 'Order by position'])
-# Delete additional columns created.
-merged.drop(['Order by name', 'Order by position'], axis=1, inplace=True)
-# Reset indexes so they aren't confusing.
-# drop = True so new 'index' column is not created.
-# inplace = True to modify existing DataFrame.f
-merged.reset_index(drop = True, inplace = True)
+# Adds Merged L, Merged R and Max SNR columns (see peaks.py).
+merged = finalize_merged(merged, len(conditions))
 
 
 # =============================================================================
-# Number peaks for each sRNA.
+# Find differential peaks.
 # =============================================================================
 
-# Number peaks for each sRNA.
-num = 1
-# Loop through all peaks in merged DataFrame.
-for i, row in merged.iterrows():
-    # Start the first peak at 1.
-    if i != 0:
-        # If new sRNA, reset numbering.
-        if merged.loc[i, 'sRNA'] != merged.loc[i-1, 'sRNA']:
-            num = 1
-    merged.loc[i, 'sRNA peak'] = merged.loc[i, 'sRNA'] + "_" + str(num)
-    # Add 1 for next peak.
-    num += 1
-
+# Peaks below minimum SNR count as non-existent. A peak is differential if it
+# is nonexistent in some conditions (but not all), or if the SNR ratio of any
+# two conditions is at least 2 (see differential.py).
+# Adds 'Differential peak?', 'Max SNR difference' and 'Max SNR ratio' columns,
+# and gives the SNR ratio of every pair of conditions for every peak.
+# Rows are split into groups of whole sRNAs, handled in separate processes.
+parts = split_by_sRNA(merged['sRNA'], workers)
+results = map_parts(lambda rows: call_differential(merged.iloc[rows], conditions, min_SNR),
+                    parts, workers)
+merged = pd.concat([x[0] for x in results]).sort_index()
+snr_ratios = pd.concat([x[1] for x in results]).sort_index()
 
 # Replace all numpy NaN values with string "na".
-merged = merged.fillna("na")
-
-
-# =============================================================================
-# Exclude peaks below minimum SNR from analysis.
-# =============================================================================
-
-# Copy of merged DataFrame that excludes peaks below minimum SNR from analysis:
-temp = merged.copy()
-
-# Loop through all peaks in temp DataFrame.
-for i, row in temp.iterrows():
-    
-    # Loop through each condition.
-    dfNum = 0
-    while dfNum < len(files):
-        
-        # If there is a peak for that condition (not empty).
-        if temp.iloc[i, dfNum*3+4] != "na":
-            
-            # If the SNR is below the minimum SNR, count peak as non-existent.
-            if temp.iloc[i, dfNum*3+4] < min_SNR:
-                temp.iloc[i, dfNum*3+2] = "na"
-                temp.iloc[i, dfNum*3+3] = "na"
-                temp.iloc[i, dfNum*3+4] = "na"
-                
-        dfNum += 1
-    
-
-# If peak is nonexistent in any condition, peak is differential.
-# Unless peak is nonexistent for all conditions (below minimum SNR).
-for i, row in temp.iterrows():
-    if temp.iloc[i].str.contains("na").any() and temp.iloc[i].str.contains("na").sum() < len(files)*3:
-        
-        # 1 means differential peak. 0 means nondifferential peak.
-        merged.loc[i, 'Differential peak?'] = 1
-
-# Fill all other peaks with 0.
-merged = merged.fillna(0)
-
-
-# =============================================================================
-# Find and compare maximum SNR ratios and differences to determine if peak is
-# differential.
-# =============================================================================
-
-# Create list of condition combinations to compare each 2 conditions separately.
-file_nums = list(range(len(files)))
-file_subsets = list(itertools.combinations(file_nums, 2))
-
-# Loop through all peaks in temp DataFrame.
-for i, row in temp.iterrows():
-
-    # Lists for all SNR ratios and differences to find maximum later:
-    snr_ratios = []
-    snr_diffs = []
-    
-    # For each combination, find the maximum SNR ratio and SNR difference.
-    # A big enough SNR ratio means the peak is differential.
-    # The SNR ratio is the absolute value of log (snr1/snr2). Doesn't matter which is being divided.
-    for subset in file_subsets:
-
-        # If both SNRs are not empty, add SNR ratio and difference to lists.
-        if temp.iloc[i, subset[0]*3+4] != "na" and temp.iloc[i, subset[1]*3+4] != "na":
-            snr1 = temp.iloc[i, subset[0]*3+4]
-            snr2 = temp.iloc[i, subset[1]*3+4]
-            snr_diffs.append((abs(snr1 - snr2)))
-            if merged.iloc[i, subset[0]*3+4] != 0 and merged.iloc[i, subset[1]*3+4] != 0:
-                snr_ratios.append((abs(math.log10(snr1/snr2))))
-
-    # If SNR ratio is greater than log(2), peak counts as differential.
-    # This means one SNR is at least twice as large as the other.
-    if any(y >= math.log10(2) for y in snr_ratios):
-        merged.loc[i, 'Differential peak?'] = 1
-    
-    # If peak is nonexistent under any condition, max SNR difference is max SNR.
-    # Max SNR ratio is empty.
-    if merged.iloc[i].str.contains("na").any():
-        merged.loc[i, 'Max SNR difference'] = merged.loc[i, 'Max SNR']
-    
-    # If peak is existent for all conditions:
-    else:
-        # Find maximum SNR ratio and add to merged DataFrame.
-        if snr_ratios:
-            merged.loc[i, 'Max SNR ratio'] = max(snr_ratios)
-            
-        # Find maximum SNR difference and add to merged DataFrame.
-        if snr_diffs:
-            merged.loc[i, 'Max SNR difference'] = max(snr_diffs)
-    
-# Fill all other cells with "na".
-merged = merged.fillna("na")
+merged = merged.astype(object).fillna("na")
 
 
 # =============================================================================
@@ -400,66 +272,46 @@ merged = merged.fillna("na")
 # Read file with directions of all sRNAs
 sRNAs_DF = pd.read_excel('sRNAs_list_from-lib_050919.xlsx')
 
-# Loop through each peak in merged DataFrame.
-for i, row in merged.iterrows():
-    
-    # For each peak, loop through sRNAs DataFrame to find match
-    for j, row in sRNAs_DF.iterrows():
-        
-        # Add direction for each sRNA from sRNAs DataFrame to merged DataFrame
-        if sRNAs_DF.loc[j, 'sRNA'].lower().strip() in merged.loc[i, 'sRNA'].lower().strip():
-            merged.loc[i, 'Direction'] = sRNAs_DF.loc[j, 'Direction']
-            break
+# Each peak gets the direction of the first sRNA in the list whose name is
+# part of the peak's sRNA name (see peaks.py).
+merged['Direction'] = peak_directions(merged['sRNA'], sRNAs_DF, substring=True)
 
 
 # =============================================================================
 # Extract DNA sequences of peak regions.
 # =============================================================================
 
-# Open file that contains the K-12 genome for extracting DNA sequences.
-with open("GCF_000005845.2_ASM584v2_genomic (1).fna") as f:
-# Create list of all lines in file.
-    content = f.readlines()
-content = [x.strip() for x in content]
-
-# Loop through strings in content list and add to one long string.
-# This long string is the entire genome.
-# Start at i = 1 since genome starts on second line.
-i = 1
-# Genome starts with "0" so indices will match nucleotide coordinates.
-genome = "0"
-while i < len(content):
-    genome += content[i]
-    i += 1
-
-# Loop through each peak in merged DataFrame.
-for i, row in merged.iterrows():
-        
-    # Get leftmost and rightmost coordinates.
-    left_coord = merged.loc[i, 'Merged L']
-    right_coord = merged.loc[i, 'Merged R']
-    
-    # Extract forward sequence from genome string using the left and right coordinates.
-    seq_F = genome[left_coord:right_coord+1]
-    
-    # If the direction is forward, add forward sequence to merged DataFrame.
-    if merged.loc[i, 'Direction'] == 'F':
-        merged.loc[i, 'Sequence'] = seq_F
-    
-    # If the direction is reverse, take reverse complement of forward sequence.
-    else:
-        seq_R = ""
-        for nt in seq_F:
-            if nt == 'A':
-                seq_R = 'T' + seq_R
-            elif nt == 'T':
-                seq_R = 'A' + seq_R
-            elif nt == 'G':
-                seq_R = 'C' + seq_R
-            elif nt == 'C':
-                seq_R = 'G' + seq_R
-        # Add reverse sequence to merged DataFrame.
-        merged.loc[i, 'Sequence'] = seq_R
+# Genome file is set at the top (genome_file_name).
+# Set packed=True in load_genome() to keep the genome 2-bit packed (about 4
+# times less memory).
+
+# Table of peak regions to extract: name, leftmost and rightmost coordinates,
+# and strand. If the direction isn't forward, take the reverse complement.
+peak_regions = pd.DataFrame({'name': merged['sRNA peak'],
+                             'left': merged['Merged L'],
+                             'right': merged['Merged R'],
+                             'strand': np.where(merged['Direction'] == 'F', 'F', 'R')})
+
+# Extract all sequences in one sweep along the genome (or one sweep per
+# process, each over its own part of the genome) and add them to merged
+# DataFrame.
+if peak_index_file:
+    # Only extract sequences of peak regions that aren't in the peak index yet.
+    index.use_genome(genome_file_name)
+    sequences = index.cached_sequences(peak_regions)
+    missing = [i for i, seq in enumerate(sequences) if seq is None]
+    if missing:
+        genome = load_genome(genome_file_name, packed=False)
+        new_sequences = extract_column(genome, peak_regions.iloc[missing], workers=workers)
+        index.store_sequences(peak_regions.iloc[missing], new_sequences)
+        for i, seq in zip(missing, new_sequences):
+            sequences[i] = seq
+    merged['Sequence'] = sequences
+    index.close()
+
+else:
+    genome = load_genome(genome_file_name, packed=False)
+    merged['Sequence'] = extract_column(genome, peak_regions, workers=workers)
 
 
 # These columns aren't needed for final output.
@@ -470,6 +322,11 @@ merged.drop(['Max SNR', 'Direction'], axis=1, inplace=True)
 # Or rewrite existing Excel file with new merged DataFrame
 merged.to_excel("merged_peaks.xlsx", sheet_name='Merged Peaks', index=False)
 
+# Export SNR ratio (|log10(SNR1 / SNR2)|) of every pair of conditions for every
+# peak. Empty cells are pairs that can't be compared.
+snr_ratios.insert(0, 'sRNA peak', merged['sRNA peak'])
+snr_ratios.to_excel("snr_ratios.xlsx", sheet_name='SNR Ratios', index=False)
+
 
 # =============================================================================
 # Create FASTA file containing all differential peaks.
@@ -495,38 +352,25 @@ fasta_file.close()
 
 
 # =============================================================================
-# Create files containing commands to run MEME (fimo) on each differential peak.
+# Create files containing commands to run MEME (fimo) on the differential peaks.
 # =============================================================================
 
-# Create new FASTA file for writing (or overwrite existing file).
-txtFile = open("run_fimo_dp_prod.txt", "w")
-txtFile_no_redund = open("run_fimo_dp_prod_no_redund.txt", "w")
+# One fimo command per motif file (or per shard of the FASTA file), each with
+# its own output folder.
+fasta_files = shard_fasta("differential_peaks.fasta", fimo_shards)
+write_fimo_commands("run_fimo_dp_prod.txt", "dpinteract_prod2.meme", fasta_files, "fimo_dp_prod")
+write_fimo_commands("run_fimo_dp_prod_no_redund.txt", "dpinteract_prod2_no_redund.meme",
+                    fasta_files, "fimo_dp_prod_no_redund")
 
-# Loop through each peak in merged DataFrame.
-for i, row in merged.iterrows():
-    
-    # If the peak is differential:
-    if merged.loc[i, 'Differential peak?'] == 1:
-        
-        if i != len(merged.index) - 1:
-            
-            # Write fimo command to 'all' text file.
-            txtFile.write("fimo --oc . --verbosity 1 --thresh 1.0E-4 " +
-                          "dpinteract_prod2.meme " + merged.loc[i, 'sRNA peak'] +
-                          ".txt\n")
-            # Write fimo command to 'not redundant' text file.
-            txtFile_no_redund.write("fimo --oc . --verbosity 1 --thresh 1.0E-4 " +
-                                    "dpinteract_prod2_no_redund.meme " +
-                                    merged.loc[i, 'sRNA peak'] + ".txt\n")
-            
-        # Don't add blank line for last row.
-        else:
-            txtFile.write("fimo --oc . --verbosity 1 --thresh 1.0E-4 " +
-                          "dpinteract_prod2.meme " + merged.loc[i, 'sRNA peak'] +
-                          ".txt")
-            txtFile_no_redund.write("fimo --oc . --verbosity 1 --thresh 1.0E-4 " +
-                                    "dpinteract_prod2_no_redund.meme " +
-                                    merged.loc[i, 'sRNA peak'] + ".txt")
-
-txtFile.close()
-txtFile_no_redund.close()
+
+# =============================================================================
+# Scan differential peaks for motifs.
+# =============================================================================
+
+# Every differential peak is scanned on both strands with every motif of each
+# motif file, reading each motif file once (see motif_scan.py).
+differential = merged[merged['Differential peak?'] == 1]
+for meme_file in motif_files:
+    out_file = "fimo_" + os.path.splitext(os.path.basename(meme_file))[0] + ".tsv"
+    hits = scan_meme_file(meme_file, differential['sRNA peak'], differential['Sequence'], out_file)
+    print(meme_file + ": " + str(len(hits.index)) + " sites")
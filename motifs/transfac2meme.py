@@ -1,45 +1,87 @@
 """
 transfac2meme.py
     6/21/2020
-    This program creates text files that contain transfac2meme commands for MG1655
-    motifs from the Prodoric2 database. These commands will convert the TRANSFAC
-    files of each motif into MEME motif files suitable for use with the MEME Suite.
+    This program converts the TRANSFAC files of MG1655 motifs from the Prodoric2
+    database into MEME motif files suitable for use with the MEME Suite.
+    It writes one MEME file with all motifs, and one with only the motifs
+    that aren't in the DPInteract database.
 """
 
 # Use Anaconda, a distribution of Python for data science
 # Run on Spyder
 
+# The TRANSFAC files are read (and converted) in this program, in parallel
+# processes, instead of running the MEME Suite's transfac2meme once per motif.
+
+# Outputs:
+# prodoric2_all.meme - ALL motifs
+# prodoric2_not_redundant.meme - NOT REDUNDANT motifs
+# These replace transfac2meme_all.txt and transfac2meme_not_redundant.txt,
+# the lists of transfac2meme commands (one per motif) that earlier versions
+# of this program wrote. Those files are kept as the record of which motifs
+# were in each set.
+
+
+# Import os and sys packages for file names and finding the shared-modules folder.
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'shared-modules'))
 # Import Pandas package, used for data analysis (Excel)
 import pandas as pd
+# Import numpy for splitting motifs between processes.
+import numpy as np
+# Import motif_library module, used for reading TRANSFAC files, writing MEME files
+# and finding redundant motifs.
+from motif_library import read_transfac, write_meme, NameMatcher
+# Import parallel module for reading TRANSFAC files in separate processes.
+from parallel import map_parts, worker_count
+
+# Folder containing the TRANSFAC files of the motifs.
+transfac_folder = '.'
+
+# Number of processes for reading TRANSFAC files (None uses all cores).
+workers = None
 
 # Read in CSV Excel file containing Prodoric2 motifs
 prodoric2_df = pd.read_csv('prodoric2.csv')
 
-# Writes transfac2meme command for given motif
-def write_command(i, txt_file):
+# Gets the TRANSFAC file name of given motif
+def transfac_file(i):
         # The TRANSFAC file follows this format:
         # prodoric_<accession number>.txt
-        file_name = 'prodoric_' + prodoric2_df.iloc[i, 0].lower() + '.txt'
-        
-        # Write transfac2meme command to text file.
-        txt_file.write('transfac2meme [options] ' + file_name + '\n')
+        return os.path.join(transfac_folder, 'prodoric_' + prodoric2_df.iloc[i, 0].lower() + '.txt')
+
+# Reads the TRANSFAC files of the given motifs (rows of the Prodoric2 DataFrame).
+# Returns a list with the motifs of each file (None if there's no file).
+def read_part(rows):
+        motifs = []
+        for i in rows:
+            file_name = transfac_file(i)
+            motifs.append(read_transfac(file_name) if os.path.exists(file_name) else None)
+        return motifs
 
 # =============================================================================
-# ALL
-# All MG1655 motifs in Prodoric2 database
+# Read TRANSFAC files
 # =============================================================================
 
-# Create a new text file that contains commands for ALL Prodoric2 motifs.
-txt_all = open("transfac2meme_all.txt", "w")
+# Split motifs into parts and read each part in a separate process.
+# Parts are returned in order, so motifs stay in Prodoric2 DataFrame order.
+parts = np.array_split(np.arange(len(prodoric2_df.index)), 4 * worker_count(workers))
+file_motifs = [x for part in map_parts(read_part, [x for x in parts if len(x)], workers) for x in part]
 
-# Loop through all motifs in Prodoric2 DataFrame.
-# Create a transfac2meme command for each motif.
-for i, row in prodoric2_df.iterrows():
-    
-    # Write transfac2meme command for given motif.
-    write_command(i, txt_all)
+# Tell user about TRANSFAC files that weren't found; their motifs are left out.
+missing = [transfac_file(i) for i in range(len(file_motifs)) if file_motifs[i] is None]
+if missing:
+    print(str(len(missing)) + " TRANSFAC files not found, e.g. " + missing[0])
 
-txt_all.close()
+# =============================================================================
+# ALL
+# All MG1655 motifs in Prodoric2 database
+# =============================================================================
+
+# Write a MEME file containing ALL Prodoric2 motifs.
+all_motifs = [motif for motifs in file_motifs if motifs for motif in motifs]
+write_meme(all_motifs, "prodoric2_all.meme")
 
 
 # =============================================================================
@@ -50,25 +92,18 @@ txt_all.close()
 # Read in XLSX Excel file containing DPInteract motifs.
 dpinteract_df = pd.read_excel('dpinteract.xlsx')
 
-# Create a new text file that contains commands.
-txt_not_redundant = open("transfac2meme_not_redundant.txt", "w")
-
-# Loop through all motifs in Prodoric2 DataFrame.
-for i, row in prodoric2_df.iterrows():
-    redundant = False
-    
-    # Loop through all motifs in DPInteract DataFrame
-    for j, row in dpinteract_df.iterrows():
-        
-        # If Prodoric2 motif contains DPInteract motif, Prodoric2 motif is redundant.
-        # Make all strings in list lowercase, so they will be compared correctly.
-        if dpinteract_df.loc[j, 'motif'].lower() in prodoric2_df.iloc[i, 1].lower():
-            redundant = True
-            break
-    
-    # If Prodoric2 motif doesn't match any DPInteract motifs, write transfac2meme
-    # command for given motif.
-    if redundant == False:
-        write_command(i, txt_not_redundant)
-
-txt_not_redundant.close()
+# A Prodoric2 motif is redundant if its name contains a DPInteract motif name
+# (ignoring case). All DPInteract names are checked in one pass over each
+# Prodoric2 name (see motif_library.NameMatcher).
+matcher = NameMatcher(dpinteract_df['motif'])
+redundant = matcher.contains_any_of(prodoric2_df.iloc[:, 1])
+
+# Add the motifs of every Prodoric2 motif that isn't redundant to the
+# 'not redundant' MEME file.
+not_redundant_motifs = [motif for i in range(len(file_motifs))
+                        if not redundant[i] and file_motifs[i] for motif in file_motifs[i]]
+
+# Write a MEME file containing the motifs that aren't redundant.
+write_meme(not_redundant_motifs, "prodoric2_not_redundant.meme")
+
+print(str(len(all_motifs)) + " motifs, " + str(len(not_redundant_motifs)) + " not redundant")
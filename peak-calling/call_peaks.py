@@ -0,0 +1,66 @@
+'''
+    call_peaks.py
+    10/18/2026
+    This program calls peaks from IPOD-HR occupancy (or SNR) tracks, one track per condition,
+    and writes them as called_peaks CSV files for differential_peaks.py.
+    Peaks can be called again at new thresholds without another tool.
+'''
+
+# Tracks can be bedGraph files (contig, start, end, value; can be gzip compressed),
+# NumPy .npy files (one value per position, starting at position 1),
+# or NumPy .npz files (one array per contig).
+# The output files can be used by differential_peaks.py, for example with
+# peaks_folder = '../../peak-calling/called_peaks_*.csv'.
+
+
+# =============================================================================
+# Import packages.
+# =============================================================================
+
+# Import os and sys packages for finding the shared-modules folder.
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'shared-modules'))
+# Import peak_calling module, used for reading tracks and calling peaks.
+from peak_calling import read_track, call_track_peaks
+
+
+# =============================================================================
+# Settings
+# =============================================================================
+
+# Track file for each condition (condition name: file name).
+# Peaks of each condition are written to called_peaks_<condition>.csv.
+tracks = {'rdmWT': 'rdmWT_snr.bedgraph',
+          'rdmStatWT': 'rdmStatWT_snr.bedgraph',
+          'minWT': 'minWT_snr.bedgraph'}
+
+# Name used in the sRNA column of the peak files (for tracks of one sRNA).
+# None uses the contig name, for genome-wide peaks.
+sRNA_name = None
+
+# Minimum signal for a position to be part of a peak.
+threshold = 1.0
+# The signal is the mean of this many positions around each position
+# (1 uses each position's own value).
+window = 1
+# Peaks less than or equal to this many positions apart are joined.
+max_gap = 0
+# Minimum length of a peak (in nucleotides).
+min_length = 20
+# SNR of each peak: 'max' or 'mean' of its values.
+peak_snr = 'max'
+
+
+# =============================================================================
+# Call peaks for each condition.
+# =============================================================================
+
+for condition, track_file in tracks.items():
+    # One array of values per contig.
+    track = read_track(track_file)
+    # Peaks with columns sRNA, sRNA_Peak, L_Coord, R_Coord, LastSNR, Contig.
+    peaks = call_track_peaks(track, threshold, name=sRNA_name, min_length=min_length,
+                             max_gap=max_gap, window=window, snr=peak_snr)
+    peaks.to_csv("called_peaks_" + condition + ".csv", index=False)
+    print(condition + ": " + str(len(peaks.index)) + " peaks")
@@ -7,95 +7,133 @@
 
 # Imports Pandas package, used for data analysis (Excel)
 import pandas as pd
+# Imports numpy for working with whole columns of coordinates at once
+import numpy as np
+# Imports os and sys for finding the shared-modules folder
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'shared-modules'))
+# Imports genome module, used for loading the genome and extracting sequences
+from genome import load_genome, Genome, FaiRecord
+
+
+# =============================================================================
+# Settings
+# =============================================================================
+
+# Excel file with the 'Input' sheet of windows to extract
+# If the sheet has a 'Contig' column, each window is read from that record of
+# the genome file (for genomes with plasmids or several contigs). Otherwise
+# windows are read from the first record.
+input_file_name = 'example_extraction.xlsx'
+# FASTA file that contains the genome (every record is indexed by name)
+# It can also be gzip or bgzip compressed
+genome_file_name = 'ecoligenome_MKM.txt'
+# Genome files with everything on one line (the genome's name, then the whole
+# sequence) are also read, like the first version of this program did: the
+# sequence starts after this many characters of the line.
+single_line_prefix = 14
+
+# Where the extracted sequences go:
+# 'excel' - adds an 'Output' sheet to the input Excel file
+# 'fasta' - streams one FASTA record per window to output_file_name
+# 'tsv' - streams the input columns plus 'Seq' to output_file_name (tab-separated)
+# Use 'fasta' or 'tsv' for tens of thousands of windows.
+output_format = 'excel'
+output_file_name = 'extracted_sequences.fasta'
+
+# Number of windows extracted at a time when streaming to FASTA/TSV
+chunk_size = 10000
+
+
+# =============================================================================
+# Functions
+# =============================================================================
+
+# Reads the genome file: a FASTA file (see genome.py), or a file with the whole
+# genome on one line after a single_line_prefix-character name
+def read_genome(file_name):
+    with open(file_name, 'rb') as f:
+        first_line = f.readline()
+        # FASTA files have sequence lines after the first line
+        if first_line[:2] == b'\x1f\x8b' or f.read(1 << 16).strip():
+            return load_genome(file_name)
+
+    seq = first_line.rstrip(b'\r\n')[single_line_prefix:]
+    name = first_line.split(None, 1)[0].lstrip(b'>').decode('ascii')
+    record = FaiRecord(name, len(seq), single_line_prefix, len(seq), len(first_line))
+    return Genome([record], seq, [0])
+
+# Converts the UTR_Start, Transcript_Length and Orientation columns into 1-based
+# left and right genome coordinates for every window at once
+def window_coordinates(windows):
+    UTR_start = windows['UTR_Start'].to_numpy(dtype=np.int64)
+    length = windows['Transcript_Length'].to_numpy(dtype=np.int64)
+    rev = (windows['Orientation'] == 'rev').to_numpy()
+
+    # 'fwd' windows are the length nucleotides after UTR_start,
+    # 'rev' windows are the length nucleotides up to and including UTR_start
+    left = np.where(rev, UTR_start - length + 1, UTR_start + 1)
+    right = np.where(rev, UTR_start, UTR_start + length)
+    return left, right, rev
+
+# Extracts the sequences of all windows in one batch from the loaded genome
+# 'rev' windows are read from the other strand (reverse complemented)
+def extract_windows(genome, windows):
+    left, right, rev = window_coordinates(windows)
+    contigs = windows['Contig'] if 'Contig' in windows.columns else None
+    return genome.fetch_many(left, right, contigs, np.where(rev, 'R', 'F'))
+
+# Extracts windows chunk_size rows at a time and writes each chunk to the
+# output file as soon as it is extracted, so only one chunk is in memory
+# Each chunk is written with whole-column operations, not row by row
+def stream_windows(genome, windows, out_file, file_format):
+    for chunk_start in range(0, windows.shape[0], chunk_size):
+        chunk = windows.iloc[chunk_start:chunk_start + chunk_size]
+        seqs = pd.Series(extract_windows(genome, chunk), index=chunk.index, dtype=object)
+
+        if file_format == 'fasta':
+            # Names each record by its row, start and orientation
+            names = (chunk.index.astype(str).to_series(index=chunk.index) + '_' +
+                     chunk['UTR_Start'].astype(str) + '_' + chunk['Orientation'].astype(str))
+            out_file.write(''.join('>' + names + '\n' + seqs + '\n'))
+        else:
+            # Input columns plus 'Seq', with the header line before the first chunk
+            chunk.assign(Seq=seqs).to_csv(out_file, sep='\t', index=False,
+                                          header=(chunk_start == 0))
+
+
+# =============================================================================
+# Extract sequences
+# =============================================================================
 
 # Reads in Excel file given file name
-file = pd.ExcelFile('example_extraction.xlsx')
-file.sheet_names
+file = pd.ExcelFile(input_file_name)
 
 # Parses sheet into DataFrame
 extract = file.parse('Input')
 
-# Creates new seqColumn for the sequences we are extracting
-seqColumn = 'Seq'
-extract[seqColumn] = 0
-
-# Loops through each row in extract DataFrame
-for i in range(extract.shape[0]):    #for each line
-    
-    # Reads in genome from file
-    genomeFile = open("ecoligenome_MKM.txt","r")
-
-    # Sets orientation as 'fwd' or 'rev' based on what is in the 'Orientation' column
-    orientation = extract.loc[i]['Orientation']
-    # Sets start and length of sequence
-    UTR_start = extract.loc[i]['UTR_Start']
-    length = extract.loc[i]['Transcript_Length']
-        
-    genome = ""
-    position = 0
-    location = 0
-    linecount = 0
-    seq = ""
-    revcomp = ""
-    revseq = ""
-        
-    for raw_line in genomeFile:
-        line = raw_line.rstrip("\r\n")
-    
-        if linecount == 0:
-            name = line.split(' ',1)[0] # Save the name of the genome
-            for char in line:
-                # If position > (len(name)+1): 
-                if position > 13:
-                    genome = genome + char
-                    location +=1
-                else:
-                    genome = genome
-                position+=1
-        linecount += 1
-    
-        if linecount > 0:
-            for char in line:
-                genome = genome + char
-                location +=1
-        linecount += 1
-    file.close()
-    
-    # Complementary bases for reverse sequences
-    tcomp = "A"
-    ccomp = "G"
-    acomp = "T"
-    gcomp = "C"
-
-    # If reverse orientation, flips sequence and replaces with complementary base
-    if orientation == "rev":
-        seq = genome[(UTR_start-length):UTR_start]
-        revseq = seq[::-1]
-        for nuc in revseq:
-            if nuc == "A":
-                revcomp = revcomp + acomp
-            if nuc == "T":
-                revcomp= revcomp + tcomp
-            if nuc == "C":
-                revcomp = revcomp + ccomp
-            if nuc == "G":
-                revcomp= revcomp + gcomp
-
-        # Adds revcomp to 'Seq' column
-        extract.loc[i, seqColumn] = revcomp
-            
-    else:
-        # Adds fwd sequence to 'Seq' column
-        extract.loc[i, seqColumn] = genome[UTR_start:(UTR_start+length)]
-                    
-# Exports DataFrame back to original Excel file, adding a new 'Output' sheet
-from openpyxl import load_workbook
-
-book = load_workbook('example_extraction.xlsx')
-writer = pd.ExcelWriter('example_extraction.xlsx', engine='openpyxl') 
-writer.book = book
-writer.sheets = dict((ws.title, ws) for ws in book.worksheets)
-
-extract.to_excel(writer, "Output")
-
-writer.save()
+# Reads in genome from file once, for all rows
+genome = read_genome(genome_file_name)
+
+if output_format == 'excel':
+    # Creates new seqColumn for the sequences we are extracting
+    seqColumn = 'Seq'
+    extract[seqColumn] = extract_windows(genome, extract)
+
+    # Exports DataFrame back to original Excel file, adding a new 'Output' sheet
+    from openpyxl import load_workbook
+
+    book = load_workbook(input_file_name)
+    writer = pd.ExcelWriter(input_file_name, engine='openpyxl')
+    writer.book = book
+    writer.sheets = dict((ws.title, ws) for ws in book.worksheets)
+
+    extract.to_excel(writer, "Output")
+
+    writer.save()
+
+else:
+    # Streams sequences to a FASTA or TSV file
+    with open(output_file_name, 'w') as out_file:
+        stream_windows(genome, extract, out_file, output_format)
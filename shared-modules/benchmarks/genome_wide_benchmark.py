@@ -0,0 +1,170 @@
+'''
+    genome_wide_benchmark.py
+    10/18/2026
+    This program measures the throughput of genome-wide mode (genome_wide.py)
+    on synthetic data, for checking the throughput targets in genome_wide.py.
+    It writes a random genome and random peak files for 3 conditions, runs
+    the same steps as differential_peaks.py in genome-wide mode, and prints
+    the peaks per second of each step.
+'''
+
+# Run from any folder: python shared-modules/benchmarks/genome_wide_benchmark.py
+# The synthetic files are written to a temporary folder, which is removed at
+# the end. Writing them and loading the genome aren't timed.
+
+
+# =============================================================================
+# Import packages.
+# =============================================================================
+
+# Import os and sys packages for finding the shared-modules folder.
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+# Import shutil, tempfile and time for the benchmark folder and timing.
+import shutil
+import tempfile
+import time
+# Import Pandas and numpy for synthetic peak files.
+import pandas as pd
+import numpy as np
+# Import genome, genome_wide and extract modules, the code being measured.
+from genome import load_genome
+from genome_wide import read_interval_file, merge_intervals, finalize_intervals, call_intervals
+from extract import write_fasta
+
+
+# =============================================================================
+# Settings
+# =============================================================================
+
+# Number of peaks in each condition's file (one run for each number).
+peaks_per_condition = [100000, 1000000]
+
+# Conditions (the first is the reference condition).
+conditions = ['rdmWT', 'rdmStatWT', 'minWT']
+
+# Genome: number of contigs and length of each contig.
+contig_count = 20
+contig_length = 25000000
+
+# Peak widths are random, between these numbers of nucleotides.
+min_width = 50
+max_width = 300
+
+# Share of peaks that are also in the other conditions (moved by up to 20
+# nucleotides); the rest are at random positions.
+shared = 0.8
+
+# Merging settings, as in differential_peaks.py.
+n = 50
+min_SNR = 0.7
+workers = 1
+
+# Random seed, so every run uses the same files.
+seed = 0
+
+
+# =============================================================================
+# Synthetic files
+# =============================================================================
+
+# Function for writing a random genome FASTA file (60 nucleotides per line).
+def write_genome(path, rng):
+    with open(path, 'w') as f:
+        for k in range(contig_count):
+            f.write('>contig' + str(k + 1) + '\n')
+            sequence = np.frombuffer(b'ACGT', dtype=np.uint8)[rng.integers(0, 4, contig_length)]
+            lines = sequence[:contig_length // 60 * 60].reshape(-1, 60)
+            lines = np.hstack([lines, np.full((len(lines), 1), ord('\n'), dtype=np.uint8)])
+            f.write(lines.tobytes().decode('ascii'))
+            if contig_length % 60:
+                f.write(sequence[contig_length // 60 * 60:].tobytes().decode('ascii') + '\n')
+
+
+# Function for random peaks: contigs, lefts and rights of count peaks (at
+# least 20 nucleotides from the contig ends, so moved peaks stay inside).
+def random_peaks(rng, count):
+    contigs = rng.integers(0, contig_count, count)
+    lefts = rng.integers(21, contig_length - max_width - 20, count)
+    return contigs, lefts, lefts + rng.integers(min_width, max_width, count)
+
+
+# Function for writing the peak file of each condition (sorted by contig
+# and left coordinate, like called_peaks files). Returns the file names.
+def write_peak_files(folder, rng, count):
+    base = random_peaks(rng, count)
+    files = []
+    for name in conditions:
+        # Shared peaks, moved a little, and new peaks.
+        keep = rng.random(count) < shared
+        shift = rng.integers(-20, 21, count)
+        new = random_peaks(rng, count)
+        contigs = np.where(keep, base[0], new[0])
+        lefts = np.where(keep, base[1] + shift, new[1])
+        rights = np.where(keep, base[2] + shift, new[2])
+        order = np.lexsort((lefts, contigs))
+        snrs = np.char.add('SNR__', np.round(rng.uniform(0.3, 3.0, count), 2).astype(str))
+        path = os.path.join(folder, 'called_peaks_' + name + '.csv')
+        pd.DataFrame({'Chrom': np.char.add('contig', (contigs[order] + 1).astype(str)),
+                      'sRNA_Peak': np.arange(1, count + 1),
+                      'L_Coord': lefts[order],
+                      'R_Coord': rights[order],
+                      'LastSNR': snrs}).to_csv(path, index=False)
+        files.append(path)
+    return files
+
+
+# =============================================================================
+# Benchmark
+# =============================================================================
+
+# Function for running genome-wide mode on the files (with the genome
+# already loaded) and printing the time and peaks per second of every step.
+def run(genome, peak_files, out_file):
+    times = []
+    start = time.perf_counter()
+    condition_DFs = [read_interval_file(f, genome.contig_names()[0]) for f in peak_files]
+    peaks = sum(len(df.index) for df in condition_DFs)
+    times.append(('reading peak files', peaks, time.perf_counter() - start))
+
+    start = time.perf_counter()
+    merged = merge_intervals(condition_DFs, conditions, n, workers=workers)
+    times.append(('merging', peaks, time.perf_counter() - start))
+
+    start = time.perf_counter()
+    merged = finalize_intervals(merged, len(conditions), genome.contig_names())
+    merged, snr_ratios = call_intervals(merged, conditions, min_SNR, workers)
+    times.append(('finishing and calling', len(merged.index), time.perf_counter() - start))
+
+    start = time.perf_counter()
+    differential = merged[merged['Differential peak?'] == 1]
+    write_fasta(genome, pd.DataFrame({'name': differential['Peak'],
+                                      'contig': differential['Contig'].astype(str),
+                                      'left': differential['Merged L'],
+                                      'right': differential['Merged R'],
+                                      'strand': 'F'}), out_file)
+    times.append(('extracting sequences', len(differential.index), time.perf_counter() - start))
+
+    for step, count, seconds in times:
+        print('  {:<24}{:>8.2f} s {:>12,.0f} peaks/s ({:,} peaks)'.format(step, seconds,
+                                                                   count / seconds, count))
+
+
+folder = tempfile.mkdtemp()
+try:
+    rng = np.random.default_rng(seed)
+    genome_file = os.path.join(folder, 'genome.fna')
+    write_genome(genome_file, rng)
+    # Loading the genome isn't timed (later runs of differential_peaks.py
+    # memory-map its binary cache).
+    genome = load_genome(genome_file)
+
+    print(str(contig_count) + ' contigs of ' + format(contig_length, ',') + ' nucleotides, '
+          + str(len(conditions)) + ' conditions, n = ' + str(n) + ', workers = ' + str(workers))
+    for count in peaks_per_condition:
+        print(format(count, ',') + ' peaks per condition:')
+        run(genome, write_peak_files(folder, rng, count),
+            os.path.join(folder, 'differential_peaks.fasta'))
+finally:
+    shutil.rmtree(folder)
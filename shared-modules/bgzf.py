@@ -0,0 +1,269 @@
+"""
+bgzf.py
+    10/18/2026
+    This module reads genomes compressed with bgzip (BGZF, the blocked gzip
+    format from samtools/htslib). A BGZF file is a series of small gzip blocks
+    (64 KB of text each), and its .gzi index records where every block starts
+    in the compressed and uncompressed file. Together with the .fai index, a
+    sequence can be extracted by decompressing only the blocks that hold it,
+    instead of the whole genome.
+
+    The .fai and .gzi indexes are saved next to the file, with a small
+    <file>.index.json recording the file's size, modification time and
+    SHA-256 hash (like the genome cache in genome.py). If the file changes,
+    the indexes are made again instead of reading the wrong positions.
+"""
+
+# Import os, struct and zlib for reading the compressed blocks.
+import os
+# Import json for the record of which file the indexes were made from.
+import json
+import struct
+import zlib
+# Import gzip for decompressing the whole file once when there is no .fai index.
+import gzip
+# Import numpy for looking up blocks for many positions at once.
+import numpy as np
+# Import genome module for the .fai index and the shared fetch functions.
+from genome import GenomeBase, check_records, read_fai, write_fai, _file_hash, _write_atomic
+
+
+# Change this when the index record changes, so old indexes are made again.
+INDEX_VERSION = 1
+
+
+# =============================================================================
+# Detecting compressed files
+# =============================================================================
+
+# Function for checking if a file is gzip compressed (plain gzip or BGZF).
+def is_gzip(path):
+    with open(path, 'rb') as f:
+        return f.read(2) == b'\x1f\x8b'
+
+
+# Function for checking if a file is BGZF compressed. BGZF blocks are gzip
+# members with an extra header field 'BC' that holds the block size.
+def is_bgzf(path):
+    with open(path, 'rb') as f:
+        header = f.read(18)
+    return (len(header) == 18 and header[:4] == b'\x1f\x8b\x08\x04' and
+            header[12:14] == b'BC')
+
+
+# =============================================================================
+# .gzi block index
+# =============================================================================
+
+# Function for reading a .gzi index. The file is a little-endian uint64 count
+# followed by (compressed offset, uncompressed offset) pairs, one for every
+# block except the first one (which starts at 0, 0).
+def read_gzi(gzi_path):
+    with open(gzi_path, 'rb') as f:
+        data = f.read()
+    count = struct.unpack('<Q', data[:8])[0]
+    pairs = np.frombuffer(data, dtype='<u8', count=2 * count, offset=8).reshape(-1, 2)
+    compressed = np.concatenate(([0], pairs[:, 0])).astype(np.int64)
+    uncompressed = np.concatenate(([0], pairs[:, 1])).astype(np.int64)
+    return compressed, uncompressed
+
+
+# Function for writing a .gzi index (see read_gzi).
+def write_gzi(gzi_path, compressed, uncompressed):
+    pairs = np.column_stack((compressed[1:], uncompressed[1:])).astype('<u8')
+    with open(gzi_path, 'wb') as f:
+        f.write(struct.pack('<Q', len(pairs)))
+        f.write(pairs.tobytes())
+
+
+# Function for building the block index of a BGZF file by reading only the
+# block headers and footers. Each header holds the block size, and the last
+# 4 bytes of each block hold its uncompressed size, so nothing is decompressed.
+def build_gzi(bgzf_path):
+    compressed = []
+    uncompressed = []
+    c_offset = 0
+    u_offset = 0
+    with open(bgzf_path, 'rb') as f:
+        while True:
+            header = f.read(18)
+            if len(header) < 18:
+                break
+            if header[12:14] != b'BC':
+                raise ValueError("'" + bgzf_path + "' is not a BGZF file")
+            block_size = struct.unpack('<H', header[16:18])[0] + 1
+            f.seek(c_offset + block_size - 4)
+            block_length = struct.unpack('<I', f.read(4))[0]
+            # The empty block at the end of the file isn't indexed.
+            if block_length > 0:
+                compressed.append(c_offset)
+                uncompressed.append(u_offset)
+            c_offset += block_size
+            u_offset += block_length
+            f.seek(c_offset)
+    return np.array(compressed, dtype=np.int64), np.array(uncompressed, dtype=np.int64)
+
+
+# =============================================================================
+# Reading blocks
+# =============================================================================
+
+# Class for reading bytes at uncompressed offsets of a BGZF file.
+# Recently used blocks are kept, so reading nearby positions one after another
+# (for example intervals sorted by coordinate) decompresses each block once.
+# blocks is the (compressed, uncompressed) block index (see read_gzi);
+# without it, the block index is made from the file.
+class BgzfReader:
+
+    def __init__(self, bgzf_path, blocks=None, cached_blocks=64):
+        self.path = bgzf_path
+        if blocks is None:
+            blocks = build_gzi(bgzf_path)
+        self.compressed, self.uncompressed = blocks
+        self.file = open(bgzf_path, 'rb')
+        # Process that opened the file. Processes forked from it (see
+        # parallel.py) open their own copy, so they don't move each other's
+        # file position.
+        self.pid = os.getpid()
+        # Decompressed blocks by block number, oldest first.
+        self.blocks = {}
+        self.cached_blocks = cached_blocks
+        # Number of blocks decompressed so far.
+        self.decompressed = 0
+
+    # Function for decompressing one block (or getting it from the cache).
+    def block(self, number):
+        if number in self.blocks:
+            return self.blocks[number]
+        if self.pid != os.getpid():
+            self.file = open(self.path, 'rb')
+            self.pid = os.getpid()
+
+        self.file.seek(self.compressed[number])
+        header = self.file.read(18)
+        block_size = struct.unpack('<H', header[16:18])[0] + 1
+        extra_length = struct.unpack('<H', header[10:12])[0]
+        # Compressed data is between the header (12 bytes + extra field) and the
+        # 8-byte footer.
+        data = header + self.file.read(block_size - 18)
+        block = np.frombuffer(zlib.decompress(data[12 + extra_length:-8], -15), dtype=np.uint8)
+        self.decompressed += 1
+
+        if len(self.blocks) >= self.cached_blocks:
+            del self.blocks[next(iter(self.blocks))]
+        self.blocks[number] = block
+        return block
+
+    # Function for getting the bytes at an array of uncompressed offsets.
+    # Only the blocks that hold those offsets are decompressed.
+    def read_at(self, offsets):
+        offsets = np.asarray(offsets, dtype=np.int64)
+        out = np.empty(len(offsets), dtype=np.uint8)
+        if len(offsets) == 0:
+            return out
+
+        numbers = np.searchsorted(self.uncompressed, offsets, side='right') - 1
+        # Group offsets by block so each block is handled once.
+        order = np.argsort(numbers, kind='stable')
+        sorted_numbers = numbers[order]
+        group_starts = np.flatnonzero(np.diff(np.concatenate(([-1], sorted_numbers))))
+        group_ends = np.append(group_starts[1:], len(order))
+        for a, b in zip(group_starts, group_ends):
+            number = int(sorted_numbers[a])
+            rows = order[a:b]
+            out[rows] = self.block(number)[offsets[rows] - self.uncompressed[number]]
+        return out
+
+    def close(self):
+        self.file.close()
+
+
+# =============================================================================
+# BGZF genome
+# =============================================================================
+
+# Class for a genome that stays compressed on disk. It has the same fetch(),
+# fetch_many() and fetch_intervals() functions as genome.Genome, but each
+# call only decompresses the blocks it needs.
+class BgzfGenome(GenomeBase):
+
+    def __init__(self, records, reader):
+        starts = np.concatenate(([0], np.cumsum([record.length for record in records])[:-1]))
+        GenomeBase.__init__(self, records, [int(x) for x in starts])
+        self.reader = reader
+        # Arrays of .fai fields for converting many positions at once.
+        self._offsets = np.array([record.offset for record in records], dtype=np.int64)
+        self._line_bases = np.array([max(record.line_bases, 1) for record in records], dtype=np.int64)
+        self._line_widths = np.array([record.line_width for record in records], dtype=np.int64)
+
+    # Function for getting the nucleotides at the given 0-based positions.
+    # Positions are converted to uncompressed file offsets with the .fai index.
+    def _gather(self, positions):
+        numbers = np.searchsorted(self._starts, positions, side='right') - 1
+        within = positions - self._starts[numbers]
+        line, column = np.divmod(within, self._line_bases[numbers])
+        offsets = self._offsets[numbers] + line * self._line_widths[numbers] + column
+        return self.reader.read_at(offsets)
+
+
+# Function for checking that the .fai and .gzi indexes of a BGZF file were
+# made from the file as it is now. stat is the file's os.stat().
+# Indexes without an index record (for example made by samtools faidx) are
+# used if they aren't older than the file.
+def _indexes_match(bgzf_path, stat):
+    index_paths = [bgzf_path + '.fai', bgzf_path + '.gzi']
+    if not all(os.path.exists(path) for path in index_paths):
+        return False
+    try:
+        with open(bgzf_path + '.index.json') as f:
+            index = json.load(f)
+    except OSError:
+        return all(os.path.getmtime(path) >= stat.st_mtime for path in index_paths)
+    except ValueError:
+        return False
+
+    if index.get('version') != INDEX_VERSION or index.get('size') != stat.st_size:
+        return False
+    if index.get('mtime') == stat.st_mtime:
+        return True
+    # Same size but different modification time: check the contents.
+    return _file_hash(bgzf_path) == index.get('sha256')
+
+
+# Function for saving the index record of a BGZF file (see _indexes_match).
+def _write_index_record(bgzf_path, stat):
+    _write_atomic(bgzf_path + '.index.json',
+                  json.dumps({'version': INDEX_VERSION,
+                              'size': stat.st_size,
+                              'mtime': stat.st_mtime,
+                              'sha256': _file_hash(bgzf_path)}).encode('ascii'))
+
+
+# Function for opening a BGZF compressed FASTA file.
+# Uses <file>.fai and <file>.gzi if they match the file (for example made by
+# samtools faidx). Otherwise they are made again and saved next to the file.
+def open_bgzf_genome(bgzf_path):
+    stat = os.stat(bgzf_path)
+    if _indexes_match(bgzf_path, stat):
+        records = read_fai(bgzf_path + '.fai')
+        blocks = read_gzi(bgzf_path + '.gzi')
+        # Indexes made elsewhere get an index record, so later changes to
+        # the file are found.
+        if not os.path.exists(bgzf_path + '.index.json'):
+            try:
+                _write_index_record(bgzf_path, stat)
+            except OSError:
+                pass
+    else:
+        # The .fai index needs the whole text once.
+        with gzip.open(bgzf_path, 'rb') as f:
+            records = check_records(bgzf_path, f.read())
+        blocks = build_gzi(bgzf_path)
+        # Indexes are only for speed, so a folder that can't be written is skipped.
+        try:
+            write_fai(records, bgzf_path + '.fai')
+            write_gzi(bgzf_path + '.gzi', *blocks)
+            _write_index_record(bgzf_path, stat)
+        except OSError:
+            pass
+    return BgzfGenome(records, BgzfReader(bgzf_path, blocks))
@@ -0,0 +1,171 @@
+"""
+clusters.py
+    10/18/2026
+    This module groups overlapping peaks of all conditions into consensus
+    clusters, as an alternative to the row-by-row merging in peaks.py.
+    Two peaks of the same sRNA are linked if they overlap by at least n
+    nucleotides (and optionally by at least a fraction of both of their
+    lengths), and clusters are the groups of peaks that are linked directly
+    or through other peaks (transitive linkage). Unlike the first-match rule,
+    a peak that overlaps two existing groups joins them into one cluster, and
+    the result doesn't depend on the order of conditions or files.
+
+    Peaks are swept in order of left coordinate, keeping a heap of the peaks
+    that still reach far enough right to overlap the next one, and linked
+    peaks are joined with union-find. With only the n rule every peak is
+    joined to one peak of the heap, so clustering takes O(N log N). With a
+    fraction rule each peak is compared to the whole heap (the peaks that
+    overlap its start, usually a few per condition).
+
+    Cluster IDs are numbered by sRNA (alphabetical) and then by the left
+    coordinate of their first peak, so they only depend on the set of peaks.
+"""
+
+# Import heapq for the sweep.
+import heapq
+# Import Pandas and numpy for peak tables.
+import pandas as pd
+import numpy as np
+
+
+# =============================================================================
+# Union-find
+# =============================================================================
+
+# Class for keeping track of which items are in the same group, joining
+# groups one pair at a time.
+class UnionFind:
+
+    def __init__(self, size):
+        self.parent = list(range(size))
+        self.size = [1] * size
+
+    # Function for finding the item that represents an item's group.
+    def find(self, x):
+        parent = self.parent
+        while parent[x] != x:
+            # Point to the grandparent on the way (path halving).
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    # Function for joining the groups of two items. The smaller group joins
+    # the larger one.
+    def union(self, a, b):
+        a = self.find(a)
+        b = self.find(b)
+        if a == b:
+            return
+        if self.size[a] < self.size[b]:
+            a, b = b, a
+        self.parent[b] = a
+        self.size[a] += self.size[b]
+
+
+# =============================================================================
+# Clustering
+# =============================================================================
+
+# Function for clustering peaks. sRNAs, lefts and rights are columns with one
+# entry per peak (peaks of all conditions together). Peaks are linked if they
+# have the same sRNA and overlap by at least n nucleotides (at least 1), and,
+# if min_fraction is given, the overlap is at least min_fraction of the
+# length of both peaks. Returns an array with the cluster ID of every peak.
+def cluster_peaks(sRNAs, lefts, rights, n=1, min_fraction=None):
+    codes = np.unique(np.asarray(sRNAs, dtype=str), return_inverse=True)[1]
+    codes = codes.ravel()
+    lefts = np.asarray(lefts, dtype=np.int64)
+    rights = np.asarray(rights, dtype=np.int64)
+    n = max(int(n), 1)
+
+    order = np.lexsort((rights, lefts, codes))
+    groups = UnionFind(len(order))
+
+    heap = []
+    current = None
+    for p, code, left, right in zip(order.tolist(), codes[order].tolist(),
+                                    lefts[order].tolist(), rights[order].tolist()):
+        # Start over for every sRNA.
+        if code != current:
+            heap = []
+            current = code
+
+        # Peaks that end before left + n - 1 can't overlap this peak (or any
+        # later one) by n nucleotides.
+        while heap and heap[0][0] < left + n - 1:
+            heapq.heappop(heap)
+        # Peaks shorter than n can't overlap anything by n nucleotides.
+        if right - left + 1 < n:
+            continue
+
+        if min_fraction is None:
+            # Every peak in the heap overlaps this one by n, and the heap is
+            # already one cluster, so joining one of them is enough.
+            if heap:
+                groups.union(p, heap[0][1])
+        else:
+            length = right - left + 1
+            for other_right, other, other_length in heap:
+                overlap = min(other_right, right) - left + 1
+                if overlap >= min_fraction * length and overlap >= min_fraction * other_length:
+                    groups.union(p, other)
+
+        heapq.heappush(heap, (right, p, right - left + 1))
+
+    # Number clusters in sorted order of their first peak.
+    roots = np.array([groups.find(p) for p in range(len(order))], dtype=np.int64)
+    first = np.full(len(order), -1, dtype=np.int64)
+    ids = np.empty(len(order), dtype=np.int64)
+    count = 0
+    for p in order.tolist():
+        root = roots[p]
+        if first[root] < 0:
+            first[root] = count
+            count += 1
+        ids[p] = first[root]
+    return ids
+
+
+# Function for building a merged DataFrame (like peaks.PeakMerger.table())
+# with one row per consensus cluster. conditions is a list of (sRNAs, lefts,
+# rights, snrs) columns, one per condition, and names are the condition
+# names. If a cluster has several peaks of one condition, the last one in
+# the file is kept (its SNR only if it has one), like peaks.py does.
+# Rows are grouped by sRNA, in order of the sRNA's first peak (first
+# condition first), and ordered by cluster ID within each sRNA. sRNAs that
+# only have peaks in later conditions are kept.
+# The last column, Cluster, is each row's cluster ID (see cluster_peaks()),
+# which only depends on the set of peaks, so clusters can be matched between
+# runs.
+def cluster_table(conditions, names, n=1, min_fraction=None):
+    peaks = []
+    for k, (sRNAs, lefts, rights, snrs) in enumerate(conditions):
+        sRNAs = np.asarray(sRNAs, dtype=str)
+        peaks.append(pd.DataFrame({
+            'sRNA': sRNAs, 'condition': k, 'position': np.arange(len(sRNAs)),
+            'L': np.asarray(lefts, dtype=np.int64), 'R': np.asarray(rights, dtype=np.int64),
+            'SNR': np.full(len(sRNAs), np.nan) if snrs is None else np.asarray(snrs, dtype=np.float64)}))
+    peaks = pd.concat(peaks, ignore_index=True)
+    peaks['cluster'] = cluster_peaks(peaks['sRNA'], peaks['L'], peaks['R'], n, min_fraction)
+
+    # Row order: sRNAs in order of first peak, then clusters by ID.
+    sRNA_order = pd.unique(peaks['sRNA'])
+    sRNA_rank = pd.Series(np.arange(len(sRNA_order)), index=sRNA_order)
+    clusters = peaks.groupby('cluster')['sRNA'].first().to_frame()
+    clusters['rank'] = sRNA_rank[clusters['sRNA']].to_numpy()
+    clusters = clusters.reset_index().sort_values(['rank', 'cluster'], kind='stable')
+    row_of_cluster = pd.Series(np.arange(len(clusters.index)), index=clusters['cluster'].to_numpy())
+
+    columns = {'sRNA': clusters['sRNA'].to_numpy(dtype=object),
+               'sRNA peak': np.full(len(clusters.index), np.nan, dtype=object)}
+    for k, name in enumerate(names):
+        # Last peak of this condition in every cluster (last SNR that isn't
+        # empty, since last() skips NaN).
+        cells = peaks[peaks['condition'] == k].sort_values('position').groupby('cluster')[['L', 'R', 'SNR']].last()
+        rows = row_of_cluster[cells.index].to_numpy()
+        for column in ['L', 'R', 'SNR']:
+            values = np.full(len(clusters.index), np.nan)
+            values[rows] = cells[column].to_numpy(dtype=np.float64)
+            columns[name + ' ' + column] = values
+    columns['Cluster'] = clusters['cluster'].to_numpy()
+    return pd.DataFrame(columns)
@@ -0,0 +1,89 @@
+"""
+conditions.py
+    10/18/2026
+    This module finds the called_peaks CSV files for each condition of
+    differential_peaks.py and gives each condition a name for its columns.
+    Files can be listed by hand, found in a folder or with a glob pattern, or
+    listed in a condition manifest. A manifest is a CSV (or Excel) file with
+    a 'File' column and a 'Condition' column, one row per condition, in the
+    order the conditions should be compared (the first one is the reference
+    condition). File names in a manifest can be relative to the manifest.
+
+    Without a manifest, a condition's name is the part of its file name that
+    differs between files, for example 'rdm_glu' and 'min_glu' for
+    called_peakswt_m9_rdm_glu.csv and called_peakswt_m9_min_glu.csv.
+"""
+
+# Import os and glob for finding files.
+import os
+import glob
+# Import Pandas for reading manifests.
+import pandas as pd
+
+
+# Function for finding the name of every condition from its file name.
+# Removes the beginning that all file names share, and the end that they
+# share (from a '_' or the file extension on), so names are never cut in the
+# middle of a word at the end.
+def condition_names(files):
+    stems = [os.path.basename(f) for f in files]
+    if len(stems) == 1:
+        return [os.path.splitext(stems[0])[0]]
+
+    prefix = os.path.commonprefix(stems)
+    suffix = os.path.commonprefix([x[::-1] for x in stems])[::-1]
+    # Only remove the shared end from a '_' or '.' on.
+    cut = [i for i, x in enumerate(suffix) if x in '_.']
+    suffix = suffix[cut[0]:] if cut else ''
+
+    names = []
+    for x in stems:
+        # The shared beginning and end can overlap in short names.
+        start = min(len(prefix), len(x) - len(suffix))
+        names.append(x[start:len(x) - len(suffix)])
+    if '' in names or len(set(names)) < len(names):
+        names = [os.path.splitext(x)[0] for x in stems]
+    return names
+
+
+# Function for finding the called_peaks CSV files in a folder (all .csv files)
+# or matching a glob pattern, in alphabetical order.
+def find_peak_files(peaks_folder):
+    if os.path.isdir(peaks_folder):
+        pattern = os.path.join(peaks_folder, '*.csv')
+    else:
+        pattern = peaks_folder
+    files = sorted(glob.glob(pattern))
+    if not files:
+        raise FileNotFoundError("No called_peaks files found for '" + peaks_folder + "'")
+    return files
+
+
+# Function for reading a condition manifest. Returns lists of files and
+# condition names, in manifest order.
+def read_manifest(manifest_file):
+    if manifest_file.lower().endswith(('.xlsx', '.xls')):
+        manifest = pd.read_excel(manifest_file)
+    else:
+        manifest = pd.read_csv(manifest_file)
+    if 'File' not in manifest.columns or 'Condition' not in manifest.columns:
+        raise ValueError("Manifest '" + manifest_file + "' needs 'File' and 'Condition' columns")
+
+    folder = os.path.dirname(os.path.abspath(manifest_file))
+    files = [f if os.path.isabs(f) else os.path.join(folder, f)
+             for f in manifest['File'].astype(str).str.strip()]
+    names = list(manifest['Condition'].astype(str).str.strip())
+    if len(set(names)) < len(names):
+        raise ValueError("Manifest '" + manifest_file + "' has the same condition name twice")
+    return files, names
+
+
+# Function for getting the files and names of all conditions.
+# A manifest is used if there is one, then peaks_folder (folder or glob
+# pattern), and otherwise the list of files.
+def list_conditions(files=None, peaks_folder=None, manifest_file=None):
+    if manifest_file:
+        return read_manifest(manifest_file)
+    if peaks_folder:
+        files = find_peak_files(peaks_folder)
+    return list(files), condition_names(files)
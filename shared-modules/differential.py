@@ -0,0 +1,156 @@
+"""
+differential.py
+    10/18/2026
+    This module decides which merged sRNA peaks are differential, for
+    differential_peaks.py. A peak is differential if it is missing (or below
+    the minimum SNR) in some conditions but not all of them, or if the SNRs of
+    two conditions differ by at least a factor of 2.
+
+    The whole table is classified at once: the SNRs of all peaks form a
+    peaks x conditions matrix (NaN where there is no peak or no SNR), and the
+    SNR ratios and differences of every pair of conditions come from
+    broadcasting that matrix against itself. Each row only depends on its own
+    cells, so a table can also be split by sRNA and the parts called in
+    separate processes (see parallel.py).
+
+    sweep_thresholds() finds the differential peaks for many combinations of
+    minimum overlap and minimum SNR in one run, reading the peaks only once.
+"""
+
+# Import Pandas and numpy for the merged DataFrame and SNR matrices.
+import pandas as pd
+import numpy as np
+# Import peaks module for merging peaks in a threshold sweep.
+from peaks import merge_conditions, finalize_merged
+
+
+# Smallest SNR ratio (as |log10(SNR1 / SNR2)|) for a differential peak:
+# one SNR is at least twice as large as the other.
+MIN_LOG_RATIO = np.log10(2)
+
+
+# Function for getting the peaks x conditions matrices of left coordinates
+# and SNRs from a merged DataFrame (columns sRNA, sRNA peak, then L, R and
+# SNR for each condition). Empty cells are NaN.
+def condition_matrices(merged, conditions):
+    columns = merged.iloc[:, 2:2 + 3*conditions].apply(pd.to_numeric, errors='coerce')
+    values = columns.to_numpy(dtype=np.float64).reshape(len(merged.index), conditions, 3)
+    return values[:, :, 0], values[:, :, 2]
+
+
+# Function for getting |log10(SNR1 / SNR2)| and |SNR1 - SNR2| for every pair
+# of conditions (i, j) with i < j. snrs is the peaks x conditions SNR matrix
+# and passing is True for the peaks that count (present, not below the
+# minimum SNR). Returns the pairs and peaks x pairs matrices of ratios and
+# differences, NaN where the pair can't be compared. A ratio also needs both
+# SNRs to be non-zero.
+def pair_ratios(snrs, passing):
+    pairs = list(zip(*np.triu_indices(snrs.shape[1], 1)))
+    first = [i for i, j in pairs]
+    second = [j for i, j in pairs]
+
+    # Every condition against every other condition: peaks x conditions x
+    # conditions, then only the pairs i < j.
+    compared = (passing & ~np.isnan(snrs))[:, :, None] & (passing & ~np.isnan(snrs))[:, None, :]
+    diffs = np.abs(snrs[:, :, None] - snrs[:, None, :])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratios = np.abs(np.log10(snrs[:, :, None] / snrs[:, None, :]))
+    nonzero = (snrs != 0)[:, :, None] & (snrs != 0)[:, None, :]
+
+    diffs = np.where(compared, diffs, np.nan)[:, first, second]
+    ratios = np.where(compared & nonzero, ratios, np.nan)[:, first, second]
+    return pairs, ratios, diffs
+
+
+# Function for the largest value in every row, NaN for rows with no values.
+def _row_max(values):
+    has_value = ~np.isnan(values).all(axis=1)
+    out = np.full(len(values), np.nan)
+    if values.shape[1]:
+        out[has_value] = np.nanmax(values[has_value], axis=1)
+    return out
+
+
+# Function for adding 'Differential peak?', 'Max SNR difference' and
+# 'Max SNR ratio' columns to a merged DataFrame. The DataFrame has columns
+# sRNA, sRNA peak, then L, R and SNR for each condition (names in
+# conditions), and 'Max SNR'. Empty cells are NaN.
+# Returns the new DataFrame (same index) and a DataFrame of the SNR ratio
+# (|log10(SNR1 / SNR2)|) of every pair of conditions, one column per pair.
+def call_differential(merged, conditions, min_SNR):
+    lefts, snrs = condition_matrices(merged, len(conditions))
+    present = ~np.isnan(lefts)
+
+    # Peaks below minimum SNR count as non-existent.
+    with np.errstate(invalid='ignore'):
+        passing = present & ~(snrs < min_SNR)
+
+    # If peak is nonexistent (or has no SNR) in any condition, peak is
+    # differential. Unless peak is nonexistent for all conditions.
+    missing = ~passing | np.isnan(snrs)
+    differential = missing.any(axis=1) & ~(~passing).all(axis=1)
+
+    # If SNR ratio of any two conditions is at least log(2), peak is
+    # differential.
+    pairs, ratios, diffs = pair_ratios(snrs, passing)
+    with np.errstate(invalid='ignore'):
+        differential |= (ratios >= MIN_LOG_RATIO).any(axis=1)
+
+    # If peak is nonexistent (or has no SNR) under any condition, max SNR
+    # difference is max SNR and max SNR ratio is empty. Otherwise they are
+    # the largest difference and ratio of any two conditions.
+    incomplete = (~present | np.isnan(snrs)).any(axis=1)
+    if 'Max SNR' in merged.columns:
+        max_SNR = pd.to_numeric(merged['Max SNR'], errors='coerce').to_numpy(dtype=np.float64)
+    else:
+        max_SNR = np.full(len(merged.index), np.nan)
+    max_diffs = np.where(incomplete, max_SNR, _row_max(diffs))
+    max_ratios = np.where(incomplete, np.nan, _row_max(ratios))
+
+    merged = merged.copy()
+    merged['Differential peak?'] = differential.astype(int)
+    merged['Max SNR difference'] = max_diffs
+    merged['Max SNR ratio'] = max_ratios
+
+    ratio_table = pd.DataFrame(ratios, index=merged.index,
+                               columns=[conditions[i] + ' / ' + conditions[j] for i, j in pairs])
+    return merged, ratio_table
+
+
+# =============================================================================
+# Threshold sweep
+# =============================================================================
+
+# Columns of the sweep summary for every differential peak.
+SWEEP_COLUMNS = ['sRNA', 'sRNA peak', 'Merged L', 'Merged R', 'Max SNR difference', 'Max SNR ratio']
+
+
+# Function for finding the differential peaks for every combination of
+# minimum overlap n (in n_values) and minimum SNR (in min_SNR_values).
+# condition_columns and conditions are as in peaks.merge_conditions(); the
+# peaks are read once and merged once for every n.
+# Returns a long-format DataFrame with one row per differential peak per
+# combination (columns n, min_SNR and SWEEP_COLUMNS), and a DataFrame with
+# the number of merged and differential peaks for every combination.
+def sweep_thresholds(condition_columns, conditions, n_values, min_SNR_values,
+                     match_all_conditions=False, workers=None):
+    calls = []
+    counts = []
+    for n in n_values:
+        merged = merge_conditions(condition_columns, conditions, n, match_all_conditions, workers)
+        merged = finalize_merged(merged, len(conditions))
+
+        for min_SNR in min_SNR_values:
+            called, ratios = call_differential(merged, conditions, min_SNR)
+            called = called.loc[called['Differential peak?'] == 1, SWEEP_COLUMNS]
+            called.insert(0, 'min_SNR', min_SNR)
+            called.insert(0, 'n', n)
+            calls.append(called)
+            counts.append({'n': n, 'min_SNR': min_SNR, 'Merged peaks': len(merged.index),
+                           'Differential peaks': len(called.index)})
+
+    if calls:
+        calls = pd.concat(calls, ignore_index=True)
+    else:
+        calls = pd.DataFrame(columns=['n', 'min_SNR'] + SWEEP_COLUMNS)
+    return calls, pd.DataFrame(counts, columns=['n', 'min_SNR', 'Merged peaks', 'Differential peaks'])
@@ -0,0 +1,68 @@
+"""
+dna.py
+    10/18/2026
+    This module takes reverse complements of DNA sequences using a lookup table,
+    so each sequence is read once (linear time) instead of being rebuilt one
+    nucleotide at a time. IUPAC ambiguity codes (N, R, Y, ...) and lowercase
+    letters are complemented too, instead of being dropped.
+"""
+
+# Import numpy for complementing many sequences at once.
+import numpy as np
+
+
+# =============================================================================
+# Complement tables
+# =============================================================================
+
+# Every IUPAC nucleotide code and its complement.
+# R (A/G) <-> Y (C/T), K (G/T) <-> M (A/C), B (not A) <-> V (not T),
+# D (not C) <-> H (not G). S (C/G), W (A/T) and N are their own complements.
+# U (RNA) is complemented to A. Gaps stay gaps.
+_bases = 'ACGTURYKMBVDHSWN-.'
+_complements = 'TGCAAYRMKVBHDSWN-.'
+_bases = _bases + _bases[:-2].lower()
+_complements = _complements + _complements[:-2].lower()
+
+# Table for str.translate(). Characters not in the table are left unchanged.
+COMPLEMENT = str.maketrans(_bases, _complements)
+
+# Same table for bytes.translate().
+COMPLEMENT_BYTES = bytes.maketrans(_bases.encode('ascii'), _complements.encode('ascii'))
+
+# Same table as a numpy array, for complementing uint8 arrays of ASCII codes.
+COMPLEMENT_LUT = np.frombuffer(COMPLEMENT_BYTES, dtype=np.uint8)
+
+
+# =============================================================================
+# Reverse complement
+# =============================================================================
+
+# Function for taking the reverse complement of one sequence (str or bytes).
+def reverse_complement(seq):
+    if isinstance(seq, (bytes, bytearray)):
+        return seq.translate(COMPLEMENT_BYTES)[::-1]
+    return seq.translate(COMPLEMENT)[::-1]
+
+
+# Function for taking the reverse complement of a uint8 array of ASCII codes.
+def reverse_complement_array(codes):
+    return COMPLEMENT_LUT[codes[::-1]]
+
+
+# Function for taking the reverse complement of a list of sequences.
+# All sequences are joined into one buffer, complemented with the lookup table
+# and reversed in one step. Reversing the joined buffer also reverses the order
+# of the sequences, so the pieces are cut out from the end.
+def reverse_complement_batch(seqs):
+    if len(seqs) == 0:
+        return []
+
+    joined = ''.join(seqs).encode('ascii')
+    codes = reverse_complement_array(np.frombuffer(joined, dtype=np.uint8))
+    flipped = codes.tobytes().decode('ascii')
+
+    lengths = np.array([len(seq) for seq in seqs], dtype=np.int64)
+    ends = len(joined) - np.cumsum(lengths) + lengths
+    starts = ends - lengths
+    return [flipped[a:b] for a, b in zip(starts.tolist(), ends.tolist())]
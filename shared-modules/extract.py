@@ -0,0 +1,104 @@
+"""
+extract.py
+    10/18/2026
+    This module extracts the sequences of a whole table of intervals
+    (name, left, right, strand, and optionally contig) from a loaded genome.
+    Intervals are sorted by contig and coordinate, then the genome is swept
+    once from start to end, a chunk of intervals at a time. Results are
+    streamed to a multi-FASTA file or filled into a column, so the memory used
+    doesn't grow with the number of sequences. Sweeping in order also means a
+    compressed (BGZF) genome decompresses each block once. A column can also
+    be extracted by several processes, each sweeping its own part of the
+    genome.
+"""
+
+# Import numpy for sorting the intervals.
+import numpy as np
+# Import parallel module for extracting parts of the genome in separate processes.
+from parallel import MIN_PART_ROWS, map_parts, worker_count
+
+
+# Number of intervals extracted at a time.
+CHUNK_SIZE = 10000
+
+
+# =============================================================================
+# Sorted sweep
+# =============================================================================
+
+# Function for getting the columns of an interval table as arrays.
+# intervals is a DataFrame (or dict of columns) with 'name', 'left', 'right'
+# and 'strand' columns, and optionally 'contig' (default: first record).
+def _interval_columns(genome, intervals):
+    names = np.asarray(intervals['name'], dtype=object)
+    lefts = np.asarray(intervals['left'], dtype=np.int64)
+    rights = np.asarray(intervals['right'], dtype=np.int64)
+    strands = np.asarray(intervals['strand'], dtype=object)
+    if 'contig' in intervals:
+        contigs = np.asarray(intervals['contig'], dtype=object)
+        numbers = genome._record_numbers(contigs, len(lefts))
+    else:
+        contigs = None
+        numbers = np.zeros(len(lefts), dtype=np.int64)
+    return names, lefts, rights, strands, contigs, numbers
+
+
+# Function for extracting every interval in genome order.
+# Yields (row, name, sequence) one interval at a time, where row is the
+# interval's position in the table, so results can be put back in table order.
+def extract_intervals(genome, intervals, chunk_size=CHUNK_SIZE):
+    names, lefts, rights, strands, contigs, numbers = _interval_columns(genome, intervals)
+
+    # Sort by record, then left coordinate.
+    order = np.lexsort((lefts, numbers))
+
+    for chunk_start in range(0, len(order), chunk_size):
+        rows = order[chunk_start:chunk_start + chunk_size]
+        chunk_contigs = None if contigs is None else contigs[rows]
+        seqs = genome.fetch_many(lefts[rows], rights[rows], chunk_contigs, strands[rows])
+        for row, seq in zip(rows.tolist(), seqs):
+            yield row, names[row], seq
+
+
+# Function for extracting every interval into a list in table order, for
+# adding as a DataFrame column. With workers other than 1 (None means all
+# cores), the sorted intervals are split into consecutive parts of the genome
+# that are extracted in separate processes.
+def extract_column(genome, intervals, chunk_size=CHUNK_SIZE, workers=1):
+    column = [None] * len(intervals['left'])
+    count = min(worker_count(workers), len(column) // MIN_PART_ROWS)
+    if count <= 1:
+        for row, name, seq in extract_intervals(genome, intervals, chunk_size):
+            column[row] = seq
+        return column
+
+    names, lefts, rights, strands, contigs, numbers = _interval_columns(genome, intervals)
+    parts = np.array_split(np.lexsort((lefts, numbers)), count)
+
+    # Function for extracting the intervals in rows, a chunk at a time.
+    def extract_part(rows):
+        seqs = []
+        for chunk_start in range(0, len(rows), chunk_size):
+            chunk = rows[chunk_start:chunk_start + chunk_size]
+            chunk_contigs = None if contigs is None else contigs[chunk]
+            seqs.extend(genome.fetch_many(lefts[chunk], rights[chunk], chunk_contigs, strands[chunk]))
+        return seqs
+
+    for rows, seqs in zip(parts, map_parts(extract_part, parts, workers)):
+        for row, seq in zip(rows.tolist(), seqs):
+            column[row] = seq
+    return column
+
+
+# Function for writing every interval to a multi-FASTA file, in genome order.
+# out_file is a file name or an open text file.
+def write_fasta(genome, intervals, out_file, chunk_size=CHUNK_SIZE):
+    if isinstance(out_file, str):
+        with open(out_file, 'w') as f:
+            return write_fasta(genome, intervals, f, chunk_size)
+
+    count = 0
+    for row, name, seq in extract_intervals(genome, intervals, chunk_size):
+        out_file.write('>' + str(name) + '\n' + seq + '\n')
+        count += 1
+    return count
@@ -0,0 +1,87 @@
+"""
+fimo_jobs.py
+    10/18/2026
+    This module writes the commands for running the MEME Suite's fimo on the
+    differential peaks. fimo reads multi-FASTA files, so every differential
+    peak is scanned by one fimo call per motif file (on
+    differential_peaks.fasta), instead of one call per peak.
+
+    For running fimo in parallel, the FASTA file can be split into shards
+    (differential_peaks_1.fasta, differential_peaks_2.fasta, ...) with about
+    the same number of nucleotides each. Each shard gets its own command and
+    its own output folder (--oc), so the commands can run at the same time
+    without overwriting each other's results.
+"""
+
+# Import os for file names.
+import os
+
+
+# fimo options used for every command.
+FIMO_OPTIONS = "--verbosity 1 --thresh 1.0E-4"
+
+
+# Function for reading the records of a FASTA file as (header line, sequence
+# lines) pairs, in file order.
+def read_fasta_records(fasta_file):
+    records = []
+    with open(fasta_file) as f:
+        for line in f:
+            line = line.rstrip('\n')
+            if line.startswith('>'):
+                records.append((line, []))
+            elif records and line:
+                records[-1][1].append(line)
+    return records
+
+
+# Function for splitting a FASTA file into shards with about the same number
+# of nucleotides each (records stay in order and are never split). Shards are
+# written next to fasta_file as <name>_<number>.fasta. Returns the list of
+# shard file names; with shards of 1 or less (or one record at most), the
+# file isn't split and the list is just fasta_file.
+def shard_fasta(fasta_file, shards):
+    records = read_fasta_records(fasta_file)
+    shards = min(int(shards), len(records))
+    if shards <= 1:
+        return [fasta_file]
+
+    lengths = [sum(len(x) for x in lines) for header, lines in records]
+    total = sum(lengths)
+    stem = os.path.splitext(fasta_file)[0]
+    file_names = []
+    start = 0
+    done = 0
+    for k in range(1, shards + 1):
+        # Take records until this shard reaches its share of the
+        # nucleotides, leaving at least one record for each later shard.
+        end = start + 1
+        done += lengths[start]
+        while end < len(records) - (shards - k) and (k == shards or done < total * k / shards):
+            done += lengths[end]
+            end += 1
+        file_name = stem + "_" + str(k) + ".fasta"
+        with open(file_name, "w") as f:
+            f.write("\n".join(header + "\n" + "\n".join(lines) for header, lines in records[start:end]))
+        file_names.append(file_name)
+        start = end
+    return file_names
+
+
+# Function for the fimo commands that scan fasta_files with meme_file: one
+# command per FASTA file. Results go to the out_dir folder, or
+# <out_dir>_<number> for each shard when there are several FASTA files.
+def fimo_commands(meme_file, fasta_files, out_dir):
+    if len(fasta_files) == 1:
+        out_dirs = [out_dir]
+    else:
+        out_dirs = [out_dir + "_" + str(k) for k in range(1, len(fasta_files) + 1)]
+    return ["fimo --oc " + folder + " " + FIMO_OPTIONS + " " + meme_file + " " + fasta_file
+            for folder, fasta_file in zip(out_dirs, fasta_files)]
+
+
+# Function for writing the fimo commands for fasta_files (see fimo_commands())
+# to a text file, one command per line.
+def write_fimo_commands(file_name, meme_file, fasta_files, out_dir):
+    with open(file_name, "w") as f:
+        f.write("\n".join(fimo_commands(meme_file, fasta_files, out_dir)))
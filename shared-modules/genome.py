@@ -0,0 +1,517 @@
+"""
+genome.py
+    10/18/2026
+    This module loads a genome FASTA file once and keeps it in memory as one
+    compact bytes buffer, together with a .fai-style index (the same format as
+    samtools faidx) that records where every FASTA record and line starts.
+    Sequences can then be sliced out by 1-based genome coordinates in O(1),
+    instead of building the genome string one line at a time in every script.
+    Files with several records (for example a chromosome and plasmids) are
+    indexed by record name, so intervals can be given as
+    (contig, left, right, strand).
+"""
+
+# Import os package for file paths and file sizes.
+import os
+# Import gzip for compressed genome files.
+import gzip
+# Import hashlib, json and mmap for the binary genome cache.
+import hashlib
+import json
+import mmap
+# Import namedtuple for the rows of the .fai index.
+from collections import namedtuple
+# Import numpy for finding line breaks in the whole file at once.
+import numpy as np
+# Import dna module for reverse complements of reverse strand sequences.
+from dna import reverse_complement, reverse_complement_batch
+
+
+# =============================================================================
+# .fai-style index
+# =============================================================================
+
+# One row of a .fai index, one per FASTA record:
+# name - record name (first word of the header line)
+# length - number of nucleotides in the record
+# offset - byte offset of the first nucleotide in the FASTA file
+# line_bases - number of nucleotides on each full line
+# line_width - number of bytes on each full line, including the line break
+FaiRecord = namedtuple('FaiRecord', ['name', 'length', 'offset', 'line_bases', 'line_width'])
+
+
+# Function for building the .fai index of a FASTA file that was read as bytes.
+# Returns a list of FaiRecord, one per record, in file order.
+def index_fasta(data):
+
+    arr = np.frombuffer(data, dtype=np.uint8)
+
+    # Start and end (not including the line break) of every line in the file.
+    newlines = np.flatnonzero(arr == ord('\n'))
+    line_starts = np.concatenate(([0], newlines + 1))
+    line_ends = np.concatenate((newlines, [len(data)]))
+    # Drop the empty "line" after a final line break.
+    if line_starts[-1] == len(data):
+        line_starts = line_starts[:-1]
+        line_ends = line_ends[:-1]
+    line_widths = line_ends - line_starts + 1
+
+    # Windows line breaks leave a '\r' at the end of each line.
+    line_bases = line_ends - line_starts
+    has_cr = line_bases > 0
+    has_cr[has_cr] = arr[line_ends[has_cr] - 1] == ord('\r')
+    line_bases = line_bases - has_cr
+
+    # Header lines start with '>'.
+    headers = np.flatnonzero(arr[line_starts] == ord('>'))
+    if len(headers) == 0 or headers[0] != 0:
+        raise ValueError("FASTA file must start with a '>' header line")
+
+    records = []
+    for h, header in enumerate(headers):
+        # Record name is the first word of the header line.
+        header_line = data[line_starts[header] + 1:line_starts[header] + line_bases[header] + 1]
+        name = header_line.split(None, 1)[0].decode('ascii') if header_line.strip() else ''
+
+        # Sequence lines are every line between this header and the next one.
+        first = header + 1
+        last = headers[h + 1] if h + 1 < len(headers) else len(line_starts)
+        bases = line_bases[first:last]
+
+        # Empty record.
+        if len(bases) == 0:
+            records.append(FaiRecord(name, 0, int(line_starts[header] + line_widths[header]), 0, 0))
+            continue
+
+        # Like samtools, every line except the last one must be the same length,
+        # otherwise coordinates can't be converted to file offsets.
+        if len(bases) > 1 and (np.any(bases[:-1] != bases[0]) or bases[-1] > bases[0]):
+            raise ValueError("Different line lengths in FASTA record '" + name + "'")
+
+        records.append(FaiRecord(name, int(bases.sum()), int(line_starts[first]),
+                                 int(bases[0]), int(line_widths[first])))
+
+    return records
+
+
+# Function for indexing the FASTA text (bytes) of the file fasta_path, with
+# a clear error (naming the file) for files that are empty, have no header
+# line, or have no sequences at all.
+def check_records(fasta_path, data):
+    if not data.strip():
+        raise ValueError("FASTA file '" + fasta_path + "' is empty")
+    try:
+        records = index_fasta(data)
+    except ValueError as error:
+        raise ValueError("FASTA file '" + fasta_path + "': " + str(error)) from None
+    if sum(record.length for record in records) == 0:
+        raise ValueError("FASTA file '" + fasta_path + "' has no sequences (only header lines)")
+    return records
+
+
+# Function for writing a .fai index to a text file (tab-separated, no header).
+def write_fai(records, fai_path):
+    with open(fai_path, 'w') as f:
+        for record in records:
+            f.write('\t'.join(str(x) for x in record) + '\n')
+
+
+# Function for reading a .fai index from a text file.
+def read_fai(fai_path):
+    records = []
+    with open(fai_path) as f:
+        for line in f:
+            fields = line.rstrip('\r\n').split('\t')
+            records.append(FaiRecord(fields[0], *[int(x) for x in fields[1:5]]))
+    return records
+
+
+# =============================================================================
+# Genome
+# =============================================================================
+
+# Names used for the two strands. Sequences on the reverse strand are reverse
+# complemented.
+FORWARD = {'F', '+', 'fwd', 'forward'}
+REVERSE = {'R', '-', 'rev', 'reverse'}
+
+
+# Base class with everything that doesn't depend on how the nucleotides are
+# stored. Every record (contig) of the FASTA file is indexed by name, and
+# records are stored one after another, so nucleotide x (1-based) of record r
+# is at position starts[r] + x - 1.
+# Subclasses only need a _gather() function that returns the nucleotides at
+# given 0-based positions as a uint8 array of ASCII characters.
+class GenomeBase:
+
+    def __init__(self, records, starts):
+        # .fai index of the FASTA file.
+        self.records = records
+        # Position where each record starts.
+        self.starts = starts
+        # Record number for every record name.
+        self.record_numbers = {record.name: r for r, record in enumerate(records)}
+        # Arrays of record starts and lengths for looking up many records at once.
+        self._starts = np.array(starts, dtype=np.int64)
+        self._lengths = np.array([record.length for record in records], dtype=np.int64)
+
+    # Number of nucleotides in the first record.
+    def __len__(self):
+        return self.records[0].length
+
+    # Names of all records (contigs) in file order.
+    def contig_names(self):
+        return [record.name for record in self.records]
+
+    # Function for getting the record number of a contig name.
+    # None means the first record.
+    def record_number(self, contig):
+        if contig is None:
+            return 0
+        if contig not in self.record_numbers:
+            raise KeyError("Contig '" + str(contig) + "' is not in the genome")
+        return self.record_numbers[contig]
+
+    # Function for getting the record numbers of an array of contig names.
+    # Each distinct name is only looked up once.
+    def _record_numbers(self, contigs, n):
+        if contigs is None:
+            return np.zeros(n, dtype=np.int64)
+        names, inverse = np.unique(np.asarray(contigs, dtype=object).astype(str),
+                                   return_inverse=True)
+        numbers = np.array([self.record_number(name) for name in names], dtype=np.int64)
+        return numbers[inverse.reshape(-1)]
+
+    # Function for checking coordinates are inside their records.
+    def _check(self, lefts, rights, numbers):
+        outside = (rights >= lefts) & ((lefts < 1) | (rights > self._lengths[numbers]))
+        if outside.any():
+            i = int(np.flatnonzero(outside)[0])
+            record = self.records[numbers[i]]
+            raise IndexError('Coordinates ' + str(lefts[i]) + '-' + str(rights[i]) +
+                             " are outside of contig '" + record.name + "' (1-" +
+                             str(record.length) + ')')
+
+    # Function for extracting the sequence between two 1-based coordinates,
+    # including both ends (the same as genome[left:right+1] when the genome
+    # string starts with "0"). contig is the record name (default: first
+    # record). Sequences on the reverse strand are reverse complemented.
+    def fetch(self, left, right, contig=None, strand='F'):
+        left = int(left)
+        right = int(right)
+        if right < left:
+            return ''
+        number = self.record_number(contig)
+        self._check(np.array([left]), np.array([right]), np.array([number]))
+
+        start = self.starts[number]
+        positions = np.arange(start + left - 1, start + right, dtype=np.int64)
+        seq = self._gather(positions).tobytes().decode('ascii')
+        if strand in REVERSE:
+            return reverse_complement(seq)
+        return seq
+
+    # Function for extracting many sequences at once. lefts and rights are lists
+    # or arrays of 1-based coordinates (both ends included), contigs and strands
+    # are optional lists of record names and strands. Every nucleotide of every
+    # window is gathered with one numpy indexing step and decoded together, then
+    # split into a list of sequences.
+    def fetch_many(self, lefts, rights, contigs=None, strands=None):
+        lefts = np.asarray(lefts, dtype=np.int64)
+        rights = np.asarray(rights, dtype=np.int64)
+        lengths = np.maximum(rights - lefts + 1, 0)
+        if len(lengths) == 0:
+            return []
+        numbers = self._record_numbers(contigs, len(lengths))
+        self._check(lefts, rights, numbers)
+
+        # Where each window starts and ends in the joined output.
+        ends = np.cumsum(lengths)
+        out_starts = ends - lengths
+        # Position of every nucleotide of every window.
+        positions = (np.repeat(lefts - 1 + self._starts[numbers] - out_starts, lengths) +
+                     np.arange(ends[-1]))
+        joined = self._gather(positions).tobytes().decode('ascii')
+        seqs = [joined[a:b] for a, b in zip(out_starts.tolist(), ends.tolist())]
+
+        # Reverse complement all reverse strand windows in one batch.
+        if strands is not None:
+            reverse = np.flatnonzero(np.isin(np.asarray(strands, dtype=object).astype(str),
+                                             list(REVERSE)))
+            for i, seq in zip(reverse, reverse_complement_batch([seqs[i] for i in reverse])):
+                seqs[i] = seq
+        return seqs
+
+    # Function for extracting a list of (contig, left, right, strand) intervals,
+    # or a DataFrame with 'contig', 'left', 'right' and 'strand' columns.
+    def fetch_intervals(self, intervals):
+        if hasattr(intervals, 'columns'):
+            return self.fetch_many(intervals['left'], intervals['right'],
+                                   intervals['contig'], intervals['strand'])
+        if len(intervals) == 0:
+            return []
+        contigs, lefts, rights, strands = zip(*intervals)
+        return self.fetch_many(lefts, rights, contigs, strands)
+
+
+# Class holding every record of a FASTA file in one bytes buffer, with line
+# breaks removed.
+class Genome(GenomeBase):
+
+    def __init__(self, records, buffer, starts):
+        GenomeBase.__init__(self, records, starts)
+        # All nucleotides of all records, one after another.
+        self.buffer = buffer
+
+    # Function for getting the nucleotides at the given 0-based positions.
+    def _gather(self, positions):
+        return np.frombuffer(self.buffer, dtype=np.uint8)[positions]
+
+    # Single windows are sliced straight out of the buffer.
+    def fetch(self, left, right, contig=None, strand='F'):
+        left = int(left)
+        right = int(right)
+        if right < left:
+            return ''
+        number = self.record_number(contig)
+        self._check(np.array([left]), np.array([right]), np.array([number]))
+
+        start = self.starts[number]
+        seq = self.buffer[start + left - 1:start + right].decode('ascii')
+        if strand in REVERSE:
+            return reverse_complement(seq)
+        return seq
+
+
+# =============================================================================
+# Binary cache
+# =============================================================================
+
+# The first time a FASTA file is loaded, its nucleotides (without line breaks)
+# and its index are saved in a folder next to it, named <FASTA file>.cache.
+# Later runs memory-map the saved nucleotides instead of parsing the text, so
+# startup doesn't depend on genome size. The cache is only used if the FASTA
+# file's size and modification time match; if only the time changed (for
+# example the file was copied), the file's SHA-256 hash is checked instead.
+
+# Change this when the cache layout changes, so old caches are rebuilt.
+CACHE_VERSION = 1
+
+# Arrays of a PackedGenome that are saved in the cache.
+PACKED_ARRAYS = ['packed', 'ambiguous_starts', 'ambiguous_ends', 'ambiguous_chars',
+                 'lowercase_starts', 'lowercase_ends']
+
+
+# Function for getting the cache folder of a FASTA file.
+def cache_folder(fasta_path):
+    return os.path.abspath(fasta_path) + '.cache'
+
+
+# Function for finding the SHA-256 hash of a file, reading it in chunks.
+def _file_hash(path):
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+# Function for writing a file so that it is either fully written or not there
+# at all (written to a temporary file first, then renamed).
+def _write_atomic(path, data):
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+    os.replace(temp_path, path)
+
+
+# Function for saving the cache index (also marks the cache as complete).
+def _write_cache_index(folder, index):
+    _write_atomic(os.path.join(folder, 'index.json'), json.dumps(index).encode('ascii'))
+
+
+# Function for reading the cache index of a FASTA file.
+# Returns None if there is no cache or it doesn't match the FASTA file.
+def _read_cache_index(fasta_path, stat):
+    folder = cache_folder(fasta_path)
+    try:
+        with open(os.path.join(folder, 'index.json')) as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if index.get('version') != CACHE_VERSION or index['size'] != stat.st_size:
+        return None
+    if index['mtime'] == stat.st_mtime:
+        return index
+
+    # Same size but different modification time: check the contents.
+    if _file_hash(fasta_path) != index['sha256']:
+        return None
+    index['mtime'] = stat.st_mtime
+    try:
+        _write_cache_index(folder, index)
+    except OSError:
+        pass
+    return index
+
+
+# Function for memory-mapping a saved numpy array.
+def _load_array(path):
+    try:
+        return np.load(path, mmap_mode='r')
+    # Empty arrays can't be memory-mapped.
+    except ValueError:
+        return np.load(path)
+
+
+# Function for saving the arrays of a PackedGenome in the cache folder.
+def _write_packed_cache(folder, genome):
+    try:
+        for name in PACKED_ARRAYS:
+            temp_path = os.path.join(folder, name + '.tmp.npy')
+            np.save(temp_path, getattr(genome, name))
+            os.replace(temp_path, os.path.join(folder, name + '.npy'))
+    # Caching is only for speed, so a folder that can't be written is skipped.
+    except OSError:
+        pass
+
+
+# Function for loading a genome from its cache.
+# Returns None if there is no usable cache.
+def _load_cache(fasta_path, stat, packed):
+    index = _read_cache_index(fasta_path, stat)
+    if index is None:
+        return None
+    folder = cache_folder(fasta_path)
+    records = [FaiRecord(*record) for record in index['records']]
+    starts = index['starts']
+
+    if packed:
+        # Imported here because packed_genome imports this module.
+        from packed_genome import PackedGenome, pack_genome
+        try:
+            arrays = [_load_array(os.path.join(folder, name + '.npy')) for name in PACKED_ARRAYS]
+            return PackedGenome(records, starts, index['total_length'], *arrays)
+        # Packed arrays weren't saved yet: pack the saved nucleotides below.
+        except OSError:
+            pass
+
+    try:
+        with open(os.path.join(folder, 'sequence.bin'), 'rb') as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    genome = Genome(records, buffer, starts)
+    if packed:
+        genome = pack_genome(genome)
+        _write_packed_cache(folder, genome)
+    return genome
+
+
+# Function for saving a genome's nucleotides and index in its cache folder.
+def _write_cache(fasta_path, stat, sha256, genome):
+    folder = cache_folder(fasta_path)
+    try:
+        os.makedirs(folder, exist_ok=True)
+        # Packed arrays of an older version of the file would pass the new
+        # index, so they are removed (and packed again when needed).
+        for name in PACKED_ARRAYS:
+            try:
+                os.remove(os.path.join(folder, name + '.npy'))
+            except FileNotFoundError:
+                pass
+        _write_atomic(os.path.join(folder, 'sequence.bin'), genome.buffer)
+        _write_cache_index(folder, {'version': CACHE_VERSION,
+                                    'size': stat.st_size,
+                                    'mtime': stat.st_mtime,
+                                    'sha256': sha256,
+                                    'records': [list(record) for record in genome.records],
+                                    'starts': list(genome.starts),
+                                    'total_length': len(genome.buffer)})
+    # Caching is only for speed, so a folder that can't be written is skipped.
+    except OSError:
+        pass
+
+
+# =============================================================================
+# Loading genomes
+# =============================================================================
+
+# Genomes that were already loaded in this Python session, so running a
+# script again (for example in Spyder) doesn't read the file again.
+_loaded = {}
+
+
+# Function for loading a FASTA file into a Genome.
+# The file is read with a single read() call and line breaks are removed
+# with bytes.translate(), so loading takes linear time. If cache is True, the
+# result is saved in a binary cache (see above) and later runs load that.
+# If packed is True, returns a packed_genome.PackedGenome instead, which has
+# the same fetch functions but uses about 4 times less memory.
+# gzip compressed files are decompressed while loading. bgzip (BGZF) files
+# give a bgzf.BgzfGenome that reads blocks from disk as needed (unless packed
+# is True, which needs the whole genome).
+def load_genome(fasta_path, packed=False, cache=True):
+
+    fasta_path = os.path.abspath(fasta_path)
+    stat = os.stat(fasta_path)
+    key = (fasta_path, packed)
+    if key in _loaded and _loaded[key][0] == (stat.st_size, stat.st_mtime):
+        return _loaded[key][1]
+
+    # Genomes compressed with bgzip stay compressed, and only the blocks that
+    # hold each requested sequence are decompressed.
+    # Imported here because bgzf imports this module.
+    from bgzf import is_bgzf, open_bgzf_genome
+    if not packed and is_bgzf(fasta_path):
+        genome = open_bgzf_genome(fasta_path)
+        _loaded[key] = ((stat.st_size, stat.st_mtime), genome)
+        return genome
+
+    genome = _load_cache(fasta_path, stat, packed) if cache else None
+    if genome is None:
+        genome = _parse_genome(fasta_path, stat, packed, cache)
+
+    _loaded[key] = ((stat.st_size, stat.st_mtime), genome)
+    return genome
+
+
+# Function for reading and indexing the FASTA text.
+def _parse_genome(fasta_path, stat, packed, cache):
+
+    with open(fasta_path, 'rb') as f:
+        data = f.read()
+    # The hash is only needed for checking the cache later.
+    sha256 = hashlib.sha256(data).hexdigest() if cache else None
+    # Decompress gzip (or bgzip) files in memory.
+    if data[:2] == b'\x1f\x8b':
+        data = gzip.decompress(data)
+    records = check_records(fasta_path, data)
+
+    # Copy the nucleotides of each record into one buffer without line breaks.
+    pieces = []
+    starts = []
+    position = 0
+    for record in records:
+        if record.length == 0:
+            starts.append(position)
+            continue
+        # End of the record's sequence in the file.
+        full_lines, rest = divmod(record.length, record.line_bases)
+        end = record.offset + full_lines * record.line_width + rest
+        pieces.append(data[record.offset:end].translate(None, b'\r\n'))
+        starts.append(position)
+        position += record.length
+
+    genome = Genome(records, b''.join(pieces), starts)
+    if cache and position > 0:
+        _write_cache(fasta_path, stat, sha256, genome)
+    if packed:
+        # Imported here because packed_genome imports this module.
+        from packed_genome import pack_genome
+        genome = pack_genome(genome)
+        if cache and position > 0:
+            _write_packed_cache(cache_folder(fasta_path), genome)
+    return genome
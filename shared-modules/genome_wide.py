@@ -0,0 +1,182 @@
+"""
+genome_wide.py
+    10/18/2026
+    This module handles genome-wide peak sets (10^5 to 10^6 peaks per
+    condition) for differential_peaks.py. Peaks are genomic intervals
+    (contig, left, right) instead of peaks listed per sRNA.
+
+    - Peak files are read a chunk of rows at a time, with typed columns.
+    - Merging uses the same rules as peaks.py, with contigs in place of sRNAs,
+      except that every peak is kept (peaks of contigs without peaks in the
+      first condition get their own rows). Peaks of all conditions are sorted
+      by contig and left coordinate and cut into segments wherever no peak
+      reaches far enough right to overlap the next one by n nucleotides.
+      Peaks of different segments can't be merged, so groups of segments are
+      merged in separate processes. Inside a segment, peaks are still merged
+      one at a time by peaks.PeakMerger, so merging is the slowest step.
+    - Merged peaks are sorted by contig (genome order) and Merged L, and named
+      '<contig>_<number>'.
+    - Differential peaks are called a chunk of rows at a time (see
+      differential.py), and sequences are extracted in one sorted sweep of
+      the genome (see extract.py).
+
+    Throughput targets (one core, 3 conditions of 10^6 peaks each on a
+    genome of 20 contigs of 25 Mb), with the numbers measured by
+    benchmarks/genome_wide_benchmark.py (3 runs on one core, 10/18/2026):
+    - reading peak files: at least 400,000 peaks per second
+      (measured 426,000-463,000),
+    - merging: at least 100,000 peaks per second for each worker
+      (measured 219,000-223,000),
+    - finishing and calling differential peaks: at least 500,000 merged
+      peaks per second (measured 491,000-515,000, so not always met),
+    - extracting sequences: at least 200,000 peaks per second
+      (measured 257,000-295,000).
+    That is under a minute for the whole run (about 28 seconds measured).
+    Memory grows with the number of peaks. Very dense peaks (many peaks
+    overlapping every position) make long segments, which merge more slowly.
+"""
+
+# Import Pandas and numpy for peak tables.
+import pandas as pd
+import numpy as np
+# Import peaks module for reading SNRs and merging peaks.
+from peaks import parse_snr, PeakMerger, merged_extents
+# Import differential module for calling differential peaks.
+from differential import call_differential
+# Import parallel module for merging and calling parts in separate processes.
+from parallel import split_by_sRNA, map_parts
+
+
+# Number of rows read, called or written at a time.
+CHUNK_ROWS = 100000
+
+# Names of the contig column in genome-wide peak files.
+CONTIG_COLUMNS = ['Contig', 'Chrom', 'Chromosome', 'chrom', 'seqname']
+
+
+# =============================================================================
+# Reading peak files
+# =============================================================================
+
+# Function for reading a genome-wide peak file: a CSV file with L_Coord,
+# R_Coord and LastSNR columns (like called_peaks files), and a contig column
+# (one of CONTIG_COLUMNS). Files without a contig column have all peaks on
+# default_contig. Returns a DataFrame with columns Contig (categorical),
+# L_Coord and R_Coord (int32), and SNR (float64, NaN for peaks without an SNR).
+def read_interval_file(path, default_contig=None, chunk_rows=CHUNK_ROWS):
+    chunks = []
+    for df in pd.read_csv(path, chunksize=chunk_rows):
+        contig_column = next((x for x in CONTIG_COLUMNS if x in df.columns), None)
+        if contig_column is None:
+            contigs = np.full(len(df.index), default_contig, dtype=object)
+        else:
+            contigs = df[contig_column].astype(str).to_numpy(dtype=object)
+        chunks.append(pd.DataFrame({'Contig': contigs,
+                                    'L_Coord': df['L_Coord'].astype(np.int32),
+                                    'R_Coord': df['R_Coord'].astype(np.int32),
+                                    'SNR': parse_snr(df['LastSNR'])}))
+    peaks = pd.concat(chunks, ignore_index=True)
+    peaks['Contig'] = peaks['Contig'].astype('category')
+    return peaks
+
+
+# =============================================================================
+# Merging
+# =============================================================================
+
+# Function for cutting sorted peaks into segments that can be merged
+# separately. contigs, lefts and rights are columns of the peaks of all
+# conditions. Returns the segment number of every peak; segments are
+# numbered by contig (first appearance) and left coordinate.
+def segment_intervals(contigs, lefts, rights, n):
+    n = max(int(n), 1)
+    codes = pd.factorize(np.asarray(contigs, dtype=str))[0].astype(np.int64)
+    lefts = np.asarray(lefts, dtype=np.int64)
+    rights = np.asarray(rights, dtype=np.int64)
+    order = np.lexsort((lefts, codes))
+
+    # Coordinates of different contigs never meet: each contig gets its own
+    # range of 2^32 positions.
+    starts = (codes[order] << 32) + lefts[order]
+    ends = (codes[order] << 32) + rights[order]
+    # A new segment starts where no earlier peak ends at or after left + n - 1.
+    new = np.ones(len(order), dtype=bool)
+    new[1:] = starts[1:] + n - 1 > np.maximum.accumulate(ends)[:-1]
+
+    segments = np.empty(len(order), dtype=np.int64)
+    segments[order] = np.cumsum(new) - 1
+    return segments
+
+
+# Function for merging genome-wide peaks (DataFrames from
+# read_interval_file(), one per condition) into a DataFrame like
+# peaks.merge_conditions(), with the contig in place of the sRNA. n is at
+# least 1 (peaks have to overlap to be merged). Groups of whole segments are
+# merged by up to workers processes (None means all cores); rows are in no
+# particular order until finalize_intervals().
+def merge_intervals(conditions, names, n, match_all_conditions=False, workers=None):
+    n = max(int(n), 1)
+    contigs = np.concatenate([df['Contig'].to_numpy(dtype=str) for df in conditions])
+    lefts = np.concatenate([df['L_Coord'].to_numpy() for df in conditions])
+    rights = np.concatenate([df['R_Coord'].to_numpy() for df in conditions])
+    snrs = np.concatenate([df['SNR'].to_numpy(dtype=np.float64) for df in conditions])
+    segments = segment_intervals(contigs, lefts, rights, n)
+    # Condition of every peak.
+    condition = np.repeat(np.arange(len(conditions)), [len(df.index) for df in conditions])
+
+    # Function for merging the peaks in rows (whole segments).
+    def merge_part(rows):
+        columns = []
+        for k in range(len(conditions)):
+            peaks = rows[condition[rows] == k]
+            columns.append((contigs[peaks], lefts[peaks], rights[peaks], snrs[peaks]))
+        merger = PeakMerger(n, match_all_conditions, keep_new_sRNAs=True)
+        merger.add_sorted_conditions(columns)
+        return merger.table(names)
+
+    parts = split_by_sRNA(segments, workers)
+    return pd.concat(map_parts(merge_part, parts, workers), ignore_index=True)
+
+
+# Function for finishing a merged DataFrame from merge_intervals(): adds
+# Merged L, Merged R and Max SNR, sorts peaks by contig (in the order of
+# contig_names, then any other contigs) and Merged L, and names them
+# '<contig>_<number>'. The first two columns are renamed Contig and Peak.
+def finalize_intervals(merged, conditions, contig_names=()):
+    merged_L, merged_R, max_SNR, first_left = merged_extents(merged, conditions)
+    merged = merged.rename(columns={'sRNA': 'Contig', 'sRNA peak': 'Peak'})
+    merged['Merged L'] = merged_L.astype(np.int64)
+    merged['Merged R'] = merged_R.astype(np.int64)
+    merged['Max SNR'] = max_SNR
+
+    # Contigs in genome order, then in order of appearance.
+    codes, names = pd.factorize(merged['Contig'])
+    contigs = list(contig_names)
+    known = set(contigs)
+    contigs += [x for x in names if x not in known]
+    rank = pd.Series(np.arange(len(contigs)), index=contigs)[names].to_numpy()[codes]
+    order = np.lexsort((merged['Merged R'].to_numpy(), merged['Merged L'].to_numpy(), rank))
+    merged = merged.iloc[order].reset_index(drop=True)
+
+    # Number the peaks of each contig from 1: position in the table minus the
+    # position of the contig's first peak.
+    rank = rank[order]
+    starts = np.flatnonzero(np.r_[True, rank[1:] != rank[:-1]])
+    numbers = np.arange(len(rank)) - np.repeat(starts, np.diff(np.r_[starts, len(rank)])) + 1
+    merged['Peak'] = merged['Contig'].astype(str) + '_' + numbers.astype(str)
+    return merged
+
+
+# =============================================================================
+# Differential peaks
+# =============================================================================
+
+# Function for calling differential peaks (see differential.call_differential())
+# a chunk of rows at a time, with up to workers processes.
+# Returns the called DataFrame and the SNR ratio DataFrame.
+def call_intervals(merged, names, min_SNR, workers=None, chunk_rows=CHUNK_ROWS):
+    parts = [np.arange(start, min(start + chunk_rows, len(merged.index)))
+             for start in range(0, len(merged.index), chunk_rows)] or [np.arange(0)]
+    results = map_parts(lambda rows: call_differential(merged.iloc[rows], names, min_SNR),
+                        parts, workers)
+    return pd.concat([x[0] for x in results]), pd.concat([x[1] for x in results])
@@ -0,0 +1,365 @@
+"""
+motif_library.py
+    10/18/2026
+    This module reads motif files (MEME, and TRANSFAC files like PRODORIC2's
+    prodoric_<accession>.txt) once into a motif library: a few NumPy arrays
+    holding every motif's matrix, log-odds, background and names. Scanning
+    (motif_scan.py) and redundancy checks (for example transfac2meme.py) can
+    then share one copy of the motifs instead of each reading the text files.
+
+    The library is saved as one binary file (NumPy .npz, no pickled objects),
+    by default next to the first motif file as <motif file>.motifs.npz. The
+    file records the SHA-256 hash of the motif files it came from, and is only
+    used if the motif files are unchanged, so loading 1,000+ motifs takes
+    milliseconds after the first time.
+
+    Layout of the library (M motifs, R matrix rows in total):
+    - ids, alt_ids: motif names and alternate names (M strings)
+    - sources: number of the motif file each motif came from (M)
+    - offsets: row of each motif's first position (M + 1, so motif k is rows
+      offsets[k] to offsets[k + 1])
+    - sites: number of sites of each motif (M)
+    - probabilities, log_odds: letter probabilities and log-odds scores of
+      every position (R x 4, columns A, C, G, T)
+    - backgrounds: background frequencies of each motif (M x 4, from its MEME
+      file made strand-symmetric; uniform for TRANSFAC files)
+"""
+
+# Import os and hashlib for the binary library file.
+import os
+import hashlib
+# Import numpy for motif matrices.
+import numpy as np
+# Import motif_scan module for reading MEME files and the motif class.
+from motif_scan import Motif, read_meme, PSEUDOCOUNT, DEFAULT_SITES, ALPHABET
+
+
+# Change this when the library layout changes, so old library files are rebuilt.
+LIBRARY_VERSION = 2
+
+# Arrays saved in the library file.
+LIBRARY_ARRAYS = ['ids', 'alt_ids', 'sources', 'offsets', 'sites', 'probabilities',
+                  'log_odds', 'backgrounds']
+
+
+# =============================================================================
+# Reading TRANSFAC files
+# =============================================================================
+
+# Function for reading a TRANSFAC matrix file (one or more matrices, each
+# ending with '//'). Each matrix has a header line starting with P0 (or PO)
+# naming the letter columns, then one row of counts (or frequencies) per
+# position. The motif name is the ID field (AC if there's no ID), and the
+# alternate name the NA field. Returns the list of motifs.
+def read_transfac(path):
+    motifs = []
+    fields = {}
+    columns = None
+    rows = []
+
+    # Function for adding the matrix read so far as a motif.
+    def add_motif():
+        if not rows:
+            return
+        counts = np.array(rows, dtype=np.float64)
+        totals = counts.sum(axis=1, keepdims=True)
+        totals[totals == 0] = 1.0
+        # Rows of counts give the number of sites; rows of frequencies don't.
+        sites = float(totals.max())
+        if sites <= 1.0 + 1e-6:
+            sites = DEFAULT_SITES
+        motif_id = fields.get('ID') or fields.get('AC') or 'motif_' + str(len(motifs) + 1)
+        motifs.append(Motif(motif_id, fields.get('NA', ''), counts / totals, sites))
+
+    with open(path) as f:
+        for line in f:
+            code = line[:2]
+            if code == '//':
+                add_motif()
+                fields, columns, rows = {}, None, []
+            elif code in ('P0', 'PO'):
+                # Column of each letter in the matrix rows.
+                letters = line.split()[1:]
+                columns = [letters.index(x) + 1 for x in ALPHABET]
+            elif columns is not None and code.strip().isdigit():
+                values = line.split()
+                rows.append([float(values[x]) for x in columns])
+            elif code in ('AC', 'ID', 'NA') and code not in fields:
+                fields[code] = line[2:].strip()
+            elif code == 'XX' and rows:
+                # The end of the matrix rows.
+                columns = None
+    add_motif()
+    return motifs
+
+
+# Function for reading a motif file, MEME or TRANSFAC (a MEME file has a
+# 'MEME version' line). Returns the list of motifs, each with its background.
+def read_motif_file(path):
+    with open(path) as f:
+        is_meme = any(line.startswith('MEME version') for line in f)
+    if is_meme:
+        return read_meme(path)[0]
+    return read_transfac(path)
+
+
+# =============================================================================
+# Motif library
+# =============================================================================
+
+# Class for a motif library: the arrays described above, and the motif files
+# (source_files) they came from.
+class MotifLibrary:
+
+    def __init__(self, arrays, source_files=(), pseudocount=PSEUDOCOUNT):
+        for name in LIBRARY_ARRAYS:
+            setattr(self, name, arrays[name])
+        self.source_files = list(source_files)
+        self.pseudocount = pseudocount
+
+    def __len__(self):
+        return len(self.ids)
+
+    # Function for making a library from a list of motifs (each with its
+    # background). sources is the motif file number of each motif.
+    @classmethod
+    def from_motifs(cls, motifs, sources=None, source_files=(), pseudocount=PSEUDOCOUNT):
+        widths = [len(motif) for motif in motifs]
+        arrays = {
+            'ids': np.array([motif.id for motif in motifs], dtype=str),
+            'alt_ids': np.array([motif.alt_id for motif in motifs], dtype=str),
+            'sources': np.zeros(len(motifs), dtype=np.int32) if sources is None
+                       else np.asarray(sources, dtype=np.int32),
+            'offsets': np.concatenate(([0], np.cumsum(widths))).astype(np.int64),
+            'sites': np.array([motif.sites for motif in motifs], dtype=np.float64),
+            'probabilities': np.concatenate([motif.probabilities for motif in motifs] or
+                                            [np.zeros((0, 4))]),
+            'log_odds': np.concatenate([motif.log_odds(None, pseudocount) for motif in motifs] or
+                                       [np.zeros((0, 4))]),
+            'backgrounds': np.array([motif.background for motif in motifs],
+                                    dtype=np.float64).reshape(-1, 4)}
+        return cls(arrays, source_files, pseudocount)
+
+    # Function for the width (number of positions) of every motif.
+    def widths(self):
+        return np.diff(self.offsets)
+
+    # Function for the letter probabilities of motif k.
+    def probability_matrix(self, k):
+        return self.probabilities[self.offsets[k]:self.offsets[k + 1]]
+
+    # Function for the log-odds matrix of motif k.
+    def log_odds_matrix(self, k):
+        return self.log_odds[self.offsets[k]:self.offsets[k + 1]]
+
+    # Function for motif k as a Motif (for scanning, see motif_scan.py),
+    # keeping its log-odds.
+    def motif(self, k):
+        return Motif(str(self.ids[k]), str(self.alt_ids[k]), self.probability_matrix(k),
+                     float(self.sites[k]), self.backgrounds[k], self.log_odds_matrix(k),
+                     self.pseudocount)
+
+    # Function for the motifs as a list of Motifs, all of them or those of
+    # the motif files numbered sources.
+    def motifs(self, sources=None):
+        numbers = range(len(self)) if sources is None else np.flatnonzero(np.isin(self.sources, sources))
+        return [self.motif(k) for k in numbers]
+
+    # Function for the number of the motif named name (ID or alternate name,
+    # ignoring case), or None if there's none.
+    def find(self, name):
+        name = name.lower()
+        for names in (self.ids, self.alt_ids):
+            matches = np.flatnonzero(np.char.lower(names) == name)
+            if len(matches):
+                return int(matches[0])
+        return None
+
+    # Function for the consensus sequence of every motif (most likely letter
+    # at each position), as a list of strings.
+    def consensus(self):
+        letters = np.array(list(ALPHABET))[self.probabilities.argmax(axis=1)]
+        return [''.join(letters[self.offsets[k]:self.offsets[k + 1]]) for k in range(len(self))]
+
+    # Function for the similarity of motifs j and k (see motif_similarity()).
+    def similarity(self, j, k, min_overlap=5):
+        return motif_similarity(self.log_odds_matrix(j), self.log_odds_matrix(k), min_overlap)
+
+    # Function for saving the library in one binary file, with key (the hash
+    # of its motif files).
+    def save(self, path, key=''):
+        temp_path = path + '.tmp.npz'
+        np.savez(temp_path, version=LIBRARY_VERSION, key=key, pseudocount=self.pseudocount,
+                 source_files=np.array(self.source_files, dtype=str),
+                 **{name: getattr(self, name) for name in LIBRARY_ARRAYS})
+        os.replace(temp_path, path)
+
+    # Function for loading a library file. Returns None if there's no usable
+    # file, or its key isn't key (when key is given).
+    @classmethod
+    def load(cls, path, key=None):
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                if int(data['version']) != LIBRARY_VERSION:
+                    return None
+                if key is not None and str(data['key']) != key:
+                    return None
+                arrays = {name: data[name] for name in LIBRARY_ARRAYS}
+                return cls(arrays, data['source_files'].tolist(), float(data['pseudocount']))
+        except (OSError, ValueError, KeyError):
+            return None
+
+
+# Function for the key of a library made from motif files: the SHA-256 hash
+# of their contents (in order) and the pseudocount.
+def library_key(motif_files, pseudocount=PSEUDOCOUNT):
+    sha = hashlib.sha256(repr(pseudocount).encode('ascii'))
+    for path in motif_files:
+        with open(path, 'rb') as f:
+            file_sha = hashlib.sha256()
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                file_sha.update(chunk)
+        sha.update(file_sha.digest())
+    return sha.hexdigest()
+
+
+# Function for loading a motif library made from motif_files (one file name
+# or a list of them, MEME or TRANSFAC). The library is read from
+# library_file (default <first motif file>.motifs.npz) if it was made from
+# the same files; otherwise the motif files are read and the library is
+# saved there (if cache is True).
+def load_motif_library(motif_files, library_file=None, cache=True, pseudocount=PSEUDOCOUNT):
+    if isinstance(motif_files, str):
+        motif_files = [motif_files]
+    if library_file is None:
+        library_file = os.path.abspath(motif_files[0]) + '.motifs.npz'
+
+    key = library_key(motif_files, pseudocount)
+    library = MotifLibrary.load(library_file, key) if cache else None
+    if library is not None:
+        return library
+
+    motifs = []
+    sources = []
+    for number, path in enumerate(motif_files):
+        file_motifs = read_motif_file(path)
+        motifs += file_motifs
+        sources += [number] * len(file_motifs)
+    library = MotifLibrary.from_motifs(motifs, sources, motif_files, pseudocount)
+    if cache:
+        try:
+            library.save(library_file, key)
+        except OSError:
+            pass
+    return library
+
+
+# =============================================================================
+# Redundancy
+# =============================================================================
+
+# Class for finding which names contain any of a set of names (patterns),
+# ignoring case, like checking 'pattern in name' for every pattern, but in
+# one pass over each name (Aho-Corasick automaton). Used for finding motifs
+# of one database that are already in another by name.
+class NameMatcher:
+
+    def __init__(self, patterns):
+        # Trie of the patterns: the child of each node for each letter, the
+        # node to fall back to when a letter doesn't continue the match (the
+        # longest suffix of the node's text that is also in the trie), and
+        # whether a pattern ends at the node (or at a suffix of it).
+        self.children = [{}]
+        self.fallback = [0]
+        self.ends = [False]
+        for pattern in patterns:
+            node = 0
+            for letter in str(pattern).lower():
+                if letter not in self.children[node]:
+                    self.children.append({})
+                    self.fallback.append(0)
+                    self.ends.append(False)
+                    self.children[node][letter] = len(self.children) - 1
+                node = self.children[node][letter]
+            self.ends[node] = True
+
+        # Fallback nodes, in breadth-first order (shorter texts first).
+        queue = list(self.children[0].values())
+        for node in queue:
+            for letter, child in self.children[node].items():
+                fallback = self.fallback[node]
+                while fallback and letter not in self.children[fallback]:
+                    fallback = self.fallback[fallback]
+                self.fallback[child] = self.children[fallback].get(letter, 0)
+                self.ends[child] = self.ends[child] or self.ends[self.fallback[child]]
+                queue.append(child)
+
+    # Function for checking whether name contains any pattern.
+    def contains_any(self, name):
+        if self.ends[0]:
+            return True
+        node = 0
+        for letter in str(name).lower():
+            while node and letter not in self.children[node]:
+                node = self.fallback[node]
+            node = self.children[node].get(letter, 0)
+            if self.ends[node]:
+                return True
+        return False
+
+    # Function for checking every name of a list; returns a boolean array.
+    def contains_any_of(self, names):
+        return np.array([self.contains_any(name) for name in names], dtype=bool)
+
+
+# Function for the similarity of two log-odds matrices: the mean Pearson
+# correlation of their aligned columns, at the best offset of either matrix
+# against the other (or its reverse complement), for offsets where at least
+# min_overlap positions (or the whole shorter motif) line up. 1 means the same
+# motif.
+def motif_similarity(a, b, min_overlap=5):
+    min_overlap = min(min_overlap, len(a), len(b))
+
+    # Function for centering each row and scaling it to length 1, so the dot
+    # product of two rows is their correlation.
+    def normalize(matrix):
+        centered = matrix - matrix.mean(axis=1, keepdims=True)
+        lengths = np.linalg.norm(centered, axis=1, keepdims=True)
+        lengths[lengths == 0] = 1.0
+        return centered / lengths
+
+    a = normalize(np.asarray(a, dtype=np.float64))
+    best = -1.0
+    for b_strand in (np.asarray(b, dtype=np.float64), np.asarray(b, dtype=np.float64)[::-1, ::-1]):
+        # Correlation of every column of a with every column of b; an offset
+        # is one diagonal of this matrix.
+        correlations = a @ normalize(b_strand).T
+        for offset in range(min_overlap - len(a), len(b_strand) - min_overlap + 1):
+            diagonal = np.diagonal(correlations, offset)
+            if len(diagonal) >= min_overlap:
+                best = max(best, float(diagonal.mean()))
+    return best
+
+
+# =============================================================================
+# Writing MEME files
+# =============================================================================
+
+# Function for writing motifs to a MEME motif file (text format, version 4),
+# like the MEME Suite's conversion tools. background is written as the file's
+# background frequencies (uniform by default).
+def write_meme(motifs, path, background=None):
+    background = np.full(4, 0.25) if background is None else np.asarray(background)
+    lines = ['MEME version 4', '', 'ALPHABET= ' + ALPHABET, '', 'strands: + -', '',
+             'Background letter frequencies',
+             ' '.join(letter + ' ' + format(value, '.3f') for letter, value in zip(ALPHABET, background)),
+             '']
+    for motif in motifs:
+        sites = int(motif.sites) if float(motif.sites).is_integer() else motif.sites
+        lines.append(('MOTIF ' + motif.id + ' ' + motif.alt_id).rstrip())
+        lines.append('letter-probability matrix: alength= 4 w= ' + str(len(motif)) +
+                     ' nsites= ' + str(sites) + ' E= 0')
+        lines += [' ' + ' '.join(format(x, '.6f') for x in row) for row in motif.probabilities]
+        lines.append('')
+    with open(path, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
@@ -0,0 +1,321 @@
+"""
+motif_scan.py
+    10/18/2026
+    This module scans DNA sequences for motifs from MEME motif files, like
+    the MEME Suite's fimo, without starting a process for every sequence.
+    Motif files are read once, and every sequence is scored on both strands.
+
+    Scores and p-values follow fimo's defaults:
+    - Motif probabilities get a pseudocount of 0.1 (spread by the background
+      frequencies), and scores are log2(probability / background) summed
+      over the motif's positions.
+    - Background frequencies come from the motif file (uniform if it has
+      none). Both strands are scanned, so each letter's frequency is averaged
+      with its complement's (A with T, C with G). With this strand-symmetric
+      background, the reverse complement of a motif has the same score
+      distribution as the motif, so one p-value table serves both strands.
+    - A site's p-value is the chance of a score at least as high in random
+      sequence with the background frequencies. Scores are scaled to whole
+      numbers (0 to 1000 for each motif), so the exact distribution of scores
+      can be found by adding up the distributions of each motif position.
+    - Windows with letters other than A, C, G and T are skipped.
+    q-values are Benjamini-Hochberg adjusted p-values over every position
+    scored (all motifs and both strands). This is not fimo's q-value method,
+    so q-values can differ from fimo's.
+
+    All sequences are joined into one array (with an N between them), and
+    each motif scores every window at once. Each run of 4 letters is coded as
+    one number, so 4 motif positions are scored with one table lookup. Only
+    windows that pass the p-value threshold get their log-odds score and
+    sequence worked out.
+"""
+
+# Import Pandas and numpy for motif matrices and result tables.
+import pandas as pd
+import numpy as np
+# Import dna module for reverse complements of matched sequences.
+from dna import reverse_complement
+
+
+# Letters of the DNA alphabet, in matrix column order.
+ALPHABET = 'ACGT'
+
+# fimo defaults: pseudocount added to motif counts, p-value threshold, and
+# number of sites when a motif doesn't give one.
+PSEUDOCOUNT = 0.1
+THRESHOLD = 1e-4
+DEFAULT_SITES = 20
+
+# Scores of each motif are scaled to whole numbers from 0 to SCORE_RANGE.
+SCORE_RANGE = 1000
+
+# Columns of the FIMO-style output table.
+FIMO_COLUMNS = ['motif_id', 'motif_alt_id', 'sequence_name', 'start', 'stop', 'strand',
+                'score', 'p-value', 'q-value', 'matched_sequence']
+
+# Function for making background frequencies (of A, C, G, T) strand-symmetric:
+# each letter's frequency is averaged with its complement's.
+def symmetric_background(background):
+    background = np.asarray(background, dtype=np.float64)
+    return (background + background[::-1]) / 2
+
+
+# Code of every byte: A, C, G, T (either case) are 0-3, anything else 4.
+_CODES = np.full(256, 4, dtype=np.uint8)
+for _i, _letter in enumerate(ALPHABET):
+    _CODES[ord(_letter)] = _i
+    _CODES[ord(_letter.lower())] = _i
+
+
+# =============================================================================
+# Motifs
+# =============================================================================
+
+# Class for one motif: its name, alternate name, letter-probability matrix
+# (one row per position, columns A, C, G, T) and number of sites.
+# background is the motif's own background frequencies (from its motif file),
+# used when no other background is given. Motifs from a motif library (see
+# motif_library.py) also keep their log-odds matrix, already worked out with
+# that background and pseudocount.
+class Motif:
+
+    def __init__(self, motif_id, alt_id, probabilities, sites=DEFAULT_SITES, background=None,
+                 log_odds=None, pseudocount=PSEUDOCOUNT):
+        self.id = motif_id
+        self.alt_id = alt_id
+        self.probabilities = np.asarray(probabilities, dtype=np.float64).reshape(-1, 4)
+        self.sites = sites
+        self.background = np.full(4, 0.25) if background is None else np.asarray(background)
+        self._log_odds = log_odds
+        self._pseudocount = pseudocount
+
+    def __len__(self):
+        return len(self.probabilities)
+
+    # Function for the log-odds matrix: log2 of the probabilities (with the
+    # pseudocount) over the background frequencies (the motif's own if
+    # background is None).
+    def log_odds(self, background=None, pseudocount=PSEUDOCOUNT):
+        if background is None:
+            background = self.background
+        background = np.asarray(background, dtype=np.float64)
+        if (self._log_odds is not None and pseudocount == self._pseudocount and
+                np.array_equal(background, self.background)):
+            return self._log_odds
+        probabilities = ((self.probabilities * self.sites + pseudocount * background) /
+                         (self.sites + pseudocount))
+        return np.log2(probabilities / background)
+
+
+# Function for reading a MEME motif file (text format, version 4 or later).
+# Returns the list of motifs (in file order) and the background frequencies
+# of A, C, G and T, made strand-symmetric (see symmetric_background()).
+def read_meme(path):
+    with open(path) as f:
+        lines = f.read().splitlines()
+
+    background = np.full(4, 0.25)
+    motifs = []
+    i = 0
+    while i < len(lines):
+        line = lines[i].strip()
+        if line.startswith('Background letter frequencies'):
+            # Pairs of letter and frequency, on the next line(s).
+            values = {}
+            i += 1
+            while i < len(lines) and lines[i].strip() and not lines[i].startswith('MOTIF'):
+                fields = lines[i].split()
+                values.update(zip(fields[0::2], (float(x) for x in fields[1::2])))
+                i += 1
+            background = np.array([values.get(x, 0.25) for x in ALPHABET])
+            background = symmetric_background(background / background.sum())
+            continue
+
+        if line.startswith('MOTIF'):
+            fields = line.split()
+            motif_id = fields[1]
+            alt_id = fields[2] if len(fields) > 2 else ''
+            # Find the letter-probability matrix header and read its rows.
+            i += 1
+            while i < len(lines) and not lines[i].strip().startswith('letter-probability matrix'):
+                i += 1
+            header = lines[i].replace('=', '= ').split()
+            width = int(header[header.index('w=') + 1])
+            sites = float(header[header.index('nsites=') + 1]) if 'nsites=' in header else DEFAULT_SITES
+            rows = []
+            i += 1
+            while len(rows) < width and i < len(lines):
+                if lines[i].strip():
+                    rows.append([float(x) for x in lines[i].split()[:4]])
+                i += 1
+            motifs.append(Motif(motif_id, alt_id, rows, sites or DEFAULT_SITES))
+            continue
+        i += 1
+    for motif in motifs:
+        motif.background = background
+    return motifs, background
+
+
+# =============================================================================
+# Scores and p-values
+# =============================================================================
+
+# Class for a motif prepared for scanning: whole-number score matrices for
+# both strands, and the p-value of every whole-number score. background None
+# uses the motif's own background. The background is made strand-symmetric,
+# so the p-values are the same for both strands.
+class ScoringMatrix:
+
+    def __init__(self, motif, background=None, pseudocount=PSEUDOCOUNT):
+        self.motif = motif
+        background = symmetric_background(motif.background if background is None else background)
+        self.log_odds = motif.log_odds(background, pseudocount)
+
+        # Scale scores so each position's lowest score is 0 and the best
+        # total is SCORE_RANGE.
+        lowest = self.log_odds.min(axis=1, keepdims=True)
+        spread = (self.log_odds - lowest).max(axis=1).sum()
+        self.scale = SCORE_RANGE / spread if spread > 0 else 1.0
+        scaled = np.rint((self.log_odds - lowest) * self.scale).astype(np.int64)
+
+        # Exact distribution of the total score in random sequence: add one
+        # position at a time.
+        distribution = np.ones(1)
+        for row in scaled:
+            new = np.zeros(len(distribution) + row.max())
+            for letter in range(4):
+                new[row[letter]:row[letter] + len(distribution)] += distribution * background[letter]
+            distribution = new
+        # p_values[s] is the chance of a total score of at least s.
+        self.p_values = np.minimum(np.cumsum(distribution[::-1])[::-1], 1.0)
+
+        # Score matrices with a fifth column (0) for letters other than ACGT:
+        # forward strand, and reverse complement (read on the forward strand).
+        self.forward = np.hstack([scaled, np.zeros((len(scaled), 1), dtype=np.int64)])
+        self.reverse = np.hstack([scaled[::-1, ::-1], np.zeros((len(scaled), 1), dtype=np.int64)])
+
+    # Function for the smallest whole-number score with a p-value below
+    # threshold (past the highest score if there's none).
+    def cutoff(self, threshold):
+        passing = np.flatnonzero(self.p_values < threshold)
+        return int(passing[0]) if len(passing) else len(self.p_values)
+
+
+# Number of letters scored with one table lookup.
+BLOCK = 4
+# Letter codes (0-4) of each of the 5^BLOCK blocks of BLOCK letters.
+_BLOCK_LETTERS = np.array(np.unravel_index(np.arange(5 ** BLOCK), (5,) * BLOCK)).T
+
+
+# Function for the block code of every position: the codes of the BLOCK
+# letters starting there, as one base-5 number (letters past the end are 4).
+def _block_codes(codes):
+    padded = np.concatenate((codes, np.full(BLOCK, 4, dtype=codes.dtype))).astype(np.int32)
+    blocks = np.zeros(len(codes), dtype=np.int32)
+    for j in range(BLOCK):
+        blocks = blocks * 5 + padded[j:j + len(codes)]
+    return blocks
+
+
+# Function for the whole-number score of every window, with matrix (one row
+# per motif position, 5 columns). blocks are the block codes of the
+# sequence. Each group of BLOCK motif positions is scored with one lookup in
+# a table of the scores of every block.
+def _window_scores(blocks, matrix):
+    count = len(blocks) - len(matrix) + 1
+    scores = np.zeros(count, dtype=np.int32)
+    for first in range(0, len(matrix), BLOCK):
+        rows = matrix[first:first + BLOCK]
+        table = rows[np.arange(len(rows)), _BLOCK_LETTERS[:, :len(rows)]].sum(axis=1)
+        scores += table.astype(np.int32)[blocks[first:first + count]]
+    return scores
+
+
+# =============================================================================
+# Scanning
+# =============================================================================
+
+# Function for scanning sequences with motifs. names and sequences are lists
+# of sequence names and DNA sequences, and background the frequencies of A,
+# C, G and T (from read_meme()), or None to use each motif's own background
+# (for motifs from several files, like a motif library). Returns a FIMO-style DataFrame of every
+# site with a p-value below threshold, sorted by p-value.
+def scan_sequences(motifs, names, sequences, background, threshold=THRESHOLD,
+                   pseudocount=PSEUDOCOUNT):
+    names = list(names)
+    sequences = [str(x) for x in sequences]
+
+    # All sequences in one array of codes, with an N after each one, and the
+    # sequence number and start of every position.
+    joined = ''.join(x + 'N' for x in sequences)
+    codes = _CODES[np.frombuffer(joined.encode('ascii', 'replace'), dtype=np.uint8)]
+    lengths = np.array([len(x) + 1 for x in sequences], dtype=np.int64)
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    sequence_of = np.repeat(np.arange(len(sequences)), lengths)
+    # Number of letters other than ACGT before every position.
+    others = np.concatenate(([0], np.cumsum(codes == 4)))
+    blocks = _block_codes(codes)
+
+    hits = []
+    tested = 0
+    for motif in motifs:
+        width = len(motif)
+        if width == 0 or width > len(codes):
+            continue
+        matrix = ScoringMatrix(motif, background, pseudocount)
+        cutoff = matrix.cutoff(threshold)
+        count = len(codes) - width + 1
+        # Windows without other letters (so they don't cross sequences).
+        clean = others[width:width + count] - others[:count] == 0
+        tested += 2 * int(clean.sum())
+
+        for strand, scaled in [('+', matrix.forward), ('-', matrix.reverse)]:
+            scores = _window_scores(blocks, scaled)
+            positions = np.flatnonzero(clean & (scores >= cutoff))
+            if not len(positions):
+                continue
+            log_odds = matrix.log_odds if strand == '+' else matrix.log_odds[::-1, ::-1]
+            window_codes = codes[positions[:, None] + np.arange(width)]
+            hits.append(pd.DataFrame({
+                'motif_id': motif.id, 'motif_alt_id': motif.alt_id,
+                'sequence': sequence_of[positions],
+                'start': positions - starts[sequence_of[positions]] + 1,
+                'strand': strand,
+                'score': log_odds[np.arange(width), window_codes].sum(axis=1),
+                'p-value': matrix.p_values[scores[positions]]}))
+
+    if not hits:
+        return pd.DataFrame(columns=FIMO_COLUMNS)
+    hits = pd.concat(hits, ignore_index=True)
+    hits = hits.sort_values('p-value', kind='stable').reset_index(drop=True)
+
+    # Benjamini-Hochberg q-values: the sites are the smallest p-values of all
+    # positions tested, so their ranks are the same among all of them.
+    p_values = hits['p-value'].to_numpy()
+    q_values = p_values * tested / np.arange(1, len(p_values) + 1)
+    hits['q-value'] = np.minimum(np.minimum.accumulate(q_values[::-1])[::-1], 1.0)
+
+    # Sequence names, end coordinates and matched sequences (read on the
+    # motif's strand).
+    widths = hits['motif_id'].map({motif.id: len(motif) for motif in motifs}).to_numpy()
+    hits['stop'] = hits['start'] + widths - 1
+    hits['sequence_name'] = [names[i] for i in hits['sequence']]
+    matched = [sequences[i][start - 1:stop] for i, start, stop in
+               zip(hits['sequence'].tolist(), hits['start'].tolist(), hits['stop'].tolist())]
+    hits['matched_sequence'] = [site.upper() if strand == '+' else reverse_complement(site.upper())
+                                for site, strand in zip(matched, hits['strand'])]
+    return hits[FIMO_COLUMNS]
+
+
+# Function for scanning sequences with every motif of a motif file (MEME or
+# TRANSFAC), and writing the FIMO-style table to out_file (tab-separated,
+# like fimo.tsv). Motif files are read through the motif library cache (see
+# motif_library.py). Returns the table.
+def scan_meme_file(meme_file, names, sequences, out_file=None, threshold=THRESHOLD):
+    # Imported here because motif_library imports this module.
+    from motif_library import load_motif_library
+    motifs = load_motif_library(meme_file).motifs()
+    hits = scan_sequences(motifs, names, sequences, None, threshold)
+    if out_file:
+        hits.to_csv(out_file, sep='\t', index=False, float_format='%.6g')
+    return hits
@@ -0,0 +1,190 @@
+"""
+packed_genome.py
+    10/18/2026
+    This module stores a genome 2 bits per nucleotide (A=0, C=1, G=2, T=3) in a
+    numpy array, so it takes about 4 times less memory than a text genome and
+    several genomes can be loaded at once. Anything that isn't A, C, G or T
+    (N and other ambiguity codes) is kept in a small side table of runs, and
+    lowercase (soft-masked) regions in another, so decoding gives back exactly
+    the original sequence. Sequences are only decoded when they are sliced out.
+"""
+
+# Import numpy for packing and unpacking nucleotides.
+import numpy as np
+# Import GenomeBase for the fetch functions shared with genome.Genome.
+from genome import GenomeBase
+
+
+# =============================================================================
+# Lookup tables
+# =============================================================================
+
+# 2-bit code for every ASCII character. A, C, G and T (either case) get their
+# codes, everything else is stored as 0 and recorded in the side table.
+CODES = np.zeros(256, dtype=np.uint8)
+for _code, _base in enumerate('ACGT'):
+    CODES[ord(_base)] = _code
+    CODES[ord(_base.lower())] = _code
+
+# Characters that can be stored in 2 bits.
+IS_ACGT = np.zeros(256, dtype=bool)
+IS_ACGT[[ord(x) for x in 'ACGTacgt']] = True
+
+# ASCII character for every 2-bit code.
+BASES = np.frombuffer(b'ACGT', dtype=np.uint8)
+
+
+# Function for finding runs of True in a boolean array (also used by
+# peak_calling.py). Returns arrays of run starts and run ends (end not
+# included), 0-based.
+def true_runs(mask):
+    edges = np.diff(np.concatenate(([0], np.asarray(mask, dtype=bool).view(np.int8), [0])))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+
+# Function for finding which runs (given by sorted starts and ends) contain
+# each of the given positions. Returns a boolean array and the run index.
+def _in_runs(positions, starts, ends):
+    if len(starts) == 0:
+        return np.zeros(len(positions), dtype=bool), np.zeros(len(positions), dtype=np.int64)
+    run = np.searchsorted(starts, positions, side='right') - 1
+    inside = (run >= 0) & (positions < ends[np.maximum(run, 0)])
+    return inside, run
+
+
+# =============================================================================
+# Packed genome
+# =============================================================================
+
+# Class holding every record of a FASTA file packed 4 nucleotides per byte.
+# It has the same fetch(), fetch_many() and fetch_intervals() functions as
+# genome.Genome, so scripts can use either one.
+class PackedGenome(GenomeBase):
+
+    def __init__(self, records, starts, total_length, packed,
+                 ambiguous_starts, ambiguous_ends, ambiguous_chars,
+                 lowercase_starts, lowercase_ends):
+        GenomeBase.__init__(self, records, starts)
+        # Number of nucleotides in all records.
+        self.total_length = total_length
+        # Nucleotide i is in byte i // 4, first nucleotide in the highest 2 bits.
+        self.packed = packed
+        # Runs of the same character that isn't A, C, G or T:
+        # start, end (not included) and the character.
+        self.ambiguous_starts = ambiguous_starts
+        self.ambiguous_ends = ambiguous_ends
+        self.ambiguous_chars = ambiguous_chars
+        # Runs of lowercase nucleotides: start and end (not included).
+        self.lowercase_starts = lowercase_starts
+        self.lowercase_ends = lowercase_ends
+
+    # Number of bytes used by the packed genome and its side tables.
+    def nbytes(self):
+        return sum(x.nbytes for x in [self.packed, self.ambiguous_starts,
+                                      self.ambiguous_ends, self.ambiguous_chars,
+                                      self.lowercase_starts, self.lowercase_ends])
+
+    # Function for getting the 2-bit codes of the nucleotides at the given
+    # 0-based positions.
+    def _codes_at(self, positions):
+        shifts = (6 - 2 * (positions & 3)).astype(np.uint8)
+        return (self.packed[positions >> 2] >> shifts) & 3
+
+    # Function for decoding the nucleotides at the given 0-based positions
+    # into a uint8 array of ASCII characters.
+    def _gather(self, positions):
+        chars = BASES[self._codes_at(positions)]
+
+        # Lowercase runs that the positions fall in.
+        if len(self.lowercase_starts):
+            inside, run = _in_runs(positions, self.lowercase_starts, self.lowercase_ends)
+            chars[inside] += 32
+
+        # Ambiguous runs that the positions fall in.
+        if len(self.ambiguous_starts):
+            inside, run = _in_runs(positions, self.ambiguous_starts, self.ambiguous_ends)
+            chars[inside] = self.ambiguous_chars[run[inside]]
+
+        return chars
+
+    # Function for getting the 0-based positions between two 1-based
+    # coordinates of a contig (both ends included).
+    def _positions(self, left, right, contig):
+        number = self.record_number(contig)
+        self._check(np.array([left]), np.array([right]), np.array([number]))
+        return np.arange(self.starts[number] + left - 1, self.starts[number] + right,
+                         dtype=np.int64)
+
+    # Function for getting the 2-bit codes between two 1-based coordinates
+    # (both ends included), as a uint8 array.
+    def codes(self, left, right, contig=None):
+        return self._codes_at(self._positions(left, right, contig))
+
+    # Function for getting a zero-copy view of the packed bytes that hold the
+    # nucleotides between two 1-based coordinates. Returns the view and the
+    # index (0-3) of the left nucleotide inside the first byte.
+    def packed_view(self, left, right, contig=None):
+        positions = self._positions(left, right, contig)
+        first = int(positions[0])
+        last = int(positions[-1])
+        return self.packed[first >> 2:(last >> 2) + 1], first & 3
+
+    # Function for getting the integer code of every k-mer between two 1-based
+    # coordinates (k up to 32). Each k-mer's code is its 2-bit codes read as a
+    # base-4 number. Also returns a boolean array that is False for k-mers
+    # that overlap an ambiguous nucleotide.
+    def kmer_codes(self, left, right, k, contig=None):
+        # A uint64 holds at most 32 2-bit codes.
+        if not 1 <= k <= 32:
+            raise ValueError('k must be from 1 to 32, not ' + str(k))
+        positions = self._positions(left, right, contig)
+        codes = self._codes_at(positions).astype(np.uint64)
+        n = len(codes) - k + 1
+        if n <= 0:
+            return np.zeros(0, dtype=np.uint64), np.zeros(0, dtype=bool)
+
+        kmers = np.zeros(n, dtype=np.uint64)
+        for j in range(k):
+            kmers = (kmers << np.uint64(2)) | codes[j:j + n]
+
+        # k-mers that contain an ambiguous nucleotide aren't valid.
+        ambiguous = _in_runs(positions, self.ambiguous_starts, self.ambiguous_ends)[0]
+        counts = np.concatenate(([0], np.cumsum(ambiguous)))
+        valid = (counts[k:] - counts[:-k]) == 0
+        return kmers, valid
+
+
+# Function for packing a genome.Genome (or any bytes buffer of nucleotides,
+# with its .fai records and record starts) into a PackedGenome.
+def pack_genome(genome):
+
+    arr = np.frombuffer(genome.buffer, dtype=np.uint8)
+    total_length = len(arr)
+
+    # Pack 4 nucleotides per byte, padding the end with A.
+    codes = CODES[arr]
+    codes = np.concatenate((codes, np.zeros(-total_length % 4, dtype=np.uint8))).reshape(-1, 4)
+    packed = (codes[:, 0] << 6) | (codes[:, 1] << 4) | (codes[:, 2] << 2) | codes[:, 3]
+
+    # Runs of ambiguous characters. A new run starts where the character changes.
+    ambiguous = ~IS_ACGT[arr]
+    positions = np.flatnonzero(ambiguous)
+    if len(positions):
+        new_run = np.ones(len(positions), dtype=bool)
+        new_run[1:] = (np.diff(positions) != 1) | (arr[positions[1:]] != arr[positions[:-1]])
+        ambiguous_starts = positions[new_run]
+        run_lengths = np.diff(np.append(np.flatnonzero(new_run), len(positions)))
+        ambiguous_ends = ambiguous_starts + run_lengths
+        ambiguous_chars = arr[ambiguous_starts].copy()
+    else:
+        ambiguous_starts = np.zeros(0, dtype=np.int64)
+        ambiguous_ends = np.zeros(0, dtype=np.int64)
+        ambiguous_chars = np.zeros(0, dtype=np.uint8)
+
+    # Runs of lowercase A, C, G and T.
+    lowercase_starts, lowercase_ends = true_runs((arr >= ord('a')) & IS_ACGT[arr])
+
+    return PackedGenome(genome.records, list(genome.starts), total_length, packed,
+                        ambiguous_starts.astype(np.int64), ambiguous_ends.astype(np.int64),
+                        ambiguous_chars, lowercase_starts.astype(np.int64),
+                        lowercase_ends.astype(np.int64))
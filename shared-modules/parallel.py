@@ -0,0 +1,88 @@
+"""
+parallel.py
+    10/18/2026
+    This module splits a table into parts that hold whole sRNAs (peaks of
+    different sRNAs never interact) and runs a function on every part in a
+    pool of processes. Results come back in the order of the parts, so the
+    output is the same for any number of workers.
+
+    Worker processes are started with fork, so they share the parent's memory
+    (for example a loaded genome) and nothing but the part number and the
+    result is copied between processes. Where fork isn't available (Windows),
+    parts are run one after another in the same process.
+"""
+
+# Import os and multiprocessing for the process pool.
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+# Import numpy for splitting tables into parts.
+import numpy as np
+
+
+# Smallest number of rows worth sending to another process.
+MIN_PART_ROWS = 5000
+
+# Function and parts used by the worker processes (set before forking).
+_function = None
+_parts = None
+
+
+# Function for getting the number of workers: None means all cores.
+def worker_count(workers=None):
+    if workers is None:
+        workers = os.cpu_count() or 1
+    return max(int(workers), 1)
+
+
+# Function for splitting the rows of a table into parts that each hold whole
+# sRNAs. sRNAs is the table's sRNA column; rows of an sRNA don't have to be
+# next to each other. Returns a list of arrays of row numbers, one per part,
+# with sRNAs in order of their first row and rows in table order.
+# Parts have about the same number of rows.
+def split_by_sRNA(sRNAs, workers=None, min_rows=MIN_PART_ROWS):
+    codes, names = _first_appearance_codes(sRNAs)
+    rows = len(codes)
+    count = min(4 * worker_count(workers), len(names), max(rows // max(min_rows, 1), 1))
+    if count <= 1:
+        return [np.arange(rows)]
+
+    # Cut the sRNAs (in order) where the running number of rows passes each
+    # multiple of rows / count.
+    sizes = np.bincount(codes, minlength=len(names))
+    cuts = np.searchsorted(np.cumsum(sizes), np.arange(1, count) * rows / count)
+    part_of_sRNA = np.searchsorted(np.unique(cuts), np.arange(len(names)), side='right')
+    parts = part_of_sRNA[codes]
+    return [np.flatnonzero(parts == x) for x in np.unique(parts)]
+
+
+# Function for numbering sRNAs in order of their first appearance.
+# Returns the number of every row's sRNA and the array of sRNA names.
+def _first_appearance_codes(sRNAs):
+    names, first, codes = np.unique(np.asarray(sRNAs, dtype=str), return_index=True,
+                                    return_inverse=True)
+    # Renumber so the first sRNA in the table is 0, the next new one 1, ...
+    order = np.argsort(first, kind='stable')
+    renumber = np.empty(len(order), dtype=np.int64)
+    renumber[order] = np.arange(len(order))
+    return renumber[codes.ravel()], names[order]
+
+
+def _call(i):
+    return _function(_parts[i])
+
+
+# Function for running function(part) for every part, with up to workers
+# processes. Returns the results in the order of the parts.
+def map_parts(function, parts, workers=None):
+    global _function, _parts
+    workers = min(worker_count(workers), len(parts))
+    if workers <= 1 or 'fork' not in multiprocessing.get_all_start_methods():
+        return [function(part) for part in parts]
+
+    _function, _parts = function, parts
+    try:
+        with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('fork')) as pool:
+            return list(pool.map(_call, range(len(parts))))
+    finally:
+        _function, _parts = None, None
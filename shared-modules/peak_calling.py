@@ -0,0 +1,180 @@
+"""
+peak_calling.py
+    10/18/2026
+    This module calls peaks from per-position IPOD-HR occupancy (or SNR)
+    tracks, so peaks can be called again at new thresholds without an
+    external tool. Tracks are bedGraph files or NumPy arrays, and peaks are
+    written in the called_peaks CSV format that differential_peaks.py reads
+    (sRNA, sRNA_Peak, L_Coord, R_Coord, LastSNR, plus a Contig column for
+    the genome-wide mode).
+
+    A track is held as one array per contig, with the value of position p
+    (1-based) at index p - 1 and NaN where there's no data. Peaks are runs of
+    positions at or above a threshold, found for the whole track at once:
+    - The signal can first be smoothed with a sliding mean over a window.
+      Prefix sums of the values (and of the number of positions with data)
+      give the mean of any window in O(1).
+    - The positions above the threshold are run-length encoded into (start,
+      end) runs. Runs separated by short gaps can be joined, and short runs
+      dropped.
+    - A peak's SNR is the mean of its values (from the prefix sums) or their
+      maximum (one reduceat over all peaks).
+"""
+
+# Import os and gzip for reading files.
+import os
+import gzip
+# Import Pandas and numpy for tracks and peak tables.
+import pandas as pd
+import numpy as np
+# Import true_runs from packed_genome module, used for finding runs of positions.
+from packed_genome import true_runs
+
+
+# Number of bedGraph lines read at a time.
+CHUNK_ROWS = 1000000
+
+
+# =============================================================================
+# Reading tracks
+# =============================================================================
+
+# Function for counting the header lines ('track', 'browser' or '#') at the
+# start of a bedGraph file.
+def _header_lines(path):
+    count = 0
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt') as handle:
+        for line in handle:
+            if not line.startswith(('track', 'browser', '#')):
+                break
+            count += 1
+    return count
+
+
+# Function for reading a bedGraph file (contig, 0-based start, end, value;
+# can be gzip compressed). Returns a dict of one float32 array per contig, in
+# file order. Positions not in the file are NaN.
+def read_bedgraph(path, chunk_rows=CHUNK_ROWS):
+    pieces = {}
+    for chunk in pd.read_csv(path, sep=r'\s+', header=None, usecols=[0, 1, 2, 3],
+                             names=['contig', 'start', 'end', 'value'],
+                             dtype={'contig': str}, skiprows=_header_lines(path),
+                             chunksize=chunk_rows):
+        for contig, rows in chunk.groupby('contig', sort=False):
+            pieces.setdefault(contig, []).append(rows)
+
+    track = {}
+    for contig, rows in pieces.items():
+        rows = pd.concat(rows)
+        starts = rows['start'].to_numpy(dtype=np.int64)
+        ends = rows['end'].to_numpy(dtype=np.int64)
+        lengths = ends - starts
+        values = np.full(int(ends.max()) if len(ends) else 0, np.nan, dtype=np.float32)
+        # Every position of every interval: interval start plus the offset
+        # inside the interval.
+        offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        values[np.repeat(starts, lengths) + offsets] = np.repeat(rows['value'].to_numpy(dtype=np.float32),
+                                                                 lengths)
+        track[contig] = values
+    return track
+
+
+# Function for reading a track: a bedGraph file, a .npy file (one value per
+# position from position 1, on contig, default the file name), or a .npz
+# file (one array per contig).
+def read_track(path, contig=None):
+    if path.endswith('.npy'):
+        name = contig or os.path.splitext(os.path.basename(path))[0]
+        return {name: np.load(path, mmap_mode='r')}
+    if path.endswith('.npz'):
+        with np.load(path) as arrays:
+            return {name: arrays[name] for name in arrays.files}
+    return read_bedgraph(path)
+
+
+# =============================================================================
+# Calling peaks
+# =============================================================================
+
+# Function for calling peaks in one contig's values. Peaks are runs of at
+# least min_length positions where the signal is at least threshold, with
+# runs less than or equal to max_gap positions apart joined. The signal is
+# the sliding mean over window positions (centered), or the values
+# themselves for a window of 1. A peak's SNR is the 'max' or 'mean' of its
+# values (snr). Returns a DataFrame with L_Coord, R_Coord (1-based,
+# inclusive) and SNR (NaN if the peak has no values).
+def call_peaks(values, threshold, min_length=1, max_gap=0, window=1, snr='max'):
+    values = np.asarray(values, dtype=np.float64)
+    size = len(values)
+    has_value = ~np.isnan(values)
+
+    # Prefix sums: sums[i] is the sum of the first i values, counts[i] the
+    # number of them that aren't NaN.
+    sums = np.concatenate(([0.0], np.cumsum(np.where(has_value, values, 0.0))))
+    counts = np.concatenate(([0], np.cumsum(has_value)))
+
+    if window > 1:
+        lows = np.clip(np.arange(size) - window // 2, 0, size)
+        highs = np.clip(lows + window, 0, size)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            signal = (sums[highs] - sums[lows]) / (counts[highs] - counts[lows])
+    else:
+        signal = values
+
+    with np.errstate(invalid='ignore'):
+        starts, ends = true_runs(signal >= threshold)
+
+    # Join runs with short gaps between them, then drop short runs.
+    if max_gap > 0 and len(starts) > 1:
+        apart = starts[1:] - ends[:-1] > max_gap
+        starts = starts[np.concatenate(([True], apart))]
+        ends = ends[np.concatenate((apart, [True]))]
+    long = ends - starts >= min_length
+    starts, ends = starts[long], ends[long]
+
+    if snr == 'mean':
+        with np.errstate(divide='ignore', invalid='ignore'):
+            peak_snrs = (sums[ends] - sums[starts]) / (counts[ends] - counts[starts])
+    elif len(starts):
+        # Maximum of values[start:end] for every peak: reduce over start,
+        # end, start, end, ... and keep every other result.
+        padded = np.append(values, np.nan)
+        peak_snrs = np.fmax.reduceat(padded, np.ravel(np.column_stack((starts, ends))))[::2]
+    else:
+        peak_snrs = np.zeros(0)
+
+    return pd.DataFrame({'L_Coord': starts + 1, 'R_Coord': ends, 'SNR': peak_snrs})
+
+
+# Function for the LastSNR text of every SNR (like 'peak_1.25snr'), which
+# peaks.parse_snr() reads back. Peaks without an SNR get 'peak_snr'.
+def format_snr(snrs):
+    snrs = pd.Series(snrs, dtype=np.float64)
+    text = 'peak_' + snrs.map('{:.2f}'.format) + 'snr'
+    return text.where(snrs.notna(), 'peak_snr')
+
+
+# Function for calling the peaks of a whole track (dict of one array per
+# contig, from read_track()) and making a called_peaks DataFrame: sRNA,
+# sRNA_Peak ('<sRNA>_<number>'), L_Coord, R_Coord, LastSNR and Contig.
+# The sRNA column is name, or the contig if name is None. Other arguments
+# are passed to call_peaks().
+def call_track_peaks(track, threshold, name=None, **options):
+    tables = []
+    for contig, values in track.items():
+        peaks = call_peaks(values, threshold, **options)
+        peaks.insert(0, 'sRNA', contig if name is None else name)
+        peaks['Contig'] = contig
+        tables.append(peaks)
+    if not tables:
+        return pd.DataFrame(columns=['sRNA', 'sRNA_Peak', 'L_Coord', 'R_Coord', 'LastSNR', 'Contig'])
+
+    peaks = pd.concat(tables, ignore_index=True)
+    numbers = peaks.groupby('sRNA', sort=False).cumcount() + 1
+    return pd.DataFrame({'sRNA': peaks['sRNA'],
+                         'sRNA_Peak': peaks['sRNA'].astype(str) + '_' + numbers.astype(str),
+                         'L_Coord': peaks['L_Coord'],
+                         'R_Coord': peaks['R_Coord'],
+                         'LastSNR': format_snr(peaks['SNR']),
+                         'Contig': peaks['Contig']})
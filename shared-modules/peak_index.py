@@ -0,0 +1,258 @@
+"""
+peak_index.py
+    10/18/2026
+    This module keeps the merged peaks of differential_peaks.py in an SQLite
+    database between runs, so adding a condition doesn't mean merging every
+    condition again. The database holds:
+    - the peaks of every condition (and a hash of its file),
+    - the merged rows of every sRNA (one row per cell: sRNA, row, condition,
+      coordinates and SNR),
+    - the DNA sequences already extracted for peak regions.
+
+    When a condition is added (or its file changes), only the sRNAs that have
+    peaks in it are merged again, from the stored peaks of all conditions.
+    Every other sRNA keeps its rows, which only get an empty cell for the new
+    condition. Sequences are only extracted for peak regions that aren't in
+    the database yet.
+
+    Conditions are kept in the order they were added. Merging uses the same
+    rules as peaks.py; if n or match_all_conditions change, every sRNA is
+    merged again.
+"""
+
+# Import os, hashlib and sqlite3 for the database file.
+import os
+import hashlib
+import sqlite3
+# Import Pandas and numpy for peak tables.
+import pandas as pd
+import numpy as np
+# Import peaks module for reading and merging peaks.
+from peaks import PeakMerger, read_peak_file
+
+
+# Tables and indexes of the database.
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS conditions (number INTEGER PRIMARY KEY, name TEXT UNIQUE,
+                                       file TEXT, sha256 TEXT);
+CREATE TABLE IF NOT EXISTS peaks (condition INTEGER, position INTEGER, sRNA TEXT,
+                                  left_coord INTEGER, right_coord INTEGER, snr REAL);
+CREATE INDEX IF NOT EXISTS peaks_sRNA ON peaks (sRNA);
+CREATE TABLE IF NOT EXISTS sRNAs (sRNA TEXT PRIMARY KEY, position INTEGER);
+CREATE TABLE IF NOT EXISTS merged (sRNA TEXT, row INTEGER, condition INTEGER,
+                                   left_coord INTEGER, right_coord INTEGER, snr REAL);
+CREATE INDEX IF NOT EXISTS merged_sRNA ON merged (sRNA);
+CREATE TABLE IF NOT EXISTS sequences (contig TEXT, left_coord INTEGER, right_coord INTEGER,
+                                      strand TEXT, sequence TEXT,
+                                      PRIMARY KEY (contig, left_coord, right_coord, strand));
+'''
+
+
+# Function for the sha256 hash of a file.
+def _file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# Function for converting an array to a list for SQLite, with NaN as None.
+def _sql_values(values):
+    values = np.asarray(values, dtype=np.float64)
+    return [None if np.isnan(x) else x for x in values.tolist()]
+
+
+# Class for a merged peak index stored in an SQLite file.
+class PeakIndex:
+
+    def __init__(self, path, n, match_all_conditions=False):
+        self.path = path
+        self.n = n
+        self.match_all_conditions = match_all_conditions
+        self.db = sqlite3.connect(path)
+        self.db.executescript(SCHEMA)
+
+        # Merge everything again if the merging settings changed.
+        settings = {'n': str(n), 'match_all_conditions': str(bool(match_all_conditions))}
+        if self._settings() != settings:
+            if self.condition_names():
+                self._recompute(None)
+            self.db.executemany("INSERT OR REPLACE INTO settings VALUES (?, ?)", settings.items())
+            self.db.commit()
+
+    def _settings(self):
+        rows = self.db.execute("SELECT key, value FROM settings WHERE key IN "
+                               "('n', 'match_all_conditions')").fetchall()
+        return dict(rows)
+
+    def close(self):
+        self.db.close()
+
+    # Function for getting the names of all conditions, in the order they
+    # were added.
+    def condition_names(self):
+        return [row[0] for row in self.db.execute("SELECT name FROM conditions ORDER BY number")]
+
+    # Function for adding a condition from its called_peaks CSV file, or
+    # updating it if the file changed. Returns the set of sRNAs that were
+    # merged again (empty if the file didn't change).
+    def update_condition(self, name, peak_file):
+        sha256 = _file_hash(peak_file)
+        row = self.db.execute("SELECT number, sha256 FROM conditions WHERE name = ?",
+                              (name,)).fetchone()
+        if row is not None and row[1] == sha256:
+            return set()
+
+        if row is None:
+            number = len(self.condition_names())
+            old_sRNAs = set()
+        else:
+            number = row[0]
+            old_sRNAs = {x[0] for x in self.db.execute(
+                "SELECT DISTINCT sRNA FROM peaks WHERE condition = ?", (number,))}
+            self.db.execute("DELETE FROM peaks WHERE condition = ?", (number,))
+
+        peaks = read_peak_file(peak_file)
+        sRNAs = peaks['sRNA'].astype(str).tolist()
+        self.db.executemany("INSERT INTO peaks VALUES (?, ?, ?, ?, ?, ?)",
+                            zip([number] * len(sRNAs), range(len(sRNAs)), sRNAs,
+                                peaks['L_Coord'].tolist(), peaks['R_Coord'].tolist(),
+                                _sql_values(peaks['SNR'])))
+        self.db.execute("INSERT OR REPLACE INTO conditions VALUES (?, ?, ?, ?)",
+                        (number, name, os.path.abspath(peak_file), sha256))
+
+        affected = old_sRNAs | set(sRNAs)
+        self._recompute(affected)
+        self.db.commit()
+        return affected
+
+    # Function for selecting rows of a table for a set of sRNAs (None means
+    # all sRNAs), through a temporary table of sRNA names.
+    def _select(self, query, sRNAs, order=''):
+        if sRNAs is None:
+            return self.db.execute(query + order).fetchall()
+        self.db.execute("CREATE TEMP TABLE IF NOT EXISTS selected (sRNA TEXT PRIMARY KEY)")
+        self.db.execute("DELETE FROM selected")
+        self.db.executemany("INSERT INTO selected VALUES (?)", [(x,) for x in sRNAs])
+        return self.db.execute(query + " WHERE sRNA IN (SELECT sRNA FROM selected)" + order).fetchall()
+
+    # Function for merging the stored peaks of a set of sRNAs (None means all
+    # sRNAs) again and replacing their merged rows.
+    def _recompute(self, sRNAs):
+        names = self.condition_names()
+        peaks = pd.DataFrame(self._select("SELECT condition, position, sRNA, left_coord, "
+                                          "right_coord, snr FROM peaks", sRNAs,
+                                          " ORDER BY condition, position"),
+                             columns=['condition', 'position', 'sRNA', 'left', 'right', 'snr'])
+        peaks['snr'] = pd.to_numeric(peaks['snr'])
+
+        # Merge the peaks of these sRNAs (see peaks.py).
+        merger = PeakMerger(self.n, self.match_all_conditions)
+        columns = []
+        for k in range(len(names)):
+            condition = peaks[peaks['condition'] == k]
+            columns.append((condition['sRNA'], condition['left'], condition['right'],
+                            condition['snr']))
+        merger.add_sorted_conditions(columns)
+        table = merger.table(names)
+
+        # Replace the merged rows of these sRNAs.
+        if sRNAs is None:
+            self.db.execute("DELETE FROM merged")
+            self.db.execute("DELETE FROM sRNAs")
+        else:
+            self._select("DELETE FROM merged", sRNAs)
+            self._select("DELETE FROM sRNAs", sRNAs)
+
+        # Position of every sRNA's first peak in the first condition's file,
+        # for putting sRNAs in file order.
+        first = peaks[peaks['condition'] == 0].groupby('sRNA', sort=False)['position'].min()
+        self.db.executemany("INSERT INTO sRNAs VALUES (?, ?)",
+                            zip(first.index.tolist(), first.tolist()))
+
+        rows = table.groupby('sRNA', sort=False).cumcount().tolist()
+        for k, name in enumerate(names):
+            has_peak = table[name + ' L'].notna().to_numpy()
+            self.db.executemany(
+                "INSERT INTO merged VALUES (?, ?, ?, ?, ?, ?)",
+                zip(table['sRNA'][has_peak].tolist(), np.asarray(rows)[has_peak].tolist(),
+                    [k] * int(has_peak.sum()),
+                    table[name + ' L'][has_peak].astype(np.int64).tolist(),
+                    table[name + ' R'][has_peak].astype(np.int64).tolist(),
+                    _sql_values(table[name + ' SNR'][has_peak])))
+
+    # Function for building the merged DataFrame of all conditions, the same
+    # as peaks.merge_conditions() would for the stored peaks.
+    def merged_table(self):
+        names = self.condition_names()
+        cells = pd.DataFrame(self.db.execute(
+            "SELECT merged.sRNA, sRNAs.position, merged.row, merged.condition, "
+            "merged.left_coord, merged.right_coord, merged.snr "
+            "FROM merged JOIN sRNAs ON merged.sRNA = sRNAs.sRNA").fetchall(),
+            columns=['sRNA', 'position', 'row', 'condition', 'left', 'right', 'snr'])
+
+        # Number the rows: sRNAs in file order, rows of each sRNA in order.
+        keys = cells[['position', 'row']].drop_duplicates().sort_values(['position', 'row'])
+        keys['number'] = np.arange(len(keys.index))
+        cells = cells.merge(keys, on=['position', 'row'])
+        number = cells['number'].to_numpy()
+
+        sRNA_names = np.empty(len(keys.index), dtype=object)
+        sRNA_names[number] = cells['sRNA'].to_numpy()
+        columns = {'sRNA': sRNA_names,
+                   'sRNA peak': np.full(len(keys.index), np.nan, dtype=object)}
+        for k, name in enumerate(names):
+            condition = (cells['condition'] == k).to_numpy()
+            for column, suffix in [('left', ' L'), ('right', ' R'), ('snr', ' SNR')]:
+                values = np.full(len(keys.index), np.nan)
+                values[number[condition]] = pd.to_numeric(cells[column][condition]).to_numpy(dtype=np.float64)
+                columns[name + suffix] = values
+        return pd.DataFrame(columns)
+
+    # =========================================================================
+    # Sequences of peak regions
+    # =========================================================================
+
+    # Function for making sure stored sequences come from this genome file.
+    # If the genome file changed, stored sequences are removed.
+    def use_genome(self, genome_path):
+        stat = os.stat(genome_path)
+        genome = os.path.abspath(genome_path) + '|' + str(stat.st_size) + '|' + str(stat.st_mtime_ns)
+        row = self.db.execute("SELECT value FROM settings WHERE key = 'genome'").fetchone()
+        if row is None or row[0] != genome:
+            self.db.execute("DELETE FROM sequences")
+            self.db.execute("INSERT OR REPLACE INTO settings VALUES ('genome', ?)", (genome,))
+            self.db.commit()
+
+    # Function for getting the keys (contig, left, right, strand) of a table
+    # of regions with 'left', 'right', 'strand' and optionally 'contig'.
+    def _region_keys(self, regions):
+        contigs = regions['contig'].astype(str).tolist() if 'contig' in regions else [''] * len(regions['left'])
+        return list(zip(contigs, np.asarray(regions['left'], dtype=np.int64).tolist(),
+                        np.asarray(regions['right'], dtype=np.int64).tolist(),
+                        [str(x) for x in regions['strand']]))
+
+    # Function for getting the stored sequence of every region, in table
+    # order. Regions without a stored sequence are None.
+    def cached_sequences(self, regions):
+        keys = self._region_keys(regions)
+        self.db.execute("CREATE TEMP TABLE IF NOT EXISTS wanted (number INTEGER, contig TEXT, "
+                        "left_coord INTEGER, right_coord INTEGER, strand TEXT)")
+        self.db.execute("DELETE FROM wanted")
+        self.db.executemany("INSERT INTO wanted VALUES (?, ?, ?, ?, ?)",
+                            [(i,) + key for i, key in enumerate(keys)])
+        sequences = [None] * len(keys)
+        for i, sequence in self.db.execute(
+                "SELECT wanted.number, sequences.sequence FROM wanted JOIN sequences "
+                "USING (contig, left_coord, right_coord, strand)"):
+            sequences[i] = sequence
+        return sequences
+
+    # Function for storing the sequences of a table of regions.
+    def store_sequences(self, regions, sequences):
+        self.db.executemany("INSERT OR REPLACE INTO sequences VALUES (?, ?, ?, ?, ?)",
+                            [key + (sequence,) for key, sequence in
+                             zip(self._region_keys(regions), sequences)])
+        self.db.commit()
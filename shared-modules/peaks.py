@@ -0,0 +1,471 @@
+"""
+peaks.py
+    10/18/2026
+    This module merges sRNA peaks from different IPOD-HR conditions, for
+    differential_peaks.py. Two peaks of the same sRNA are the same peak if they
+    overlap by at least n nucleotides.
+
+    Merging works like the original loop in differential_peaks.py:
+    - Every peak of the first condition gets its own merged row.
+    - Each peak of a later condition is added to the first merged row (in row
+      order) of the same sRNA that it overlaps by at least n nucleotides.
+      Only the first condition's peaks are compared, unless
+      match_all_conditions is True, in which case the peaks of every earlier
+      condition are compared (the transcription-factors version).
+    - If there is no such row, the peak gets a new row at the end of its sRNA.
+    - Peaks of sRNAs that have no rows (no peaks in the first condition) are
+      left out, unless keep_new_sRNAs is True (then they get rows too, after
+      the sRNAs of the first condition).
+
+    - If several peaks of a condition go to the same row, the last one is
+      kept (its SNR only if it has one).
+
+    Instead of comparing sets of positions against every row of the table,
+    peaks of each sRNA are kept sorted by left coordinate, with the running
+    maximum of right coordinates, so each new peak only looks at the peaks
+    that can overlap it. Peaks are kept as columns (arrays) per condition and
+    the merged DataFrame is built once, with table().
+
+    Conditions can be added one at a time (add_condition()), or all at once
+    (add_sorted_conditions()): each condition is sorted by sRNA and left
+    coordinate, and the sorted conditions are merged into one stream, so the
+    peaks of each sRNA from every condition are merged together in one pass.
+    merge_conditions() does this for groups of sRNAs in separate processes.
+"""
+
+# Import bisect for binary search in sorted lists of coordinates.
+from bisect import bisect_right
+# Import heapq, groupby and itemgetter for merging sorted conditions.
+import heapq
+from itertools import groupby
+from operator import itemgetter
+# Import numpy for working with whole columns of coordinates.
+import numpy as np
+# Import Pandas for building the merged DataFrame.
+import pandas as pd
+# Import math for infinity (position of sRNAs that go last).
+import math
+# Import parallel module for merging groups of sRNAs in separate processes.
+from parallel import split_by_sRNA, map_parts
+
+
+# =============================================================================
+# Reading peak files
+# =============================================================================
+
+# Function for reading a called_peaks CSV file. Columns are found by position:
+# sRNA, sRNA_Peak, L_Coord, R_Coord and LastSNR (for example 'SNR__0.50' or
+# 'peak_1.0snr'). Returns a DataFrame with columns sRNA (categorical),
+# sRNA_Peak, L_Coord and R_Coord (int32), and SNR (float64, NaN for peaks
+# without an SNR).
+def read_peak_file(path):
+    df = pd.read_csv(path)
+    return pd.DataFrame({'sRNA': df.iloc[:, 0].astype('category'),
+                         'sRNA_Peak': df.iloc[:, 1],
+                         'L_Coord': df.iloc[:, 2].astype(np.int32),
+                         'R_Coord': df.iloc[:, 3].astype(np.int32),
+                         'SNR': parse_snr(df.iloc[:, 4])})
+
+
+# Function for getting the SNRs (float64, like min_SNR, so an SNR equal to
+# min_SNR compares as equal) of a LastSNR column.
+def parse_snr(last_SNR):
+    last_SNR = last_SNR.astype(str)
+
+    # The SNR is the first decimal number in LastSNR. Values with nothing
+    # between the 5 character prefix and the last 3 characters have no SNR.
+    snrs = last_SNR.str.extract(r'(\d+\.\d+)', expand=False).astype(np.float64)
+    snrs[last_SNR.str[5:-3] == ''] = np.nan
+    return snrs
+
+
+# Function for getting the (sRNAs, lefts, rights, snrs) columns of a peak file
+# read with read_peak_file(), for PeakMerger and merge_conditions().
+def peak_columns(peaks):
+    return (peaks['sRNA'], peaks['L_Coord'].to_numpy(), peaks['R_Coord'].to_numpy(),
+            peaks['SNR'].to_numpy())
+
+
+# =============================================================================
+# Overlap search
+# =============================================================================
+
+# Class for finding, among a set of peaks (intervals), the row of the first
+# peak that overlaps a new peak by at least n nucleotides.
+class OverlapIndex:
+
+    def __init__(self, lefts, rights, rows, n):
+        self.n = n
+        # Smallest row of all peaks, used when n is 0 or less (every peak matches).
+        self.first_row = int(min(rows)) if len(rows) else -1
+
+        # Peaks shorter than n can't overlap anything by n nucleotides.
+        lefts = np.asarray(lefts, dtype=np.int64)
+        rights = np.asarray(rights, dtype=np.int64)
+        rows = np.asarray(rows, dtype=np.int64)
+        keep = rights - lefts + 1 >= n
+        lefts, rights, rows = lefts[keep], rights[keep], rows[keep]
+        order = np.lexsort((rows, rights, lefts))
+        # Lists are faster than arrays for looking up one peak at a time.
+        self.lefts = lefts[order].tolist()
+        self.rights = rights[order].tolist()
+        self.rows = rows[order].tolist()
+
+        # Largest right coordinate of all peaks up to each position, so the
+        # search can stop once no earlier peak reaches far enough right.
+        self.max_rights = np.maximum.accumulate(rights[order]).tolist()
+
+    # Function for finding the smallest row whose peak overlaps the peak from
+    # left to right by at least n nucleotides. Returns -1 if there isn't one.
+    def first_match(self, left, right):
+        n = self.n
+        if n <= 0:
+            return self.first_row
+        if right - left + 1 < n:
+            return -1
+
+        # Overlap is min(right) - max(left) + 1, so a peak overlaps by n if it
+        # starts at or before right - n + 1 and ends at or after left + n - 1.
+        j = bisect_right(self.lefts, right - n + 1) - 1
+        need = left + n - 1
+        best = -1
+        while j >= 0 and self.max_rights[j] >= need:
+            if self.rights[j] >= need and (best < 0 or self.rows[j] < best):
+                best = self.rows[j]
+            j -= 1
+        return best
+
+
+# =============================================================================
+# Merging conditions
+# =============================================================================
+
+# Function for going through a condition's peaks sorted by sRNA and left
+# coordinate. Yields (sRNA, left, condition number, position in file, right,
+# SNR) for every peak.
+def _sorted_peaks(k, sRNAs, lefts, rights, snrs=None):
+    sRNAs = np.asarray(sRNAs, dtype=str)
+    lefts = np.asarray(lefts, dtype=np.int64)
+    rights = np.asarray(rights, dtype=np.int64)
+    snrs = np.full(len(lefts), np.nan) if snrs is None else np.asarray(snrs, dtype=np.float64)
+    order = np.lexsort((lefts, sRNAs))
+    return zip(sRNAs[order].tolist(), lefts[order].tolist(), [k] * len(order), order.tolist(),
+               rights[order].tolist(), snrs[order].tolist())
+
+
+# Class that merges conditions one at a time. Merged rows are numbered in the
+# order they are made; row_order() gives the order of the final table (rows
+# grouped by sRNA, in the order the sRNAs first appear).
+class PeakMerger:
+
+    def __init__(self, n, match_all_conditions=False, keep_new_sRNAs=False):
+        self.n = n
+        self.match_all_conditions = match_all_conditions
+        self.keep_new_sRNAs = keep_new_sRNAs
+        # Number of conditions added so far.
+        self.conditions = 0
+        # sRNA name of every merged row.
+        self.row_sRNAs = []
+        # Rows of every sRNA, in the order they were made.
+        self.sRNA_rows = {}
+        # Position of every sRNA's first peak in the first condition's file,
+        # for putting the sRNAs in file order (infinity for sRNAs without
+        # peaks in the first condition, which go last).
+        self.sRNA_positions = {}
+        # Peaks that new peaks are compared to, for every sRNA:
+        # lists of left coordinates, right coordinates and rows.
+        self.references = {}
+        # Peaks added for every condition: arrays of merged rows, left
+        # coordinates, right coordinates and SNRs.
+        self.peaks = []
+
+    # Function for adding a condition's peaks. sRNAs, lefts, rights and snrs
+    # are columns of the condition's peak file, in file order (snrs is NaN
+    # for peaks without an SNR, and can be left out).
+    # Returns arrays of (merged row, peak number in file) for every peak that
+    # was added, in file order. Peaks that were left out aren't included.
+    def add_condition(self, sRNAs, lefts, rights, snrs=None):
+        sRNAs = list(sRNAs)
+        lefts = [int(x) for x in lefts]
+        rights = [int(x) for x in rights]
+        if snrs is None:
+            snrs = np.full(len(lefts), np.nan)
+        k = self.conditions
+        rows = []
+        peak_numbers = []
+
+        # First condition: every peak gets its own row.
+        if k == 0:
+            for j, sRNA in enumerate(sRNAs):
+                self.sRNA_positions.setdefault(sRNA, j)
+                row = self._new_row(sRNA)
+                rows.append(row)
+                peak_numbers.append(j)
+
+        # Later conditions: compare each peak to the reference peaks of its sRNA.
+        else:
+            indexes = {}
+            for j, sRNA in enumerate(sRNAs):
+                if sRNA not in self.sRNA_rows:
+                    if not self.keep_new_sRNAs:
+                        continue
+                    self.sRNA_positions.setdefault(sRNA, math.inf)
+                if sRNA not in indexes:
+                    reference = self.references.get(sRNA, ([], [], []))
+                    indexes[sRNA] = OverlapIndex(*reference, self.n)
+
+                row = indexes[sRNA].first_match(lefts[j], rights[j])
+                if row < 0:
+                    row = self._new_row(sRNA)
+                rows.append(row)
+                peak_numbers.append(j)
+
+        rows = np.array(rows, dtype=np.int64)
+        peak_numbers = np.array(peak_numbers, dtype=np.int64)
+        self.peaks.append((rows, np.array(lefts, dtype=np.int64)[peak_numbers],
+                           np.array(rights, dtype=np.int64)[peak_numbers],
+                           np.asarray(snrs, dtype=np.float64)[peak_numbers]))
+        self.conditions += 1
+
+        # Add this condition's peaks to the reference peaks.
+        if k == 0 or self.match_all_conditions:
+            cell_rows, cell_lefts, cell_rights, cell_snrs = self.condition_cells(k)
+            for row, left, right in zip(cell_rows.tolist(), cell_lefts.tolist(),
+                                        cell_rights.tolist()):
+                reference = self.references.setdefault(self.row_sRNAs[row], ([], [], []))
+                reference[0].append(left)
+                reference[1].append(right)
+                reference[2].append(row)
+
+        return rows, peak_numbers
+
+    # Function for adding all conditions at once with a k-way merge.
+    # conditions is a list of (sRNAs, lefts, rights, snrs) columns, one per
+    # condition, in the order they are compared (snrs can be None). Gives the
+    # same rows as adding the conditions one at a time with add_condition().
+    def add_sorted_conditions(self, conditions):
+        if self.conditions:
+            raise ValueError("add_sorted_conditions() can't be used after add_condition()")
+
+        streams = [_sorted_peaks(k, *columns) for k, columns in enumerate(conditions)]
+        # Rows, left coordinates, right coordinates and SNRs for every condition.
+        collected = [([], [], [], []) for columns in conditions]
+
+        # Peaks come out sorted by sRNA, so all peaks of one sRNA come together.
+        for sRNA, group in groupby(heapq.merge(*streams), key=itemgetter(0)):
+
+            # Peaks of this sRNA for every condition: (position in file, left,
+            # right, SNR).
+            sRNA_peaks = [[] for columns in conditions]
+            for name, left, k, j, right, snr in group:
+                sRNA_peaks[k].append((j, left, right, snr))
+            # sRNAs without peaks in the first condition are left out.
+            if not sRNA_peaks[0] and not self.keep_new_sRNAs:
+                continue
+
+            references = ([], [], [])
+            for k, peaks in enumerate(sRNA_peaks):
+                # Peaks are added in file order, like add_condition().
+                peaks.sort()
+                if k == 0:
+                    self.sRNA_positions[sRNA] = peaks[0][0] if peaks else math.inf
+                else:
+                    index = OverlapIndex(*references, self.n)
+
+                # Left and right coordinates of the last peak in every row.
+                cells = {}
+                rows, lefts, rights, snrs = collected[k]
+                for j, left, right, snr in peaks:
+                    row = -1 if k == 0 else index.first_match(left, right)
+                    if row < 0:
+                        row = self._new_row(sRNA)
+                    cells[row] = (left, right)
+                    rows.append(row)
+                    lefts.append(left)
+                    rights.append(right)
+                    snrs.append(snr)
+
+                # Add this condition's peaks to the reference peaks.
+                if k == 0 or self.match_all_conditions:
+                    for row in sorted(cells):
+                        references[0].append(cells[row][0])
+                        references[1].append(cells[row][1])
+                        references[2].append(row)
+
+        for rows, lefts, rights, snrs in collected:
+            self.peaks.append((np.array(rows, dtype=np.int64), np.array(lefts, dtype=np.int64),
+                               np.array(rights, dtype=np.int64), np.array(snrs, dtype=np.float64)))
+        self.conditions = len(conditions)
+
+    # Function for getting the final cells of condition k: arrays of rows
+    # (sorted), left and right coordinates, and SNRs. When several peaks went
+    # to the same row, the coordinates of the last one are kept, and the SNR
+    # of the last one that has an SNR.
+    def condition_cells(self, k):
+        rows, lefts, rights, snrs = self.peaks[k]
+
+        # Index of the last peak in every row.
+        cell_rows, last = np.unique(rows[::-1], return_index=True)
+        last = len(rows) - 1 - last
+
+        # SNR of the last peak with an SNR in every row.
+        cell_snrs = np.full(len(cell_rows), np.nan)
+        has_snr = np.flatnonzero(~np.isnan(snrs))
+        snr_rows, snr_last = np.unique(rows[has_snr][::-1], return_index=True)
+        cell_snrs[np.searchsorted(cell_rows, snr_rows)] = snrs[has_snr][len(has_snr) - 1 - snr_last]
+
+        return cell_rows, lefts[last], rights[last], cell_snrs
+
+    # Function for making a new merged row at the end of an sRNA's rows.
+    def _new_row(self, sRNA):
+        row = len(self.row_sRNAs)
+        self.row_sRNAs.append(sRNA)
+        self.sRNA_rows.setdefault(sRNA, []).append(row)
+        return row
+
+    # Function for getting the order of rows in the final merged table.
+    def row_order(self):
+        order = []
+        for sRNA in sorted(self.sRNA_rows, key=self.sRNA_positions.get):
+            order.extend(self.sRNA_rows[sRNA])
+        return order
+
+    # Function for building the merged DataFrame, with columns 'sRNA',
+    # 'sRNA peak' (empty), and '<name> L', '<name> R', '<name> SNR' for every
+    # condition name. Rows are in row_order(); empty cells are NaN.
+    def table(self, names):
+        order = np.array(self.row_order(), dtype=np.int64)
+        # Position of every row in the table.
+        position = np.empty(len(order), dtype=np.int64)
+        position[order] = np.arange(len(order))
+
+        columns = {'sRNA': np.array(self.row_sRNAs, dtype=object)[order],
+                   'sRNA peak': np.full(len(order), np.nan, dtype=object)}
+        for k, name in enumerate(names):
+            lefts = np.full(len(order), np.nan)
+            rights = np.full(len(order), np.nan)
+            snrs = np.full(len(order), np.nan)
+            if k < self.conditions:
+                cell_rows, cell_lefts, cell_rights, cell_snrs = self.condition_cells(k)
+                lefts[position[cell_rows]] = cell_lefts
+                rights[position[cell_rows]] = cell_rights
+                snrs[position[cell_rows]] = cell_snrs
+            columns[name + ' L'] = lefts
+            columns[name + ' R'] = rights
+            columns[name + ' SNR'] = snrs
+
+        return pd.DataFrame(columns)
+
+
+# =============================================================================
+# Merging in parallel
+# =============================================================================
+
+# Function for merging all conditions and building the merged DataFrame (see
+# PeakMerger.table()). conditions is a list of (sRNAs, lefts, rights, snrs)
+# columns, one per condition, and names are the condition names.
+# Peaks of different sRNAs never interact, so the sRNAs are split into groups
+# that are merged by up to workers processes (None means all cores). The
+# table is the same for any number of workers. With keep_new_sRNAs, sRNAs
+# without peaks in the first condition get rows too.
+def merge_conditions(conditions, names, n, match_all_conditions=False, workers=None,
+                     keep_new_sRNAs=False):
+    sRNAs = [np.asarray(columns[0], dtype=str) for columns in conditions]
+    # sRNAs that get rows: those of the first condition, or of every
+    # condition with keep_new_sRNAs.
+    row_sRNAs = np.concatenate(sRNAs) if keep_new_sRNAs else sRNAs[0]
+    parts = split_by_sRNA(row_sRNAs, workers)
+
+    # Function for merging the sRNAs of the rows in part.
+    def merge_part(part):
+        if len(parts) == 1:
+            part_conditions = conditions
+        else:
+            keep = np.unique(row_sRNAs[part])
+            part_conditions = []
+            for k, columns in enumerate(conditions):
+                rows = np.isin(sRNAs[k], keep)
+                part_conditions.append(tuple(None if x is None else np.asarray(x)[rows]
+                                             for x in columns))
+        merger = PeakMerger(n, match_all_conditions, keep_new_sRNAs)
+        merger.add_sorted_conditions(part_conditions)
+        return merger.table(names)
+
+    # Parts hold sRNAs in order of first appearance, so the tables can be put
+    # together in part order.
+    return pd.concat(map_parts(merge_part, parts, workers), ignore_index=True)
+
+
+# =============================================================================
+# Finishing the merged table
+# =============================================================================
+
+# Function for getting the Merged L (leftmost coordinate across conditions),
+# Merged R (rightmost coordinate) and Max SNR of every row of a merged
+# DataFrame (columns sRNA, sRNA peak, then L, R and SNR for each condition),
+# and the left coordinate of the first condition with a peak.
+# Max SNR is NaN for rows without SNRs.
+def merged_extents(merged, conditions):
+    values = merged.iloc[:, 2:2 + 3*conditions].to_numpy(dtype=np.float64)
+    values = values.reshape(len(merged.index), conditions, 3)
+    lefts, rights, snrs = values[:, :, 0], values[:, :, 1], values[:, :, 2]
+    present = ~np.isnan(lefts)
+
+    merged_L = np.where(present, lefts, np.inf).min(axis=1, initial=np.inf)
+    merged_R = np.where(present, rights, -np.inf).max(axis=1, initial=-np.inf)
+    has_snr = present & ~np.isnan(snrs)
+    max_SNR = np.where(has_snr, snrs, -np.inf).max(axis=1, initial=-np.inf)
+    max_SNR[~has_snr.any(axis=1)] = np.nan
+    first_left = lefts[np.arange(len(lefts)), present.argmax(axis=1)] if conditions else merged_L
+    return merged_L, merged_R, max_SNR, first_left
+
+
+# Function for finishing a merged DataFrame from table() or
+# merge_conditions(): adds Merged L (leftmost coordinate across conditions),
+# Merged R (rightmost coordinate) and Max SNR, sorts peaks by sRNA and
+# position, and numbers the peaks of each sRNA in 'sRNA peak'.
+# sRNAs keep their order; peaks of an sRNA are sorted by the left coordinate
+# of their first condition with a peak.
+def finalize_merged(merged, conditions):
+    merged_L, merged_R, max_SNR, first_left = merged_extents(merged, conditions)
+    merged = merged.copy()
+    merged['Merged L'] = merged_L.astype(np.int64)
+    merged['Merged R'] = merged_R.astype(np.int64)
+    merged['Max SNR'] = max_SNR
+
+    # Order by sRNA name (each run of rows of one sRNA, in current order),
+    # then by position. np.lexsort is stable, so ties keep their order.
+    sRNAs = merged['sRNA'].to_numpy(dtype=object)
+    new_sRNA = np.ones(len(sRNAs), dtype=bool)
+    new_sRNA[1:] = sRNAs[1:] != sRNAs[:-1]
+    order_by_name = np.cumsum(new_sRNA)
+    order = np.lexsort((first_left, order_by_name))
+    merged = merged.iloc[order].reset_index(drop=True)
+
+    # Number peaks for each sRNA, starting at 1.
+    numbers = merged.groupby(order_by_name[order]).cumcount() + 1
+    merged['sRNA peak'] = merged['sRNA'].astype(str) + '_' + numbers.astype(str)
+    return merged
+
+
+# Function for finding the direction of every merged peak from a DataFrame of
+# sRNAs with 'sRNA' and 'Direction' columns. Each peak gets the direction of
+# the first sRNA in the DataFrame that matches its sRNA: the same name
+# (without spaces at the ends), or with substring=True, a name that is part
+# of the peak's sRNA name (ignoring case). Each sRNA name is only looked up
+# once. Returns a Series with the index of sRNAs, NaN where nothing matches.
+def peak_directions(sRNAs, directions, substring=False):
+    sRNAs = pd.Series(sRNAs).astype(str)
+    names = directions['sRNA'].astype(str)
+    if substring:
+        keys = list(zip(names.str.lower().str.strip(), directions['Direction']))
+        lookup = {}
+        for sRNA in pd.unique(sRNAs):
+            target = sRNA.lower().strip()
+            lookup[sRNA] = next((direction for key, direction in keys if key in target), np.nan)
+        return sRNAs.map(lookup)
+
+    # Hash join on the stripped names, keeping the first row of each name.
+    first = pd.Series(directions['Direction'].to_numpy(), index=names.str.strip())
+    first = first[~first.index.duplicated()]
+    return sRNAs.str.strip().map(first)
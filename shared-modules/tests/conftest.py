@@ -0,0 +1,12 @@
+"""
+conftest.py
+    10/18/2026
+    Shared setup for the shared-modules tests: the modules are imported the
+    same way the scripts import them, from the shared-modules folder.
+    Run with 'python -m pytest shared-modules/tests' from the repository.
+"""
+
+# Import os and sys packages for finding the shared-modules folder.
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
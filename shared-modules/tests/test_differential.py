@@ -0,0 +1,87 @@
+"""
+test_differential.py
+    10/18/2026
+    Tests for differential.py (and reading SNRs with peaks.parse_snr()).
+"""
+
+# Import Pandas and numpy for building peak tables.
+import pandas as pd
+import numpy as np
+# Import the modules being tested.
+from peaks import parse_snr, read_peak_file, peak_columns, merge_conditions, finalize_merged
+from differential import call_differential
+
+
+# Function for writing a called_peaks CSV file with one peak of sRNA 'ryhB'.
+def write_peak_file(path, left, right, last_SNR):
+    pd.DataFrame({'sRNA': ['ryhB'], 'sRNA_Peak': ['ryhB_1'], 'L_Coord': [left],
+                  'R_Coord': [right], 'LastSNR': [last_SNR]}).to_csv(path, index=False)
+
+
+# SNRs are read exactly as written, so they compare equal to the same min_SNR.
+def test_parse_snr_matches_min_SNR():
+    snrs = parse_snr(pd.Series(['SNR__0.70', 'peak_1.10snr', 'SNR__']))
+    assert snrs.dtype == np.float64
+    assert snrs[0] == 0.7
+    assert snrs[1] == 1.1
+    assert np.isnan(snrs[2])
+
+
+# A peak exactly at min_SNR in every condition passes in all of them: it isn't
+# differential and its largest SNR difference is 0.
+def test_peak_at_min_SNR_is_not_differential(tmp_path):
+    conditions = ['rdmWT', 'rdmStatWT', 'minWT']
+    columns = []
+    for name in conditions:
+        path = str(tmp_path / (name + '.csv'))
+        write_peak_file(path, 100, 200, 'SNR__0.70')
+        columns.append(peak_columns(read_peak_file(path)))
+
+    merged = finalize_merged(merge_conditions(columns, conditions, 50), len(conditions))
+    called, ratios = call_differential(merged, conditions, 0.7)
+
+    assert called['Differential peak?'].tolist() == [0]
+    assert called['Max SNR difference'].tolist() == [0.0]
+    assert called['Max SNR ratio'].tolist() == [0.0]
+    assert merged[conditions[0] + ' SNR'].tolist() == [0.7]
+
+
+# Function for a merged DataFrame (columns sRNA, sRNA peak, then L, R and SNR
+# for each condition, and Max SNR) with one row per list of condition SNRs.
+# None is a condition without a peak.
+def merged_table(conditions, rows):
+    table = {'sRNA': ['ryhB'] * len(rows), 'sRNA peak': [k + 1 for k in range(len(rows))]}
+    for k, name in enumerate(conditions):
+        snrs = [np.nan if row[k] is None else row[k] for row in rows]
+        table[name + ' L'] = [np.nan if row[k] is None else 100.0 for row in rows]
+        table[name + ' R'] = [np.nan if row[k] is None else 200.0 for row in rows]
+        table[name + ' SNR'] = snrs
+    table['Max SNR'] = [max(x for x in row if x is not None) for row in rows]
+    return pd.DataFrame(table)
+
+
+# Each rule of call_differential() on a hand-built table, checked against the
+# expected calls.
+def test_call_differential_rules():
+    conditions = ['rdmWT', 'rdmStatWT', 'minWT']
+    rows = [[0.7, 0.7, 0.7],     # all exactly at min_SNR: not differential
+            [1.0, 1.0, 0.69],    # below min_SNR in one condition: differential
+            [1.0, 2.0, 1.5],     # SNRs differ by a factor of 2: differential
+            [1.0, 1.9, 1.5],     # less than a factor of 2: not differential
+            [1.2, 1.0, None],    # missing in one condition: differential
+            [0.5, 0.5, 0.5]]     # below min_SNR in all conditions: not differential
+    called, ratios = call_differential(merged_table(conditions, rows), conditions, 0.7)
+
+    assert called['Differential peak?'].tolist() == [0, 1, 1, 0, 1, 0]
+    assert np.allclose(called['Max SNR difference'][:4], [0.0, 0.0, 1.0, 0.9])
+    # Missing peak: difference is the largest SNR and there is no ratio.
+    assert called['Max SNR difference'][4] == 1.2
+    assert np.isnan(called['Max SNR ratio'][4])
+    # Only the passing conditions are compared.
+    assert called['Max SNR ratio'][1] == 0.0
+    assert called['Max SNR ratio'][2] == np.log10(2)
+    assert np.isnan(called['Max SNR difference'][5])
+
+    assert ratios.columns.tolist() == ['rdmWT / rdmStatWT', 'rdmWT / minWT', 'rdmStatWT / minWT']
+    assert ratios.iloc[2, 0] == np.log10(2)
+    assert ratios.iloc[1, 1:].isna().all()
@@ -0,0 +1,80 @@
+"""
+test_genome.py
+    10/18/2026
+    Tests for genome.py: the binary cache gives the same sequences as the
+    FASTA file, and is rebuilt when the file's contents change.
+"""
+
+# Import os for file times.
+import os
+# Import pytest for expected errors.
+import pytest
+# Import the module being tested.
+import genome
+from genome import load_genome, cache_folder
+
+# FASTA file with two records and lines of different widths.
+FASTA_TEXT = """>chr test chromosome
+ACGTACGTAC
+GTTTGGGCCC
+AAT
+>plasmid
+ggccaaTT
+"""
+
+
+# Function for loading a genome as a new Python session would (without the
+# genomes already loaded in this one).
+def load_again(fasta_file, packed=False):
+    genome._loaded.clear()
+    return load_genome(fasta_file, packed)
+
+
+# The cache gives the same sequences as the FASTA file, without parsing it.
+def test_cache_round_trip(tmp_path, monkeypatch):
+    fasta_file = str(tmp_path / 'genome.fna')
+    with open(fasta_file, 'w') as f:
+        f.write(FASTA_TEXT)
+
+    parsed = load_again(fasta_file)
+    assert os.path.exists(os.path.join(cache_folder(fasta_file), 'index.json'))
+    assert parsed.fetch(9, 14) == 'ACGTTT'
+    assert parsed.fetch(1, 4, 'plasmid', 'R') == 'ggcc'
+
+    def no_parsing(*args):
+        raise AssertionError('FASTA file parsed again')
+    monkeypatch.setattr(genome, '_parse_genome', no_parsing)
+    for packed in (False, True):
+        cached = load_again(fasta_file, packed)
+        assert cached.contig_names() == ['chr', 'plasmid']
+        assert cached.fetch(9, 14) == 'ACGTTT'
+        assert cached.fetch(18, 23) == 'CCCAAT'
+        assert cached.fetch(1, 4, 'plasmid', 'R') == 'ggcc'
+
+
+# A file with the same size but new contents (and time) isn't read from the
+# old cache, unpacked or packed.
+def test_changed_file_rebuilds_cache(tmp_path):
+    fasta_file = str(tmp_path / 'genome.fna')
+    with open(fasta_file, 'w') as f:
+        f.write(FASTA_TEXT)
+    assert load_again(fasta_file, packed=True).fetch(1, 4) == 'ACGT'
+
+    with open(fasta_file, 'w') as f:
+        f.write(FASTA_TEXT.replace('ACGTACGTAC', 'TTTTACGTAC'))
+    stat = os.stat(fasta_file)
+    os.utime(fasta_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert load_again(fasta_file).fetch(1, 4) == 'TTTT'
+    # The packed arrays of the old file aren't used either.
+    assert load_again(fasta_file, packed=True).fetch(1, 4) == 'TTTT'
+
+
+# Empty FASTA files and files with only header lines give an error naming
+# the file.
+@pytest.mark.parametrize('text', ['', '\n', '>chr\n>plasmid\n'])
+def test_fasta_without_sequences(tmp_path, text):
+    fasta_file = str(tmp_path / 'empty.fna')
+    with open(fasta_file, 'w') as f:
+        f.write(text)
+    with pytest.raises(ValueError, match='empty.fna'):
+        load_again(fasta_file)
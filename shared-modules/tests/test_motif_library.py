@@ -0,0 +1,116 @@
+"""
+test_motif_library.py
+    10/18/2026
+    Tests for motif_library.py: the binary library file is reused only while
+    its motif files are unchanged, and NameMatcher finds the same names as
+    checking every pattern with 'in' (the rule transfac2meme.py used).
+"""
+
+# Import random for random names.
+import random
+# Import numpy for comparing library arrays.
+import numpy as np
+# Import the module being tested.
+import motif_library
+from motif_library import load_motif_library, library_key, MotifLibrary, LIBRARY_ARRAYS, NameMatcher
+
+# TRANSFAC file with one matrix of counts (columns not in ACGT order).
+TRANSFAC_TEXT = """AC  MX000001
+XX
+ID  LexA
+XX
+NA  lexA
+XX
+P0      T      G      C      A
+01      0      1      0     19
+02      1      0     19      0
+03      2     16      1      1
+04     20      0      0      0
+XX
+//
+"""
+
+# MEME file with one motif.
+MEME_TEXT = """MEME version 4
+
+ALPHABET= ACGT
+
+strands: + -
+
+Background letter frequencies
+A 0.3 C 0.2 G 0.2 T 0.3
+
+MOTIF FNR fnr
+letter-probability matrix: alength= 4 w= 3 nsites= 10 E= 0
+ 0.7 0.1 0.1 0.1
+ 0.1 0.1 0.1 0.7
+ 0.1 0.1 0.7 0.1
+"""
+
+
+# Function for writing the two motif files; returns their names.
+def write_motif_files(tmp_path):
+    transfac_file = tmp_path / 'prodoric_mx000001.txt'
+    meme_file = tmp_path / 'fnr.meme'
+    transfac_file.write_text(TRANSFAC_TEXT)
+    meme_file.write_text(MEME_TEXT)
+    return [str(transfac_file), str(meme_file)]
+
+
+# The library saved for the motif files is read back (without reading the
+# motif files) with the same arrays, and rebuilt once a motif file changes.
+def test_library_file_reused_until_motif_files_change(tmp_path, monkeypatch):
+    motif_files = write_motif_files(tmp_path)
+    library_file = str(tmp_path / 'motifs.npz')
+    library = load_motif_library(motif_files, library_file)
+    assert library.ids.tolist() == ['LexA', 'FNR']
+    assert library.sources.tolist() == [0, 1]
+    assert library.consensus() == ['ACGT', 'ATG']
+
+    # The saved library is used as is.
+    def no_reading(path):
+        raise AssertionError('motif file read: ' + path)
+    monkeypatch.setattr(motif_library, 'read_motif_file', no_reading)
+    cached = load_motif_library(motif_files, library_file)
+    for name in LIBRARY_ARRAYS:
+        assert np.array_equal(getattr(cached, name), getattr(library, name))
+    monkeypatch.undo()
+
+    # A changed motif file changes the key, so the library is rebuilt.
+    old_key = library_key(motif_files)
+    with open(motif_files[1], 'w') as f:
+        f.write(MEME_TEXT.replace('MOTIF FNR fnr', 'MOTIF CRP crp'))
+    assert library_key(motif_files) != old_key
+    assert MotifLibrary.load(library_file, library_key(motif_files)) is None
+    assert load_motif_library(motif_files, library_file).ids.tolist() == ['LexA', 'CRP']
+    assert MotifLibrary.load(library_file, library_key(motif_files)) is not None
+
+
+# Function for the nested-loop rule: name contains a pattern, ignoring case.
+def contains_any(patterns, name):
+    return any(str(pattern).lower() in str(name).lower() for pattern in patterns)
+
+
+# Names that contain a pattern, ignoring case, including patterns that are
+# suffixes of other patterns and an empty pattern (which every name contains).
+def test_name_matcher_cases():
+    patterns = ['LexA', 'arcA', 'rcaB', 'Fur']
+    names = ['lexA_1', 'ARCA', 'xarcab', 'rcA', 'ffuR', 'Fu', 'crp', '']
+    found = NameMatcher(patterns).contains_any_of(names).tolist()
+    assert found == [True, True, True, False, True, False, False, False]
+    assert found == [contains_any(patterns, x) for x in names]
+    assert NameMatcher(['crp', '']).contains_any('fnr')
+    assert not NameMatcher([]).contains_any('fnr')
+
+
+# NameMatcher against the nested-loop rule on random names over a small
+# alphabet, where patterns often overlap.
+def test_name_matcher_matches_nested_loops():
+    rng = random.Random(3)
+    for trial in range(200):
+        patterns = [''.join(rng.choice('abAB') for k in range(rng.randint(1, 4)))
+                    for x in range(rng.randint(1, 6))]
+        names = [''.join(rng.choice('abcAB') for k in range(rng.randint(0, 10)))
+                 for x in range(20)]
+        matcher = NameMatcher(patterns)
+        assert matcher.contains_any_of(names).tolist() == [contains_any(patterns, x) for x in names]
@@ -0,0 +1,110 @@
+"""
+test_motif_scan.py
+    10/18/2026
+    Tests for motif_scan.py: p-values against every possible window of a
+    short motif, with a background that isn't strand-symmetric in the file.
+"""
+
+# Import itertools for every possible window.
+import itertools
+# Import numpy for scores and probabilities.
+import numpy as np
+# Import the module being tested.
+from motif_scan import read_meme, ScoringMatrix, scan_sequences, symmetric_background, ALPHABET
+
+# MEME file with a background that isn't strand-symmetric.
+MEME_TEXT = """MEME version 4
+
+ALPHABET= ACGT
+
+strands: + -
+
+Background letter frequencies
+A 0.4 C 0.1 G 0.2 T 0.3
+
+MOTIF M1 test
+letter-probability matrix: alength= 4 w= 5 nsites= 18 E= 0
+ 0.8 0.1 0.05 0.05
+ 0.1 0.1 0.1 0.7
+ 0.0 0.9 0.1 0.0
+ 0.25 0.25 0.25 0.25
+ 0.6 0.0 0.4 0.0
+"""
+
+
+# Function for writing the MEME file and reading its motif and background.
+def read_test_motif(tmp_path):
+    path = tmp_path / 'test.meme'
+    path.write_text(MEME_TEXT)
+    motifs, background = read_meme(str(path))
+    return motifs[0], background
+
+
+# Function for the whole-number score and probability (with background) of
+# every window of width letters, scored with matrix (ScoringMatrix.forward
+# or .reverse).
+def enumerate_windows(matrix, background, width):
+    windows = np.array(list(itertools.product(range(4), repeat=width)))
+    scores = matrix[np.arange(width), windows].sum(axis=1)
+    probabilities = np.prod(np.asarray(background)[windows], axis=1)
+    return windows, scores, probabilities
+
+
+# Function for the brute-force p-value of every score: the total probability
+# of the windows scoring at least as high.
+def brute_force_p_values(scores, probabilities):
+    return np.array([probabilities[scores >= s].sum() for s in scores])
+
+
+def test_background_is_strand_symmetric(tmp_path):
+    motif, background = read_test_motif(tmp_path)
+    assert np.allclose(background, [0.35, 0.15, 0.15, 0.35])
+    assert np.allclose(symmetric_background([0.4, 0.1, 0.2, 0.3]), background)
+
+
+# p-values of both strands match adding up the probabilities of all 4^5
+# windows, with the background from the file.
+def test_p_values_match_enumeration_on_both_strands(tmp_path):
+    motif, background = read_test_motif(tmp_path)
+    matrix = ScoringMatrix(motif, background)
+    for scaled in (matrix.forward, matrix.reverse):
+        windows, scores, probabilities = enumerate_windows(scaled, background, len(motif))
+        expected = brute_force_p_values(scores, probabilities)
+        assert np.allclose(matrix.p_values[scores], expected, rtol=1e-12, atol=0)
+
+
+# Scanning finds exactly the windows (on either strand) whose brute-force
+# p-value is below the threshold, with the same p-values.
+def test_scan_matches_naive_scan(tmp_path):
+    motif, background = read_test_motif(tmp_path)
+    matrix = ScoringMatrix(motif, background)
+    rng = np.random.default_rng(0)
+    sequences = [''.join(rng.choice(list(ALPHABET), 60)) for _ in range(20)]
+    names = ['seq' + str(i) for i in range(len(sequences))]
+    threshold = 0.01
+
+    expected = {}
+    for strand, scaled in [('+', matrix.forward), ('-', matrix.reverse)]:
+        windows, scores, probabilities = enumerate_windows(scaled, background, len(motif))
+        p_values = brute_force_p_values(scores, probabilities)
+        p_value_of = {tuple(w): p for w, p in zip(windows.tolist(), p_values)}
+        for name, seq in zip(names, sequences):
+            for start in range(len(seq) - len(motif) + 1):
+                window = tuple(ALPHABET.index(x) for x in seq[start:start + len(motif)])
+                if p_value_of[window] < threshold:
+                    expected[(name, start + 1, strand)] = p_value_of[window]
+
+    hits = scan_sequences([motif], names, sequences, background, threshold)
+    found = {(name, start, strand): p for name, start, strand, p in
+             zip(hits['sequence_name'], hits['start'], hits['strand'], hits['p-value'])}
+    assert found.keys() == expected.keys()
+    assert all(np.isclose(found[key], expected[key], rtol=1e-12) for key in expected)
+
+
+# A site on the reverse strand is reported with its sequence read on that
+# strand.
+def test_reverse_strand_site(tmp_path):
+    motif, background = read_test_motif(tmp_path)
+    hits = scan_sequences([motif], ['s'], ['GGGGG' + 'TAGAT' + 'GGGGG'], background, 0.05)
+    hit = hits[hits['strand'] == '-'].iloc[0]
+    assert (hit['start'], hit['stop'], hit['matched_sequence']) == (6, 10, 'ATCTA')
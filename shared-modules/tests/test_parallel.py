@@ -0,0 +1,57 @@
+"""
+test_parallel.py
+    10/18/2026
+    Tests for parallel.py: results with several workers are the same as
+    with one (parts in order, sRNAs never split between parts).
+"""
+
+# Import numpy for building peak columns.
+import numpy as np
+# Import the modules being tested.
+from parallel import map_parts, split_by_sRNA, MIN_PART_ROWS
+from peaks import merge_conditions
+
+
+# Function for random peak columns (sRNAs, lefts, rights, snrs) of one
+# condition: rows peaks spread over sRNA_count sRNAs, in random order.
+def random_condition(rng, rows, sRNA_count):
+    sRNAs = np.array(['sRNA' + str(x) for x in rng.integers(0, sRNA_count, rows)])
+    lefts = rng.integers(0, 20000, rows)
+    rights = lefts + rng.integers(20, 200, rows)
+    snrs = np.round(rng.uniform(0, 3, rows), 2)
+    return sRNAs, lefts, rights, snrs
+
+
+def square(part):
+    return [x * x for x in part]
+
+
+# map_parts() returns the results in part order for any number of workers.
+def test_map_parts_keeps_part_order():
+    parts = [list(range(k, k + 5)) for k in range(0, 50, 5)]
+    assert map_parts(square, parts, 4) == map_parts(square, parts, 1)
+    assert map_parts(square, parts, 4)[3] == [x * x for x in range(15, 20)]
+
+
+# Every row is in exactly one part and every sRNA in exactly one part.
+def test_split_by_sRNA_keeps_sRNAs_whole():
+    rng = np.random.default_rng(1)
+    sRNAs = random_condition(rng, 4 * MIN_PART_ROWS, 300)[0]
+    parts = split_by_sRNA(sRNAs, 4)
+    assert len(parts) > 1
+    assert sorted(np.concatenate(parts).tolist()) == list(range(len(sRNAs)))
+    owners = {}
+    for k, part in enumerate(parts):
+        for name in set(sRNAs[part]):
+            assert owners.setdefault(name, k) == k
+
+
+# Merging with several workers gives the same table as merging serially.
+def test_merge_conditions_same_for_any_workers():
+    rng = np.random.default_rng(2)
+    conditions = [random_condition(rng, 4 * MIN_PART_ROWS, 400) for k in range(3)]
+    names = ['rdmWT', 'rdmStatWT', 'minWT']
+    for keep_new_sRNAs in (False, True):
+        serial = merge_conditions(conditions, names, 50, workers=1, keep_new_sRNAs=keep_new_sRNAs)
+        forked = merge_conditions(conditions, names, 50, workers=4, keep_new_sRNAs=keep_new_sRNAs)
+        assert serial.equals(forked)
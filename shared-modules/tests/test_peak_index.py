@@ -0,0 +1,69 @@
+"""
+test_peak_index.py
+    10/18/2026
+    Tests for peak_index.py: adding or changing conditions one at a time
+    gives the same merged table as merging every condition at once.
+"""
+
+# Import Pandas and numpy for peak files.
+import pandas as pd
+import numpy as np
+# Import the modules being tested.
+from peak_index import PeakIndex
+from peaks import read_peak_file, peak_columns, merge_conditions
+
+
+# Function for writing a called_peaks CSV file of random peaks over a few
+# sRNAs (some SNRs empty); returns its name.
+def write_random_peak_file(path, seed, sRNA_count=8, rows=60):
+    rng = np.random.default_rng(seed)
+    lefts = rng.integers(0, 2000, rows)
+    snrs = ['SNR__' + format(x, '.2f') for x in rng.uniform(0, 3, rows)]
+    snrs[0] = 'SNR__'
+    pd.DataFrame({'sRNA': ['sRNA' + str(x) for x in rng.integers(0, sRNA_count, rows)],
+                  'sRNA_Peak': np.arange(rows),
+                  'L_Coord': lefts,
+                  'R_Coord': lefts + rng.integers(20, 150, rows),
+                  'LastSNR': snrs}).to_csv(path, index=False)
+    return str(path)
+
+
+# Function for the merged table of peak files, merged all at once.
+def merge_files(peak_files, names, n):
+    columns = [peak_columns(read_peak_file(x)) for x in peak_files]
+    return merge_conditions(columns, names, n, workers=1)
+
+
+# Function for checking that two merged tables have the same cells.
+def assert_same_table(index_table, merged):
+    assert index_table.columns.tolist() == merged.columns.tolist()
+    assert index_table['sRNA'].tolist() == merged['sRNA'].astype(str).tolist()
+    assert np.array_equal(index_table.iloc[:, 2:].to_numpy(dtype=np.float64),
+                          merged.iloc[:, 2:].to_numpy(dtype=np.float64), equal_nan=True)
+
+
+# Conditions added one by one, a changed peak file and a changed n all give
+# the table of a full merge.
+def test_incremental_merge_matches_full_merge(tmp_path):
+    names = ['rdmWT', 'rdmStatWT', 'minWT']
+    peak_files = [write_random_peak_file(tmp_path / (name + '.csv'), seed)
+                  for seed, name in enumerate(names)]
+
+    index = PeakIndex(str(tmp_path / 'peaks.sqlite'), 50)
+    for k, name in enumerate(names):
+        assert index.update_condition(name, peak_files[k])
+        assert_same_table(index.merged_table(), merge_files(peak_files[:k + 1], names[:k + 1], 50))
+    # An unchanged file isn't merged again.
+    assert index.update_condition(names[1], peak_files[1]) == set()
+
+    # Changing one condition's peaks only merges its sRNAs again.
+    write_random_peak_file(peak_files[1], 10, sRNA_count=3)
+    assert index.update_condition(names[1], peak_files[1])
+    assert_same_table(index.merged_table(), merge_files(peak_files, names, 50))
+    index.close()
+
+    # Reopening with another n merges everything again.
+    index = PeakIndex(str(tmp_path / 'peaks.sqlite'), 10)
+    assert index.condition_names() == names
+    assert_same_table(index.merged_table(), merge_files(peak_files, names, 10))
+    index.close()
@@ -14,6 +14,13 @@ import pandas as pd
 from openpyxl import load_workbook
 # Import os package for making directories and adding text files to them.
 import os
+# Import sys package for finding the shared-modules folder.
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'shared-modules'))
+# Import genome module, used for loading the genome and extracting sequences.
+from genome import load_genome
+# Import extract module, used for extracting many sequences at once.
+from extract import extract_intervals
 import numpy as np
 
 
@@ -37,21 +44,11 @@ writer.sheets = dict((ws.title, ws) for ws in book.worksheets)
 ipod_df = file.parse('IPOD')
 
 
-# Open file that contains the K-12 genome for extracting DNA sequences.
-with open("GCF_000005845.2_ASM584v2_genomic (1).fna") as f:
-# Create list of all lines in file.
-    content = f.readlines()
-content = [x.strip() for x in content]
-
-# Loop through strings in content list and add to one long string.
-# This long string is the entire genome.
-# Start at i = 1 since genome starts on second line.
-i = 1
-# Genome starts with "0" so indices will match nucleotide coordinates.
-genome = "0"
-while i < len(content):
-    genome += content[i]
-    i += 1
+# Load the K-12 genome for extracting DNA sequences.
+# The genome module reads the file once and indexes it, so sequences can be
+# sliced out directly using 1-based nucleotide coordinates.
+# Set packed=True to keep the genome 2-bit packed (about 4 times less memory).
+genome = load_genome("GCF_000005845.2_ASM584v2_genomic (1).fna", packed=False)
 
 
 # Create directory for FASTA files if it doesn't already exist.
@@ -59,42 +56,25 @@ if not os.path.exists('FASTA Files'):
     os.mkdir('FASTA Files')
 
 
-# Loop through each sRNA in IPOD DataFrame.
-for i, row in ipod_df.iterrows():
+# Table of sRNA regions to extract: name, left and right coordinates, and
+# strand. If the direction isn't forward, take the reverse complement.
+sRNA_regions = pd.DataFrame({'name': ipod_df['sRNA'],
+                             'left': ipod_df['L_Gen_Coord'],
+                             'right': ipod_df['R_Gen_Coord'],
+                             'strand': np.where(ipod_df['Direction'] == 'F', 'F', 'R')})
+
+# Extract all sequences in one sweep along the genome. Write each sequence to
+# its own FASTA file as soon as it is extracted.
+for i, sRNA_name, seq in extract_intervals(genome, sRNA_regions):
     
     # Create a new text file in directory for each sRNA.
-    txtFile = open('FASTA Files\\' + ipod_df.loc[i, 'sRNA'] + '.fasta', "w")
+    txtFile = open('FASTA Files\\' + sRNA_name + '.fasta', "w")
     
     # Write the sRNA's name on first line.
-    txtFile.write('>' + ipod_df.loc[i, 'sRNA'] + "\n")
-        
-    # Get left and right coordinates of text file.
-    left_coord = ipod_df.loc[i, 'L_Gen_Coord']
-    right_coord = ipod_df.loc[i, 'R_Gen_Coord']
-    
-    # Extract forward sequence from genome string using the left and right coordinates.
-    seq_F = genome[left_coord:right_coord+1]
+    txtFile.write('>' + sRNA_name + "\n")
     
-    # If the direction is forward, write forward sequence on  the second line of
-    # the text file.
-    if ipod_df.loc[i, 'Direction'] == 'F':
-        txtFile.write(seq_F)
-    
-    # If the direction is reverse, take reverse complement of forward sequence.
-    else:
-        seq_R = ""
-        for nt in seq_F:
-            if nt == 'A':
-                seq_R = 'T' + seq_R
-            elif nt == 'T':
-                seq_R = 'A' + seq_R
-            elif nt == 'G':
-                seq_R = 'C' + seq_R
-            elif nt == 'C':
-                seq_R = 'G' + seq_R
-                
-        # Write reverse sequence on the second line of the text file.
-        txtFile.write(seq_R)
+    # Write the sequence on the second line of the text file.
+    txtFile.write(seq)
     
     # Close text file so it can't be written anymore.
     txtFile.close()